@@ -0,0 +1,4 @@
+"""Performance benchmarks for tight_loops.
+
+Run them with `python -m benchmarks`. See `python -m benchmarks --help`.
+"""
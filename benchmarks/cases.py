@@ -0,0 +1,279 @@
+"""The benchmark cases.
+
+A case is a function of a working directory and a size that prepares its data
+and returns the function to measure. Only the returned function is timed, so
+generating and writing the data is left out of the measurements. Cases that
+must be measured in another process return a function that returns its own
+(seconds, peak bytes) instead.
+"""
+
+import json
+import os
+import subprocess
+import sys
+import warnings
+
+from . import data
+
+# The registered cases, by name: (function, {scale: size}).
+CASES = {}
+
+SCALES = ("small", "medium", "large")
+
+
+def case(name, small, medium, large, measured=False):
+    """Registers a benchmark case with its sizes at each scale.
+
+    Args:
+        name (str): The name of the case.
+        small (int): The size at the small scale.
+        medium (int): The size at the medium scale.
+        large (int): The size at the large scale.
+        measured (bool): Whether the case measures itself and returns (seconds,
+            peak bytes).
+    """
+
+    def decorator(func):
+        func.measured = measured
+        CASES[name] = (func, {"small": small, "medium": medium, "large": large})
+        return func
+
+    return decorator
+
+
+def headless_map(**kwargs):
+    """Returns an ipyleaflet map without controls, with the US in view."""
+    from tight_loops import tight_loops
+
+    warnings.simplefilter("ignore", DeprecationWarning)
+    m = tight_loops.Map(center=(37, -96), zoom=4, headless=True, **kwargs)
+    m.set_trait("bounds", ((25, -125), (49, -67)))
+    return m
+
+
+IMPORT_SCRIPT = """
+import json, sys, time, tracemalloc
+if sys.argv[1] == "memory":
+    tracemalloc.start()
+start = time.perf_counter()
+exec(sys.argv[2])
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, tracemalloc.get_traced_memory()[1]]))
+"""
+
+
+def run_import(statement):
+    """Returns the time and the peak memory of an import in fresh interpreters.
+
+    The time and the memory are measured in separate interpreters, as tracing
+    allocations slows imports down several times.
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    results = []
+    for mode in ("time", "memory"):
+        output = subprocess.run(
+            [sys.executable, "-c", IMPORT_SCRIPT, mode, statement], cwd=root, check=True, capture_output=True, text=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results[0][0], results[1][1]
+
+
+@case("import", 1, 1, 1, measured=True)
+def import_package(workdir, n):
+    """Imports the package in a fresh interpreter."""
+    return lambda: run_import("import tight_loops")
+
+
+@case("import_map", 1, 1, 1, measured=True)
+def import_map(workdir, n):
+    """Imports the ipyleaflet Map in a fresh interpreter."""
+    return lambda: run_import("from tight_loops import Map")
+
+
+@case("generate_random_string", 1000, 10000, 100000)
+def random_strings(workdir, n):
+    """Generates n random strings."""
+    from tight_loops.common import generate_random_string
+
+    def run():
+        for _ in range(n):
+            generate_random_string()
+
+    return run
+
+
+@case("generate_random_strings", 1000, 10000, 100000)
+def bulk_random_strings(workdir, n):
+    """Generates n unique random strings at once."""
+    from tight_loops.common import generate_random_strings
+
+    return lambda: generate_random_strings(n)
+
+
+@case("csv_to_shp", 10000, 100000, 1000000)
+def csv_to_shp(workdir, n):
+    """Converts a CSV of n points to a Shapefile and adds it to a map."""
+    path = data.write_points_csv(os.path.join(workdir, f"points_{n}.csv"), n)
+    output = os.path.join(workdir, f"points_{n}.shp")
+
+    def run():
+        headless_map().csv_to_shp(path, output=output)
+
+    return run
+
+
+@case("grouping_points", 10000, 100000, 1000000)
+def grouping_points(workdir, n):
+    """Clusters n points and shows the clusters in view."""
+    df = data.random_points(n)
+
+    def run():
+        headless_map().grouping_points(df)
+
+    return run
+
+
+@case("add_points", 100000, 1000000, 5000000)
+def add_points(workdir, n):
+    """Adds n points colored by a value as a binary canvas layer."""
+    df = data.random_points(n)
+
+    def run():
+        headless_map().add_points(df, values="value")
+
+    return run
+
+
+@case("add_shp", 1000, 10000, 100000)
+def add_shp(workdir, n):
+    """Adds a Shapefile of n polygons to a map."""
+    path = data.write_polygons_shp(os.path.join(workdir, f"polygons_{n}.shp"), n)
+
+    def run():
+        headless_map().add_shp(path)
+
+    return run
+
+
+@case("add_vector", 1000, 10000, 100000)
+def add_vector(workdir, n):
+    """Adds a GeoPackage of n polygons to a map."""
+    path = os.path.join(workdir, f"polygons_{n}.gpkg")
+    data.random_polygons(n).to_file(path)
+
+    def run():
+        headless_map().add_vector(path)
+
+    return run
+
+
+@case("add_shp_many", 10, 50, 300)
+def add_shp_many(workdir, n):
+    """Adds n Shapefiles of 500 polygons in Web Mercator to a map from a glob."""
+    folder = os.path.join(workdir, f"counties_{n}")
+    os.makedirs(folder, exist_ok=True)
+    for i in range(n):
+        polygons = data.random_polygons(500, seed=i).to_crs(epsg=3857)
+        polygons.to_file(os.path.join(folder, f"county_{i}.shp"))
+
+    def run():
+        headless_map().add_shp(os.path.join(folder, "*.shp"))
+
+    return run
+
+
+@case("add_geojson", 10000, 100000, 1000000)
+def add_geojson(workdir, n):
+    """Adds a GeoJSON file of n points to a map, in full and filtered to a box."""
+    path = data.write_geojson(os.path.join(workdir, f"points_{n}.geojson"), n)
+
+    def run():
+        m = headless_map()
+        m.add_geojson(path)
+        m.add_geojson(path, bbox=(-100, 30, -90, 40))
+
+    return run
+
+
+@case("contour_tif_box", 256, 1024, 4096)
+def contour_tif_box(workdir, n):
+    """Contours an n x n DEM in one process."""
+    from tight_loops.common import contour_tif_box
+
+    path = data.write_dem(os.path.join(workdir, f"dem_{n}.tif"), n)
+
+    def run():
+        contour_tif_box(path, interval=100, max_workers=1)
+
+    return run
+
+
+@case("raster_preview", 1024, 4096, 16384)
+def raster_preview(workdir, n):
+    """Adds a preview of an n x n DEM without overviews, with the preview cache cleared."""
+    from tight_loops.raster import clear_preview_cache
+
+    path = data.write_dem(os.path.join(workdir, f"dem_{n}.tif"), n)
+
+    def run():
+        clear_preview_cache()
+        headless_map().add_raster_preview(path)
+
+    return run
+
+
+@case("folium_to_html", 1000, 10000, 100000)
+def folium_to_html(workdir, n):
+    """Renders a folium map holding n points, with the HTML cache cleared."""
+    import folium
+    from tight_loops import folium_loops
+
+    m = folium_loops.Map()
+    folium.GeoJson(data.random_geojson(n), name="points").add_to(m)
+
+    def run():
+        m.clear_html_cache()
+        m.to_html()
+
+    return run
+
+
+@case("add_raster", 10, 100, 1000)
+def add_raster(workdir, n):
+    """Adds n COGs through a TiTiler client backed by a local stub."""
+    import httpx
+    from tight_loops.titiler import TitilerClient
+
+    def handler(request):
+        url = request.url.params["url"]
+        if request.url.path == "/cog/info":
+            return httpx.Response(200, json={"bounds": [-10, -5, 10, 5]})
+        return httpx.Response(200, json={"tiles": [f"http://stub/tiles/{{z}}/{{x}}/{{y}}?url={url}"], "bounds": [-10, -5, 10, 5]})
+
+    client = TitilerClient("http://stub", transport=httpx.MockTransport(handler))
+    urls = [f"https://example.com/cog_{i}.tif" for i in range(n)]
+
+    def run():
+        client.clear_cache()
+        headless_map().add_rasters(urls, client=client)
+
+    return run
+
+
+@case("geocoder_search", 10000, 100000, 1000000)
+def geocoder_search(workdir, n):
+    """Answers 500 autocomplete queries from a gazetteer of n places, without the cache."""
+    from tight_loops.common import generate_random_strings
+    from tight_loops.geocoder import Gazetteer
+
+    df = data.random_points(n)
+    names = generate_random_strings(n, length=10, seed=0)
+    gazetteer = Gazetteer(names, df["longitude"], df["latitude"], rank=df["value"])
+    queries = [name[:length] for name, length in zip(names[:500], [1, 2, 3, 5, 8] * 100)]
+
+    def run():
+        gazetteer.clear_cache()
+        for query in queries:
+            gazetteer.search(query)
+
+    return run
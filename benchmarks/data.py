@@ -0,0 +1,142 @@
+"""Synthetic data for the benchmarks.
+
+Every generator takes a seed, so a scale always produces the same data.
+"""
+
+import json
+
+import numpy as np
+
+
+def random_points(n, seed=0, bounds=(-125, 25, -67, 49)):
+    """Returns a DataFrame of random points with name, latitude, longitude and value columns.
+
+    Args:
+        n (int): The number of points.
+        seed (int): The random seed.
+        bounds (tuple): The (west, south, east, north) extent of the points.
+
+    Returns:
+        DataFrame: The points.
+    """
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    west, south, east, north = bounds
+    return pd.DataFrame(
+        {
+            "name": np.char.add("point_", np.arange(n).astype(str)),
+            "latitude": np.round(rng.uniform(south, north, n), 6),
+            "longitude": np.round(rng.uniform(west, east, n), 6),
+            "value": rng.normal(100, 15, n).round(3),
+        }
+    )
+
+
+def write_points_csv(path, n, seed=0):
+    """Writes random points to a CSV file and returns its path."""
+    random_points(n, seed).to_csv(path, index=False)
+    return path
+
+
+def random_polygons(n, seed=0, vertices=32, bounds=(-125, 25, -67, 49)):
+    """Returns a GeoDataFrame of random circular polygons.
+
+    Args:
+        n (int): The number of polygons.
+        seed (int): The random seed.
+        vertices (int): The number of vertices per polygon.
+        bounds (tuple): The (west, south, east, north) extent of the polygons.
+
+    Returns:
+        GeoDataFrame: The polygons, with id, name and area columns.
+    """
+    import geopandas as gpd
+    import shapely
+
+    df = random_points(n, seed, bounds)
+    rng = np.random.default_rng(seed + 1)
+    radius = rng.uniform(0.01, 0.1, n)
+    centers = shapely.points(df["longitude"].to_numpy(), df["latitude"].to_numpy())
+    geometry = shapely.buffer(centers, radius, quad_segs=max(vertices // 4, 1))
+    return gpd.GeoDataFrame(
+        {"id": np.arange(n), "name": df["name"], "area": shapely.area(geometry)},
+        geometry=geometry,
+        crs="EPSG:4326",
+    )
+
+
+def write_polygons_shp(path, n, seed=0):
+    """Writes random polygons to a Shapefile and returns its path."""
+    random_polygons(n, seed).to_file(path)
+    return path
+
+
+def random_geojson(n, seed=0):
+    """Returns a GeoJSON FeatureCollection dict of random points."""
+    df = random_points(n, seed)
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"name": name, "value": value},
+            "geometry": {"type": "Point", "coordinates": [lon, lat]},
+        }
+        for name, lat, lon, value in df.itertuples(index=False)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def write_geojson(path, n, seed=0):
+    """Writes random points to a GeoJSON file and returns its path."""
+    with open(path, "w") as f:
+        json.dump(random_geojson(n, seed), f)
+    return path
+
+
+def dem_array(size, seed=0, hills=12):
+    """Returns a smooth synthetic DEM made of random Gaussian hills.
+
+    Args:
+        size (int): The number of rows and columns.
+        seed (int): The random seed.
+        hills (int): The number of hills.
+
+    Returns:
+        ndarray: A float32 array of heights between about 0 and 3000.
+    """
+    rng = np.random.default_rng(seed)
+    rows, cols = np.ogrid[0:size, 0:size]
+    dem = np.zeros((size, size), dtype="float32")
+    for row, col, height, width in zip(
+        rng.uniform(0, size, hills),
+        rng.uniform(0, size, hills),
+        rng.uniform(500, 2500, hills),
+        rng.uniform(size / 16, size / 4, hills),
+    ):
+        dem += (height * np.exp(-((rows - row) ** 2 + (cols - col) ** 2) / (2 * width ** 2))).astype("float32")
+    return dem + rng.normal(0, 1, (size, size)).astype("float32")
+
+
+def write_dem(path, size, seed=0, resolution=30.0):
+    """Writes a synthetic DEM to a GeoTIFF in UTM zone 17N and returns its path."""
+    try:
+        import rasterio
+        from rasterio.transform import from_origin
+    except ImportError:
+        raise ImportError("Please install rasterio: pip install rasterio")
+
+    dem = dem_array(size, seed)
+    profile = {
+        "driver": "GTiff",
+        "width": size,
+        "height": size,
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:32617",
+        "transform": from_origin(200000, 4000000, resolution, resolution),
+        "tiled": True,
+        "compress": "deflate",
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(dem, 1)
+    return path
@@ -0,0 +1,241 @@
+"""Runs the benchmark cases and compares them against stored baselines."""
+
+import argparse
+import fnmatch
+import gc
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from .cases import CASES, SCALES
+
+BASELINES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# The allowed relative increase over the baseline, and an absolute slack for
+# measurements too small to compare in relative terms, in seconds and bytes.
+TOLERANCE = {"time": 0.5, "memory": 0.25}
+SLACK = {"time": 0.005, "memory": 64 * 1024}
+
+
+def reference_workload():
+    """A fixed mix of NumPy and pure Python work that times the machine."""
+    import numpy as np
+
+    np.sort(np.random.default_rng(0).random(1_000_000))
+    counts = {}
+    for i in range(200_000):
+        counts[i % 1000] = counts.get(i % 1000, 0) + 1
+
+
+def calibrate(repeat=5):
+    """Returns the best time of the reference workload on this machine, in seconds.
+
+    The times of the cases are also given relative to it, which is what the
+    baselines store, so they can be compared on other machines.
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        reference_workload()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def measure(func, repeat=3):
+    """Measures the time and the peak memory of a function.
+
+    The time is the best of `repeat` runs, timed with time.perf_counter. The peak
+    memory is the largest size of the Python allocations traced by tracemalloc
+    during one more run, which is kept apart because tracing slows the run down.
+
+    Args:
+        func (callable): The function to measure.
+        repeat (int): The number of timed runs.
+
+    Returns:
+        dict: The "time" in seconds and the peak "memory" in bytes.
+    """
+    if getattr(func, "measured", False):
+        runs = [func() for _ in range(repeat)]
+        return {"time": min(run[0] for run in runs), "memory": max(run[1] for run in runs)}
+
+    times = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        func()
+        memory = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return {"time": min(times), "memory": memory}
+
+
+def run(scale="small", pattern="*", repeat=3, workdir=None, progress=None):
+    """Runs the benchmark cases at a scale.
+
+    Args:
+        scale (str): "small", "medium" or "large".
+        pattern (str): A shell-style pattern selecting cases by name.
+        repeat (int): The number of timed runs per case.
+        workdir (str, optional): The directory for the generated data. Defaults
+            to None, which uses a temporary directory removed afterwards.
+        progress (callable, optional): Called with the name and the results of
+            each case as it finishes.
+
+    Returns:
+        dict: The results of each case by name, with the "time" in seconds, the
+            "relative" time in units of the reference workload and the peak
+            "memory" in bytes, or {"skipped": reason} for cases whose optional
+            dependencies are missing.
+    """
+    if scale not in SCALES:
+        raise ValueError(f"scale must be one of {', '.join(SCALES)}.")
+
+    tmp = workdir is None
+    if tmp:
+        workdir = tempfile.mkdtemp(prefix="tight_loops_bench_")
+
+    results = {}
+    reference = None
+    try:
+        for name, (func, sizes) in CASES.items():
+            if not fnmatch.fnmatch(name, pattern):
+                continue
+            try:
+                target = func(workdir, sizes[scale])
+                target.measured = func.measured
+                result = measure(target, repeat=repeat)
+                if reference is None:
+                    reference = calibrate()
+                result["relative"] = result["time"] / reference
+            except ImportError as e:
+                result = {"skipped": str(e)}
+            result["size"] = sizes[scale]
+            results[name] = result
+            if progress is not None:
+                progress(name, result)
+    finally:
+        if tmp:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return results
+
+
+def load_baselines(path=BASELINES):
+    """Returns the stored baselines, or an empty dict if there are none."""
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_baselines(results, scale, path=BASELINES):
+    """Stores results as the baselines of a scale, keeping the other scales.
+
+    Only the relative times are stored, as the absolute ones depend on the machine.
+    """
+    baselines = load_baselines(path)
+    stored = baselines.setdefault(scale, {})
+    for name, result in results.items():
+        if "skipped" not in result:
+            stored[name] = {key: result[key] for key in ("relative", "memory", "size")}
+    with open(path, "w") as f:
+        json.dump(baselines, f, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def compare(results, baselines, tolerance=None, slack=None):
+    """Compares results against baselines.
+
+    A measurement regresses when it exceeds its baseline by more than the
+    relative `tolerance` plus the absolute `slack`. Times are compared relative
+    to the reference workload, so baselines from another machine still apply.
+
+    Args:
+        results (dict): The results of run().
+        baselines (dict): The baselines of the same scale, by case name.
+        tolerance (dict, optional): The relative tolerance per measurement.
+            Defaults to None, which uses TOLERANCE.
+        slack (dict, optional): The absolute slack per measurement. Defaults to
+            None, which uses SLACK.
+
+    Returns:
+        list: A (case, measurement, value, baseline) tuple per regression.
+    """
+    tolerance = dict(TOLERANCE, **(tolerance or {}))
+    slack = dict(SLACK, **(slack or {}))
+
+    regressions = []
+    for name, result in results.items():
+        baseline = baselines.get(name)
+        if baseline is None or "skipped" in result or baseline.get("size") != result["size"]:
+            continue
+        # The slack of the time is converted to units of the reference workload.
+        reference = result["time"] / result["relative"] if result["relative"] else 1.0
+        checks = {
+            "time": (result["relative"], baseline["relative"], slack["time"] / reference),
+            "memory": (result["memory"], baseline["memory"], slack["memory"]),
+        }
+        for key, (value, base, allowed) in checks.items():
+            if value > base * (1 + tolerance[key]) + allowed:
+                regressions.append((name, key, value, base))
+    return regressions
+
+
+def format_row(name, result, baseline=None):
+    """Returns a line of the report for a case."""
+    if "skipped" in result:
+        return f"{name:<24} skipped: {result['skipped']}"
+    line = f"{name:<24} {result['size']:>9} {result['time'] * 1000:>11.1f} ms {result['memory'] / 2 ** 20:>9.1f} MiB"
+    if baseline is not None and baseline.get("size") == result["size"]:
+        line += f"   ({result['relative'] / max(baseline['relative'], 1e-9):.2f}x time, {result['memory'] / max(baseline['memory'], 1):.2f}x memory)"
+    return line
+
+
+def main(argv=None):
+    """Runs the benchmarks from the command line and returns the exit status."""
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description=__doc__)
+    parser.add_argument("--scale", default="small", choices=SCALES, help="The size of the data.")
+    parser.add_argument("--case", default="*", help="A shell-style pattern selecting cases by name.")
+    parser.add_argument("--repeat", type=int, default=3, help="The number of timed runs per case.")
+    parser.add_argument("--baselines", default=BASELINES, help="The baselines JSON file.")
+    parser.add_argument("--update", action="store_true", help="Store the results as the new baselines.")
+    parser.add_argument("--time-tolerance", type=float, default=TOLERANCE["time"], help="The allowed relative increase of time.")
+    parser.add_argument("--memory-tolerance", type=float, default=TOLERANCE["memory"], help="The allowed relative increase of peak memory.")
+    parser.add_argument("--json", help="Also write the results to this JSON file.")
+    args = parser.parse_args(argv)
+
+    baselines = load_baselines(args.baselines).get(args.scale, {})
+    print(f"{'case':<24} {'size':>9} {'time':>14} {'peak memory':>13}")
+    results = run(
+        args.scale,
+        args.case,
+        repeat=args.repeat,
+        progress=lambda name, result: print(format_row(name, result, baselines.get(name)), flush=True),
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.update:
+        save_baselines(results, args.scale, args.baselines)
+        print(f"Stored the baselines of the {args.scale} scale in {args.baselines}.")
+        return 0
+
+    regressions = compare(results, baselines, {"time": args.time_tolerance, "memory": args.memory_tolerance})
+    for name, key, value, baseline in regressions:
+        unit = " (relative)" if key == "time" else ""
+        print(f"REGRESSION: {name} {key}{unit} {value:.4g} exceeds the baseline {baseline:.4g}", file=sys.stderr)
+    return 1 if regressions else 0
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.basemaps` and basemap swapping."""
+
+import unittest
+import warnings
+
+import folium
+
+from tight_loops import folium_loops, tight_loops
+from tight_loops.basemaps import basemap_index, basemap_names, get_basemap
+
+
+class TestBasemaps(unittest.TestCase):
+    """Tests for the basemap registry."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_lookup_ignores_case_and_separators(self):
+        basemap = get_basemap("Esri.WorldImagery")
+        self.assertEqual(get_basemap("esri worldimagery"), basemap)
+        self.assertEqual(get_basemap("ESRI_WorldImagery"), basemap)
+        self.assertIn("World_Imagery", basemap["url"])
+        self.assertEqual(get_basemap("roadmap")["attribution"], "Google")
+        self.assertEqual(get_basemap("OpenStreetMap")["name"], "OpenStreetMap.Mapnik")
+
+    def test_index_is_built_once(self):
+        self.assertIs(basemap_index(), basemap_index())
+        self.assertIn("Satellite", basemap_names())
+
+    def test_invalid_name(self):
+        with self.assertRaisesRegex(ValueError, "Esri.WorldImagery"):
+            get_basemap("esri.worldimgery")
+
+    def test_ipyleaflet_basemap_is_swapped_in_place(self):
+        m = tight_loops.Map(headless=True)
+        count = len(m.layers)
+        layer = m.add_basemap("Satellite")
+        self.assertIs(m.add_basemap("CartoDB.Positron"), layer)
+        self.assertEqual(len(m.layers), count)
+        self.assertEqual(layer.name, "CartoDB.Positron")
+        self.assertIn("cartocdn", layer.url)
+        self.assertEqual(sum(1 for layer in m.layers if getattr(layer, "base", False)), 1)
+        m.add_basemap("Satellite", opacity=0.5)
+        self.assertEqual(layer.opacity, 0.5)
+        with self.assertRaises(TypeError):
+            m.add_basemap("Roadmap", opacty=0.5)
+        self.assertEqual(layer.name, "Satellite")
+
+    def test_folium_basemap_is_swapped_in_place(self):
+        m = folium_loops.Map()
+        m.add_basemap("Satellite")
+        m.add_basemap("Esri.WorldImagery")
+        layers = [child for child in m._children.values() if isinstance(child, folium.TileLayer)]
+        self.assertEqual(len(layers), 1)
+        html = m.get_root().render()
+        self.assertIn("World_Imagery", html)
+        self.assertNotIn("lyrs=s", html)
+
+
+if __name__ == '__main__':
+    unittest.main()
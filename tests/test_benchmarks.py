@@ -0,0 +1,79 @@
+#!/usr/bin/env python
+
+"""Tests for the `benchmarks` suite."""
+
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from benchmarks import data, runner
+from benchmarks.cases import CASES
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Tests for the benchmark runner."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self.tmp)
+
+    def test_data_is_reproducible(self):
+        """Test that the synthetic data is seeded."""
+        self.assertTrue(data.random_points(100, seed=1).equals(data.random_points(100, seed=1)))
+        polygons = data.random_polygons(10)
+        self.assertEqual(len(polygons), 10)
+        self.assertTrue(polygons.geometry.is_valid.all())
+        self.assertEqual(data.dem_array(32).shape, (32, 32))
+
+    def test_every_case_has_all_scales(self):
+        """Test that every case has a size at every scale."""
+        for name, (func, sizes) in CASES.items():
+            self.assertEqual(sorted(sizes), sorted(runner.SCALES), name)
+
+    def test_measure(self):
+        """Test measuring the time and the peak memory of a function."""
+        result = runner.measure(lambda: bytearray(10 ** 6), repeat=2)
+        self.assertGreater(result["time"], 0)
+        self.assertGreaterEqual(result["memory"], 10 ** 6)
+
+    def test_run_and_compare(self):
+        """Test running a case and comparing it against stored baselines."""
+        results = runner.run("small", "add_raster", repeat=1, workdir=self.tmp)
+        self.assertEqual(list(results), ["add_raster"])
+        self.assertEqual(results["add_raster"]["size"], 10)
+
+        path = os.path.join(self.tmp, "baselines.json")
+        runner.save_baselines(results, "small", path)
+        baselines = runner.load_baselines(path)["small"]
+        self.assertEqual(runner.compare(results, baselines), [])
+
+        result = results["add_raster"]
+        slower = {"add_raster": dict(result, time=result["time"] * 3 + 1, relative=result["relative"] * (3 + 1 / result["time"]))}
+        self.assertEqual([r[:2] for r in runner.compare(slower, baselines)], [("add_raster", "time")])
+        # Baselines measured at another size are not compared.
+        bigger = {"add_raster": dict(slower["add_raster"], size=100)}
+        self.assertEqual(runner.compare(bigger, baselines), [])
+
+    def test_main_fails_on_regression(self):
+        """Test that the command fails when a case regresses."""
+        path = os.path.join(self.tmp, "baselines.json")
+        args = ["--case", "add_raster", "--repeat", "1", "--baselines", path]
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output), contextlib.redirect_stderr(output):
+            self.assertEqual(runner.main(args + ["--update"]), 0)
+            baselines = runner.load_baselines(path)
+            baselines["small"]["add_raster"].update(relative=0, memory=0)
+            runner.save_baselines(baselines["small"], "small", path)
+            self.assertEqual(runner.main(args), 1)
+        self.assertIn("REGRESSION: add_raster", output.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.cache` module."""
+
+
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import geopandas as gpd
+from shapely.geometry import box
+
+from tight_loops import cache, vector
+
+
+@unittest.skipUnless(importlib.util.find_spec("pyarrow"), "requires pyarrow")
+class TestCache(unittest.TestCase):
+    """Tests for `tight_loops.cache` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "boxes.shp")
+        gdf = gpd.GeoDataFrame({"id": [1, 2]}, geometry=[box(0, 0, 1, 1), box(1, 0, 2, 1)], crs="EPSG:4326")
+        gdf.to_crs(epsg=3857).to_file(self.path)
+        self.store = cache.VectorCache(os.path.join(self.tmpdir.name, "cache"))
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def test_read_vector(self):
+        """Test that a second read is served from the cache."""
+        first = vector.read_vector(self.path, cache=self.store)
+        self.assertEqual(self.store.info()["count"], 1)
+        second = vector.read_vector(self.path, cache=self.store)
+        self.assertTrue(second.crs.equals("EPSG:4326"))
+        self.assertEqual(list(second["id"]), list(first["id"]))
+
+        vector.read_vector(self.path, columns=[], cache=self.store)
+        self.assertEqual(self.store.info()["count"], 2)
+        self.store.clear()
+        self.assertEqual(self.store.info()["count"], 0)
+
+    def test_without_pyarrow(self):
+        """Test that the file is read uncached with a warning when pyarrow is missing."""
+        from unittest import mock
+
+        with mock.patch.object(cache, "cache_available", return_value=False):
+            with self.assertWarns(UserWarning):
+                gdf = vector.read_vector(self.path, cache=self.store)
+        self.assertEqual(len(gdf), 2)
+        self.assertEqual(self.store.info()["count"], 0)
+
+    def test_key_changes_with_file(self):
+        """Test that rewriting the file invalidates its key."""
+        key = cache.cache_key(self.path, crs="EPSG:4326")
+        os.utime(self.path, ns=(0, 0))
+        self.assertNotEqual(key, cache.cache_key(self.path, crs="EPSG:4326"))
+
+    def test_eviction(self):
+        """Test that the least recently used entry is evicted first."""
+        gdf = vector.read_vector(self.path)
+        self.store.put("a", gdf)
+        size = self.store.info()["size"]
+        self.store.max_size = int(size * 2.5)
+        os.utime(self.store._path("a"), (1, 1))
+        self.store.put("b", gdf)
+        self.store.put("c", gdf)
+        keys = {entry["key"] for entry in self.store.info()["entries"]}
+        self.assertEqual(keys, {"b", "c"})
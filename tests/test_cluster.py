@@ -0,0 +1,81 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.cluster` module."""
+
+
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from tight_loops import tight_loops
+from tight_loops.cluster import PointClusterIndex
+from tight_loops.view import pad_bounds, split_bounds
+
+
+class TestCluster(unittest.TestCase):
+    """Tests for `tight_loops.cluster` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        rng = np.random.default_rng(0)
+        self.lon = rng.uniform(-90, -80, 1000)
+        self.lat = rng.uniform(30, 40, 1000)
+        self.index = PointClusterIndex(self.lon, self.lat, max_zoom=12)
+
+    def test_counts(self):
+        """Test that every zoom level accounts for every point."""
+        for zoom in range(0, 14):
+            self.assertEqual(self.index.query(zoom)["count"].sum(), 1000)
+        self.assertEqual(len(self.index.query(0)["count"]), 1)
+        self.assertEqual(len(self.index.query(13)["count"]), 1000)
+
+    def test_bounds(self):
+        """Test that only the clusters inside the bounds are returned."""
+        clusters = self.index.query(13, ((30, -90), (35, -85)))
+        inside = (self.lon <= -85) & (self.lat <= 35)
+        self.assertEqual(len(clusters["count"]), inside.sum())
+        self.assertTrue(np.all(clusters["lon"] <= -85 + 1e-9))
+
+    def test_antimeridian(self):
+        """Test bounds crossing the antimeridian, with west > east or east > 180."""
+        index = PointClusterIndex([179.5, -179.5, 0.0], [0.0, 0.0, 0.0], max_zoom=12)
+        for bounds in [((-10, 170), (10, -170)), ((-10, 170), (10, 190))]:
+            clusters = index.query(13, bounds)
+            self.assertEqual(sorted(clusters["point"].tolist()), [0, 1])
+
+    def test_split_bounds(self):
+        """Test splitting and padding view bounds."""
+        self.assertEqual(split_bounds(((0, 10), (1, 20))), [(10, 0, 20, 1)])
+        self.assertEqual(split_bounds(((0, 170), (1, -170))), [(170, 0, 180, 1), (-180, 0, -170, 1)])
+        self.assertEqual(split_bounds(((0, -200), (1, -170))), [(160, 0, 180, 1), (-180, 0, -170, 1)])
+        self.assertEqual(split_bounds(((0, -180), (1, 200))), [(-180, 0, 180, 1)])
+        self.assertEqual(pad_bounds(((0, 170), (10, -170)), 0.5), ((-5, 160), (15, 200)))
+        self.assertEqual(pad_bounds(((-80, 0), (80, 10)), 0.5)[0][0], -90)
+
+
+class TestGroupingPoints(unittest.TestCase):
+    """Tests for adding clustered points to the map."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+        self.map = tight_loops.Map(headless=True)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_default_popup(self):
+        """Test that the default popup follows the coordinate columns."""
+        df = pd.DataFrame({"lng": [-84.0, -83.0], "lat": [35.0, 36.0], "city": ["a", "b"]})
+        layer = self.map.grouping_points(df, x="lng", y="lat")
+        self.assertEqual(layer.popup_columns, ["lat", "lng"])
+        layer._open_popup(1)
+        self.assertIn("36.0", layer._popup.child.value)
+        layer = self.map.grouping_points(df.rename(columns={"city": "name"}), x="lng", y="lat")
+        self.assertEqual(layer.popup_columns, ["name", "lat", "lng"])
+
+
+if __name__ == '__main__':
+    unittest.main()
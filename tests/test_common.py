@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.common` module."""
+
+
+import unittest
+
+from tight_loops.common import generate_random_string, generate_random_strings
+
+
+class TestRandomStrings(unittest.TestCase):
+    """Tests for the random string generators."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_single_string(self):
+        value = generate_random_string()
+        self.assertEqual(len(value), 15)
+        self.assertTrue(value.islower())
+        self.assertEqual(len(generate_random_string(4)), 4)
+
+    def test_bulk_strings(self):
+        values = generate_random_strings(1000, length=8, alphabet="ABC123")
+        self.assertEqual(len(values), 1000)
+        self.assertTrue(all(len(value) == 8 and set(value) <= set("ABC123") for value in values))
+        self.assertEqual(len(set(values)), 1000)
+        self.assertEqual(generate_random_strings(0), [])
+        self.assertEqual(generate_random_strings(3, 2, "αβγ", seed=1), generate_random_strings(3, 2, "αβγ", seed=1))
+
+    def test_seed(self):
+        self.assertEqual(generate_random_strings(10, seed=42), generate_random_strings(10, seed=42))
+        self.assertNotEqual(generate_random_strings(10, seed=42), generate_random_strings(10, seed=43))
+
+    def test_unique(self):
+        # Every string of the alphabet is drawn, so duplicates must be redrawn.
+        self.assertEqual(sorted(generate_random_strings(16, 4, "01", seed=0)), [format(i, "04b") for i in range(16)])
+        # Long strings are compared as bytes.
+        self.assertEqual(len(set(generate_random_strings(500, 80, "ab", seed=0))), 500)
+        with self.assertRaises(ValueError):
+            generate_random_strings(17, 4, "01")
+        self.assertEqual(len(generate_random_strings(17, 4, "01", unique=False)), 17)
+
+    def test_secure(self):
+        values = generate_random_strings(200, 6, alphabet="xyz", secure=True)
+        self.assertEqual(len(set(values)), 200)
+        self.assertTrue(all(set(value) <= set("xyz") for value in values))
+        with self.assertRaises(ValueError):
+            generate_random_strings(1, secure=True, seed=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.contour` module."""
+
+
+import importlib.util
+import math
+import os
+import tempfile
+import unittest
+
+import geopandas as gpd
+import numpy as np
+from affine import Affine
+
+from tight_loops import contour
+
+
+class TestContour(unittest.TestCase):
+    """Tests for `tight_loops.contour` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        rows, cols = np.mgrid[0:201, 0:201]
+        self.cone = np.hypot(rows - 100, cols - 100)
+        self.transform = Affine(1, 0, 0, 0, -1, 0)
+
+    def test_circle(self):
+        """Test that a cone gives closed circles of the right length."""
+        gdf = contour.contour_array(self.cone, self.transform, [20.5, 60.5], max_workers=1)
+        self.assertEqual(len(gdf), 2)
+        self.assertTrue(all(gdf.geometry.is_ring))
+        for height, length in zip(gdf["HEIGHT"], gdf.length):
+            self.assertAlmostEqual(length, 2 * math.pi * height, delta=0.01 * length)
+
+    def test_tiles_stitch(self):
+        """Test that tiled contouring stitches lines across the seams."""
+        single = contour.contour_array(self.cone, self.transform, [20.5, 60.5], max_workers=1, tile_size=1000)
+        tiled = contour.contour_array(self.cone, self.transform, [20.5, 60.5], max_workers=1, tile_size=16)
+        self.assertEqual(len(tiled), len(single))
+        self.assertAlmostEqual(tiled.length.sum(), single.length.sum())
+
+    def test_nodata(self):
+        """Test that cells touching nodata are skipped."""
+        data = self.cone.copy()
+        data[:, 100] = np.nan
+        gdf = contour.contour_array(data, self.transform, [60.5], max_workers=1)
+        self.assertEqual(len(gdf), 2)
+        self.assertFalse(any(gdf.geometry.is_ring))
+
+    def test_smooth_and_levels(self):
+        """Test the smoothing filter and the contour levels."""
+        data = np.arange(25, dtype="float64").reshape(5, 5)
+        self.assertAlmostEqual(contour.smooth_array(data, 3)[2, 2], 12.0)
+        self.assertEqual(contour.contour_levels(data, 10, 5), [5, 15])
+
+    def test_whitebox_requires_output(self):
+        """Test that the whitebox engine asks for an output file."""
+        from tight_loops.common import contour_tif_box
+
+        with self.assertRaises(ValueError):
+            contour_tif_box("dem.tif", engine="whitebox")
+
+
+@unittest.skipUnless(importlib.util.find_spec("rasterio"), "requires rasterio")
+class TestContourBatch(unittest.TestCase):
+    """Tests for `tight_loops.contour.contour_batch`."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        import rasterio
+
+        self.tmpdir = tempfile.TemporaryDirectory()
+        rows, cols = np.mgrid[0:60, 0:60]
+        for k in range(2):
+            path = os.path.join(self.tmpdir.name, f"dem{k}.tif")
+            profile = dict(driver="GTiff", width=60, height=60, count=1, dtype="float32", crs="EPSG:32617")
+            with rasterio.open(path, "w", transform=Affine(30, 0, 0, 0, -30, 0), **profile) as dst:
+                dst.write((rows * 10 + cols * (k + 1)).astype("float32"), 1)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def test_batch_cache(self):
+        """Test that a second run reuses the outputs of the first."""
+        pattern = os.path.join(self.tmpdir.name, "dem*.tif")
+        out = os.path.join(self.tmpdir.name, "out")
+        first = contour.contour_batch(pattern, out, intervals=[100, 200], max_workers=2, progress=False)
+        self.assertEqual(len(first), 4)
+        self.assertFalse(any(record["cached"] for record in first))
+        self.assertTrue(all(os.path.exists(record["output"]) for record in first))
+
+        second = contour.contour_batch(pattern, out, intervals=[100, 200, 300], max_workers=2, progress=False)
+        self.assertEqual([record["cached"] for record in second], [True, True, False] * 2)
+
+    def test_batch_shapefile(self):
+        """Test that Shapefile outputs are renamed into place with their sidecars."""
+        path = os.path.join(self.tmpdir.name, "dem0.tif")
+        out = os.path.join(self.tmpdir.name, "out")
+        (record,) = contour.contour_batch(path, out, max_workers=1, extension=".shp", progress=False)
+        stem = os.path.splitext(os.path.basename(record["output"]))[0]
+        files = sorted(os.listdir(out))
+        self.assertFalse(any(".tmp" in name for name in files))
+        self.assertEqual([os.path.splitext(name)[0] for name in files], [stem] * len(files))
+        self.assertIn(stem + ".dbf", files)
+        self.assertGreater(len(gpd.read_file(record["output"])), 0)
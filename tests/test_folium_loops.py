@@ -0,0 +1,177 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.folium_loops` package."""
+
+import gzip
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import folium
+
+from tight_loops import folium_loops
+
+
+def points(n):
+    """Returns a GeoJSON FeatureCollection of n points."""
+    features = [
+        {
+            "type": "Feature",
+            "properties": {"id": i},
+            "geometry": {"type": "Point", "coordinates": [i % 180, i % 80]},
+        }
+        for i in range(n)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+class TestToHtml(unittest.TestCase):
+    """Tests for rendering folium maps to HTML."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmp = tempfile.mkdtemp()
+        self.map = folium_loops.Map()
+        folium.GeoJson(points(2000), name="points").add_to(self.map)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        shutil.rmtree(self.tmp)
+
+    def test_returns_cached_html(self):
+        """Test that an unchanged map returns the cached HTML."""
+        html = self.map.to_html()
+        self.assertIn("geo_json_", html)
+        self.assertIs(self.map.to_html(), html)
+
+    def test_changes_invalidate_cache(self):
+        """Test that added layers and basemap changes are rendered."""
+        html = self.map.to_html()
+        folium.Marker([10, 10]).add_to(self.map)
+        self.assertIsNot(self.map.to_html(), html)
+        html = self.map.to_html()
+        self.map.add_basemap("Satellite")
+        self.assertIn("lyrs=s", self.map.to_html())
+
+    def test_changes_in_place_invalidate_cache(self):
+        """Test that changes made in place are rendered."""
+        html = self.map.to_html()
+        self.map.location = [10.0, 20.0]
+        self.assertIn("[10.0, 20.0]", self.map.to_html())
+        self.map.options["zoomSnap"] = 0.25
+        self.assertIn("0.25", self.map.to_html())
+        group = folium.FeatureGroup(name="group").add_to(self.map)
+        html = self.map.to_html()
+        folium.Marker([1.5, 2.5]).add_to(group)
+        self.assertIn("[1.5, 2.5]", self.map.to_html())
+        self.assertIsNot(self.map.to_html(), html)
+
+    def test_writes_file(self):
+        """Test writing the HTML to a file and rejecting other extensions."""
+        filename = os.path.join(self.tmp, "out", "map.html")
+        html = self.map.to_html(filename)
+        with open(filename, encoding="utf-8") as f:
+            self.assertEqual(f.read(), html)
+        with self.assertRaises(ValueError):
+            self.map.to_html(os.path.join(self.tmp, "map.txt"))
+
+    def test_sidecars(self):
+        """Test moving large GeoJson layers to gzip compressed sidecar files."""
+        filename = os.path.join(self.tmp, "map.html")
+        # The first render of the map adds the jQuery include, which the loader needs.
+        html = self.map.to_html(filename, sidecars=True, sidecar_threshold=1000)
+        self.assertIn("ajaxTransport", html)
+        self.assertLess(html.index("jquery"), html.index("ajaxTransport"))
+        self.assertLess(html.index("ajaxTransport"), html.index("$.ajax(\"map_files/"))
+        inline = self.map.to_html()
+        self.assertLess(len(html), len(inline) / 10)
+
+        files = os.listdir(os.path.join(self.tmp, "map_files"))
+        self.assertEqual(len(files), 1)
+        self.assertTrue(files[0].endswith(".geojson.gz"))
+        self.assertIn(f"map_files/{files[0]}", html)
+        with open(os.path.join(self.tmp, "map_files", files[0]), "rb") as f:
+            data = json.loads(gzip.decompress(f.read()))
+        self.assertEqual(len(data["features"]), 2000)
+
+        # The layers are inlined again afterwards.
+        self.assertEqual(self.map.to_html(), inline)
+        with self.assertRaises(ValueError):
+            self.map.to_html(sidecars=True)
+
+    def test_minify(self):
+        """Test removing the indentation and blank lines."""
+        html = self.map.to_html(minify=True)
+        self.assertLess(len(html), len(self.map.to_html()))
+        self.assertFalse(any(line != line.strip() or not line for line in html.splitlines()))
+
+    def test_minify_keeps_whitespace_sensitive_blocks(self):
+        """Test that <pre>, <textarea> and template literals are left untouched."""
+        pre = "<pre>\n  a\n\n    b\n</pre>"
+        textarea = "<TEXTAREA rows=2>\n  c\n</TEXTAREA>"
+        script = "var t = `\n    d\n`;\n    f();"
+        html = folium_loops.minify_html(f"<div>\n    {pre}\n    {textarea}\n</div>\n<script>\n    {script}\n</script>")
+        self.assertIn(pre, html)
+        self.assertIn(textarea, html)
+        self.assertIn("var t = `\n    d\n`;\nf();", html)
+
+
+class TestChildIndex(unittest.TestCase):
+    """Tests for the index of the children of folium maps."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.map = folium_loops.Map()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_layer_control_is_added_once(self):
+        """Test that the layer control is found without serializing the map."""
+        self.map.to_dict = None  # Existence checks must not serialize the map.
+        self.map.add_layer_control()
+        self.map.add_layer_control()
+        self.assertEqual(len(self.map.find_children(folium.LayerControl)), 1)
+        self.assertEqual(len(self.map.find_children("LayerControl")), 1)
+
+    def test_find_layer(self):
+        """Test finding layers by name and children by type."""
+        layer = self.map.add_tile_layer("https://example.com/{z}/{x}/{y}.png", "tiles", "Example", overlay=True)
+        geojson = folium.GeoJson(points(3), name="points").add_to(self.map)
+        self.assertIs(self.map.find_layer("tiles"), layer)
+        self.assertIs(self.map.find_layer("points"), geojson)
+        self.assertIsNone(self.map.find_layer("missing"))
+        self.assertEqual(self.map.find_children(folium.GeoJson), [geojson])
+
+    def test_basemap_is_renamed(self):
+        """Test that swapping the basemap renames its layer."""
+        layer = self.map.add_basemap("Satellite")
+        self.assertIs(self.map.find_layer("Satellite"), layer)
+        self.map.add_basemap("Roadmap")
+        self.assertIsNone(self.map.find_layer("Satellite"))
+        self.assertIs(self.map.find_layer("Roadmap"), layer)
+
+    def test_add_many_shapefiles(self):
+        """Test adding many Shapefiles merged or as a group."""
+        import geopandas as gpd
+
+        tmp = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmp)
+        gdf = gpd.GeoDataFrame.from_features(points(6)["features"], crs="EPSG:4326")
+        for i in range(3):
+            gdf.iloc[i * 2:i * 2 + 2].to_crs(epsg=3857).to_file(os.path.join(tmp, f"part{i}.shp"))
+        pattern = os.path.join(tmp, "part*.shp")
+
+        layer = self.map.add_shp(pattern)
+        self.assertEqual(len(layer.data["features"]), 6)
+        self.assertAlmostEqual(layer.data["features"][5]["geometry"]["coordinates"][0], 5)
+        group = self.map.add_shp(pattern, merge=False, name="parts")
+        self.assertIsInstance(group, folium.FeatureGroup)
+        self.assertEqual([type(child) for child in group._children.values()], [folium.GeoJson] * 3)
+        self.assertEqual(group.errors, {})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,164 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.geocoder` module."""
+
+
+import json
+import os
+import shutil
+import tempfile
+import unittest
+import warnings
+
+import geopandas as gpd
+import httpx
+import pandas as pd
+
+from tight_loops import tight_loops
+from tight_loops.geocoder import GeocodeServer, Gazetteer, haversine, normalize
+from tight_loops.server import LocalServer
+
+PLACES = pd.DataFrame(
+    {
+        "name": ["New York", "York", "Yorktown Heights", "São Paulo", "Newark", "Paris", "Paris"],
+        "longitude": [-74.006, -1.082, -73.777, -46.633, -74.172, 2.352, -95.555],
+        "latitude": [40.713, 53.960, 41.271, -23.550, 40.736, 48.857, 33.661],
+        "population": [8_300_000, 150_000, 1_800, 12_300_000, 311_000, 2_100_000, 25_000],
+        "country": ["US", "GB", "US", "BR", "US", "FR", "US"],
+    }
+)
+
+
+class TestGazetteer(unittest.TestCase):
+    """Tests for searching a gazetteer."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.gazetteer = Gazetteer(
+            PLACES["name"], PLACES["longitude"], PLACES["latitude"], rank=PLACES["population"], attributes=PLACES[["country"]]
+        )
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def names(self, query, **kwargs):
+        return [place["display_name"] for place in self.gazetteer.search(query, **kwargs)]
+
+    def test_normalize(self):
+        """Test removing accents, case and punctuation."""
+        self.assertEqual(normalize("  São-Paulo!! "), "sao paulo")
+
+    def test_prefix_search(self):
+        """Test matching the start of names and of later words, by rank."""
+        # Exact names first, then names starting with the query, then other words.
+        self.assertEqual(self.names("york", fuzzy=None), ["York", "Yorktown Heights", "New York"])
+        self.assertEqual(self.names("new", fuzzy=None), ["New York", "Newark"])
+        self.assertEqual(self.names("SAO P"), ["São Paulo"])
+        self.assertEqual(self.names("paris", limit=1), ["Paris"])
+        self.assertEqual(self.gazetteer.search("paris")[0]["country"], "FR")
+        self.assertEqual(self.names(""), [])
+
+    def test_fuzzy_search(self):
+        """Test finding misspelled names through trigrams."""
+        self.assertEqual(self.names("new yrok"), ["New York"])
+        self.assertEqual(self.names("new yrok", fuzzy=None), [])
+
+    def test_results_are_cached(self):
+        """Test that normalized queries share cached results."""
+        self.gazetteer.search("york")
+        self.gazetteer.search("York ")
+        self.assertEqual(self.gazetteer._search.cache_info().hits, 1)
+        self.gazetteer.clear_cache()
+        self.assertEqual(self.gazetteer._search.cache_info().currsize, 0)
+
+    def test_reverse(self):
+        """Test finding the nearest place within a distance."""
+        place = self.gazetteer.reverse(40.74, -74.17)
+        self.assertEqual(place["display_name"], "Newark")
+        self.assertLess(place["distance"], 1)
+        self.assertIsNone(self.gazetteer.reverse(0, 0, max_distance=100))
+        self.assertAlmostEqual(float(haversine(0, 0, 1, 0)), 111.19, places=1)
+
+    def test_reverse_antimeridian(self):
+        """Test that places across the antimeridian are found."""
+        gazetteer = Gazetteer(["Taveuni", "Labasa"], [-179.9, 178.0], [-16.8, -16.8])
+        self.assertEqual(gazetteer.reverse(-16.8, 179.9)["display_name"], "Taveuni")
+        self.assertEqual(gazetteer.reverse(-16.8, -179.0)["display_name"], "Taveuni")
+
+    def test_long_names(self):
+        """Test that a long name does not widen the keys of every name."""
+        names = ["A" * 1000, "Knoxville", "Oak Ridge"]
+        gazetteer = Gazetteer(names, [0, 1, 2], [0, 1, 2])
+        self.assertEqual(gazetteer._keys.dtype, object)
+        self.assertEqual([place["display_name"] for place in gazetteer.search("a" * 1000)], [names[0]])
+        self.assertEqual(gazetteer.search("a" * 1001, fuzzy=None), [])
+        self.assertEqual([place["display_name"] for place in gazetteer.search("ridge")], ["Oak Ridge"])
+
+    def test_from_file(self):
+        """Test loading a gazetteer from CSV and vector files."""
+        tmp = tempfile.mkdtemp()
+        try:
+            csv = os.path.join(tmp, "places.csv")
+            PLACES.to_csv(csv, index=False)
+            gazetteer = Gazetteer.from_file(csv, rank="population", columns=["country"])
+            self.assertEqual(gazetteer.search("par")[0]["country"], "FR")
+
+            gpkg = os.path.join(tmp, "places.gpkg")
+            gdf = gpd.GeoDataFrame(PLACES, geometry=gpd.points_from_xy(PLACES["longitude"], PLACES["latitude"]), crs="EPSG:4326")
+            gdf.to_crs(epsg=3857).to_file(gpkg)
+            gazetteer = Gazetteer.from_file(gpkg)
+            self.assertEqual(len(gazetteer), 7)
+            self.assertAlmostEqual(float(gazetteer.search("york")[0]["lat"]), 53.960, places=3)
+        finally:
+            shutil.rmtree(tmp)
+
+
+class TestGeocodeServer(unittest.TestCase):
+    """Tests for serving gazetteers over HTTP."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+        self.server = LocalServer()
+        self.geocoder = GeocodeServer(self.server)
+        gazetteer = Gazetteer(PLACES["name"], PLACES["longitude"], PLACES["latitude"], rank=PLACES["population"])
+        self.url = self.geocoder.add_gazetteer(gazetteer)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.server.shutdown()
+
+    def test_search(self):
+        """Test the search endpoint."""
+        response = httpx.get(f"{self.url}/search", params={"format": "json", "q": "york", "limit": 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([place["display_name"] for place in response.json()], ["York", "Yorktown Heights"])
+
+    def test_jsonp(self):
+        """Test JSONP responses and rejecting unsafe callbacks."""
+        response = httpx.get(f"{self.url}/search", params={"q": "paris", "json_callback": "L.Control.Search.callJsonp"})
+        self.assertEqual(response.headers["content-type"], "application/javascript")
+        body = response.text
+        self.assertTrue(body.startswith("L.Control.Search.callJsonp(") and body.endswith(");"))
+        self.assertEqual(json.loads(body[len("L.Control.Search.callJsonp("):-2])[0]["display_name"], "Paris")
+        response = httpx.get(f"{self.url}/search", params={"q": "paris", "json_callback": "alert(1)//"})
+        self.assertEqual(response.status_code, 400)
+
+    def test_reverse(self):
+        """Test the reverse endpoint and the error responses."""
+        response = httpx.get(f"{self.url}/reverse", params={"lat": 48.86, "lon": 2.35})
+        self.assertEqual(response.json()["display_name"], "Paris")
+        self.assertEqual(httpx.get(f"{self.url}/reverse").status_code, 400)
+        self.assertEqual(httpx.get(f"{self.server.url}/geocode/missing/search").status_code, 404)
+
+    def test_search_control(self):
+        """Test adding a search control backed by a gazetteer."""
+        m = tight_loops.Map(headless=True)
+        control = m.add_search_control(gazetteer=Gazetteer(["Knoxville"], [-83.92], [35.96]))
+        self.assertIn("/geocode/", control.url)
+        self.assertTrue(control.url.endswith("/search?format=json&q={s}"))
+        self.assertIn(control, m.controls)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.geojson_stream` module."""
+
+
+import json
+import os
+import tempfile
+import unittest
+
+from tight_loops import geojson_stream
+
+
+class TestGeojsonStream(unittest.TestCase):
+    """Tests for `tight_loops.geojson_stream` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "data.geojson")
+        features = [
+            {
+                "type": "Feature",
+                "properties": {"id": i, "kind": "even" if i % 2 == 0 else "odd"},
+                "geometry": {"type": "LineString", "coordinates": [[i, i], [i + 0.5, i + 0.5]]},
+            }
+            for i in range(50)
+        ]
+        data = {"type": "FeatureCollection", "name": "test", "features": features}
+        with open(self.path, "w") as f:
+            json.dump(data, f, indent=1)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def test_all_features(self):
+        """Test reading every feature with a small chunk size."""
+        features = list(geojson_stream.iter_features(self.path, chunk_size=7))
+        self.assertEqual([f["properties"]["id"] for f in features], list(range(50)))
+
+    def test_filters(self):
+        """Test the bbox, property and max_features filters."""
+        ids = lambda **kw: [f["properties"]["id"] for f in geojson_stream.iter_features(self.path, chunk_size=64, **kw)]
+        self.assertEqual(ids(bbox=(9.2, 9.2, 12, 12)), [9, 10, 11, 12])
+        self.assertEqual(ids(where={"kind": "odd"}, max_features=3), [1, 3, 5])
+        self.assertEqual(ids(where=lambda p: p["id"] > 47), [48, 49])
+
+    def test_filter_dict(self):
+        """Test filtering an in-memory FeatureCollection, directly and through add_geojson."""
+        import warnings
+
+        from tight_loops import tight_loops
+
+        with open(self.path) as f:
+            data = json.load(f)
+        data = geojson_stream.filter_features(data, bbox=(9.2, 9.2, 12, 12), where={"kind": "odd"})
+        self.assertEqual([f["properties"]["id"] for f in data["features"]], [9, 11])
+
+        warnings.simplefilter("ignore", DeprecationWarning)
+        with open(self.path) as f:
+            data = json.load(f)
+        m = tight_loops.Map(headless=True)
+        layer = m.add_geojson(data, bbox=(9.2, 9.2, 12, 12), max_features=2)
+        self.assertEqual([f["properties"]["id"] for f in layer.data["features"]], [9, 10])
+        self.assertEqual(len(data["features"]), 50)
+        layer = m.add_geojson(data, where=lambda p: p["id"] > 47, lazy=True, visible=False)
+        self.assertEqual(layer.data["features"], [])
+        layer.visible = True
+        self.assertEqual(len(layer.data["features"]), 2)
+
+    def test_lazy_loads_in_view(self):
+        """Test that a lazy layer loads once the view overlaps its box."""
+        import warnings
+
+        from tight_loops import tight_loops
+
+        warnings.simplefilter("ignore", DeprecationWarning)
+        m = tight_loops.Map(headless=True)
+        layer = m.add_geojson(self.path, bbox=(9.2, 9.2, 12, 12), lazy=True)
+        self.assertEqual(layer.data["features"], [])
+        m.set_trait("bounds", ((30, 30), (40, 40)))
+        self.assertEqual(layer.data["features"], [])
+        m.set_trait("bounds", ((10, 10), (20, 20)))
+        self.assertEqual([f["properties"]["id"] for f in layer.data["features"]], [9, 10, 11, 12])
+
@@ -0,0 +1,86 @@
+#!/usr/bin/env python
+
+"""Tests for the import time of the `tight_loops` package."""
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+
+HEAVY_MODULES = [
+    "ipyleaflet",
+    "ipywidgets",
+    "folium",
+    "geemap",
+    "geopandas",
+    "pandas",
+    "shapely",
+    "numpy",
+    "httpx",
+    "rasterio",
+    "whitebox",
+]
+
+# The time `import tight_loops` may take in a fresh interpreter, in seconds. Wall
+# clock time varies too much between runners to be checked by default, so it is
+# only checked when TIGHT_LOOPS_IMPORT_BUDGET is set. The benchmarks track it.
+IMPORT_BUDGET = os.environ.get("TIGHT_LOOPS_IMPORT_BUDGET")
+
+SCRIPT = """
+import json, sys, time
+start = time.perf_counter()
+import tight_loops
+from tight_loops import contour_tif_box, generate_random_string
+elapsed = time.perf_counter() - start
+print(json.dumps({"elapsed": elapsed, "modules": sorted(m for m in %r if m in sys.modules)}))
+""" % (HEAVY_MODULES,)
+
+
+def run_import(script):
+    """Runs a script in a fresh interpreter and returns its JSON output."""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run(
+        [sys.executable, "-c", script], cwd=root, check=True, capture_output=True, text=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+class TestImport(unittest.TestCase):
+    """Tests for the lazy imports of the package."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_import_is_light(self):
+        """Test that importing the package and its light names imports no heavy module."""
+        result = run_import(SCRIPT)
+        self.assertEqual(result["modules"], [])
+        if IMPORT_BUDGET:
+            self.assertLess(result["elapsed"], float(IMPORT_BUDGET))
+
+    def test_folium_module_does_not_import_geemap(self):
+        """Test that the folium module does not import geemap."""
+        result = run_import(
+            "import json, sys\n"
+            "import tight_loops.folium_loops\n"
+            "print(json.dumps({'modules': ['geemap'] if 'geemap' in sys.modules else []}))\n"
+        )
+        self.assertEqual(result["modules"], [])
+
+    def test_lazy_names(self):
+        """Test that the lazy names resolve to the objects of their modules."""
+        import tight_loops
+
+        self.assertTrue(callable(tight_loops.generate_random_string))
+        self.assertIn("Map", dir(tight_loops))
+        self.assertIs(tight_loops.Map, tight_loops.tight_loops.Map)
+        with self.assertRaises(AttributeError):
+            tight_loops.missing_name
+
+
+if __name__ == "__main__":
+    unittest.main()
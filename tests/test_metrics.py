@@ -0,0 +1,100 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.metrics` and the widgets created by maps."""
+
+import unittest
+import warnings
+
+import ipywidgets as widgets
+
+from tight_loops import tight_loops
+from tight_loops.metrics import WidgetMeter, count_widgets
+
+
+def toolbar_control(m):
+    """Returns the toolbar control of a map."""
+    for control in m.controls:
+        if isinstance(control, tight_loops.WidgetControl) and isinstance(control.widget, widgets.VBox):
+            return control
+
+
+class TestWidgetMeter(unittest.TestCase):
+    """Tests for the widget and message counters."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_meter_counts_widgets_and_messages(self):
+        with WidgetMeter() as meter:
+            slider = widgets.IntSlider()
+            slider.value = 5
+        stats = meter.stats()
+        # The slider, its layout and its style.
+        self.assertEqual(stats["widgets"], 3)
+        self.assertEqual(stats["types"]["IntSlider"], 1)
+        self.assertGreaterEqual(stats["messages"], 4)
+        self.assertGreater(stats["bytes"], 0)
+
+    def test_meter_stops(self):
+        meter = WidgetMeter().start()
+        meter.stop()
+        widgets.IntSlider()
+        self.assertEqual(meter.widgets, 0)
+        self.assertEqual(widgets.Widget.open.__name__, "open")
+
+    def test_count_widgets(self):
+        box = widgets.VBox([widgets.Button(), widgets.Button()])
+        # The box and each button with their layouts, and the button styles.
+        self.assertEqual(count_widgets(box), 8)
+
+
+class TestMapWidgets(unittest.TestCase):
+    """Tests for the lazy toolbar and the headless map."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_headless_map_has_no_controls(self):
+        with WidgetMeter() as full:
+            tight_loops.Map()
+        with WidgetMeter() as headless:
+            m = tight_loops.Map(headless=True)
+        self.assertIsNone(toolbar_control(m))
+        self.assertFalse(any(isinstance(c, tight_loops.ipyleaflet.LayersControl) for c in m.controls))
+        self.assertLess(headless.widgets, full.widgets)
+        self.assertEqual(m.widget_count(), headless.widgets)
+
+        m.add_layers_control()
+        self.assertTrue(any(isinstance(c, tight_loops.ipyleaflet.LayersControl) for c in m.controls))
+
+    def test_toolbar_is_built_on_first_click(self):
+        m = tight_loops.Map()
+        toolbar = toolbar_control(m).widget
+        button = toolbar.children[0]
+        self.assertEqual(len(toolbar.children), 1)
+        closed = m.widget_count()
+
+        with WidgetMeter() as meter:
+            button.value = True
+        self.assertEqual(len(toolbar.children), 2)
+        self.assertGreater(meter.widgets, 0)
+        self.assertGreater(m.widget_count(), closed)
+
+        with WidgetMeter() as meter:
+            button.value = False
+            self.assertEqual(len(toolbar.children), 1)
+            button.value = True
+        self.assertEqual(meter.widgets, 0)
+        self.assertEqual(len(toolbar.children), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
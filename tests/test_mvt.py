@@ -0,0 +1,197 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.mvt`."""
+
+import struct
+import unittest
+import warnings
+
+import geopandas as gpd
+import numpy as np
+import shapely
+
+from tight_loops import tight_loops
+from tight_loops.mvt import (
+    VectorTileSource,
+    encode_geometries,
+    encode_layer,
+    encode_tile,
+    encode_varints,
+    varint,
+    zigzag,
+)
+
+
+def read_varint(data, pos):
+    """Reads a varint and returns it with the next position."""
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, pos
+
+
+def read_message(data):
+    """Decodes a protobuf message into a dict of field numbers and raw values."""
+    fields = {}
+    pos = 0
+    while pos < len(data):
+        key, pos = read_varint(data, pos)
+        field, wire_type = key >> 3, key & 7
+        if wire_type == 0:
+            value, pos = read_varint(data, pos)
+        elif wire_type == 1:
+            value, pos = struct.unpack("<d", data[pos:pos + 8])[0], pos + 8
+        else:
+            size, pos = read_varint(data, pos)
+            value, pos = data[pos:pos + size], pos + size
+        fields.setdefault(field, []).append(value)
+    return fields
+
+
+def read_packed(data):
+    """Decodes packed varints."""
+    values, pos = [], 0
+    while pos < len(data):
+        value, pos = read_varint(data, pos)
+        values.append(value)
+    return values
+
+
+def decode_rings(commands):
+    """Decodes polygon commands into lists of absolute ring coordinates."""
+    rings, x, y, i = [], 0, 0, 0
+    while i < len(commands):
+        command, count = commands[i] & 7, commands[i] >> 3
+        i += 1
+        if command == 7:
+            continue
+        if command == 1:
+            rings.append([])
+        for _ in range(count):
+            dx, dy = commands[i], commands[i + 1]
+            x += (dx >> 1) ^ -(dx & 1)
+            y += (dy >> 1) ^ -(dy & 1)
+            rings[-1].append((x, y))
+            i += 2
+    return rings
+
+
+def signed_area(ring):
+    """Returns the surveyor's formula area of a ring."""
+    return 0.5 * sum(x0 * y1 - x1 * y0 for (x0, y0), (x1, y1) in zip(ring, ring[1:] + ring[:1]))
+
+
+class TestEncoding(unittest.TestCase):
+    """Tests for the protobuf and geometry encoding."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_varints(self):
+        values = [0, 1, 127, 128, 300, 2 ** 35, 2 ** 64 - 1]
+        self.assertEqual(encode_varints(values), b"".join(varint(value) for value in values))
+        self.assertEqual(varint(300), b"\xac\x02")
+        self.assertEqual(zigzag([0, -1, 1, -2, 2]).tolist(), [0, 1, 2, 3, 4])
+
+    def test_geometry_commands(self):
+        point = shapely.Point(25, 17)
+        line = shapely.LineString([(2, 2), (2, 10), (2, 10), (10, 10)])
+        kinds, encoded = encode_geometries([point, line, shapely.Point(0.2, 0.2).buffer(0.1)])
+        self.assertEqual(kinds.tolist(), [1, 2, 0])
+        # The examples of the vector tile specification.
+        self.assertEqual(read_packed(encoded[0]), [9, 50, 34])
+        self.assertEqual(read_packed(encoded[1]), [9, 4, 4, 18, 0, 16, 16, 0])
+
+    def test_polygon_winding(self):
+        polygon = shapely.Polygon([(0, 0), (0, 100), (100, 100), (100, 0)], [[(10, 10), (20, 10), (20, 20), (10, 20)]])
+        kinds, encoded = encode_geometries([polygon, polygon.reverse()])
+        self.assertEqual(kinds.tolist(), [3, 3])
+        for commands in encoded:
+            exterior, hole = decode_rings(read_packed(commands))
+            self.assertEqual(signed_area(exterior), 100 * 100)
+            self.assertEqual(signed_area(hole), -10 * 10)
+
+    def test_layer(self):
+        geometries = [shapely.Point(1, 1), shapely.Point(2, 2), shapely.Point(3, 3)]
+        properties = {"name": np.array(["a", "b", "a"], dtype=object), "value": np.array([1.5, np.nan, -2.0])}
+        tile = read_message(encode_tile([encode_layer("points", geometries, properties, ids=[7, 8, 9])]))
+        layer = read_message(tile[3][0])
+
+        self.assertEqual(layer[1], [b"points"])
+        self.assertEqual(layer[3], [b"name", b"value"])
+        self.assertEqual(layer[5], [4096])
+        self.assertEqual(layer[15], [2])
+        values = [read_message(value) for value in layer[4]]
+        self.assertEqual(values[:2], [{1: [b"a"]}, {1: [b"b"]}])
+        self.assertEqual(values[2:], [{3: [1.5]}, {3: [-2.0]}])
+
+        features = [read_message(feature) for feature in layer[2]]
+        self.assertEqual([feature[1][0] for feature in features], [7, 8, 9])
+        self.assertEqual(read_packed(features[0][2][0]), [0, 0, 1, 2])
+        # The missing value of the second feature is left out.
+        self.assertEqual(read_packed(features[1][2][0]), [0, 1])
+        self.assertEqual(read_packed(features[2][2][0]), [0, 0, 1, 3])
+
+
+class TestVectorTileSource(unittest.TestCase):
+    """Tests for cutting vector tiles from a GeoDataFrame."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_tiles(self):
+        polygon = shapely.box(5, 45, 40, 60)
+        gdf = gpd.GeoDataFrame({"name": ["box"]}, geometry=[polygon], crs="EPSG:4326")
+        source = VectorTileSource(gdf)
+
+        layer = read_message(read_message(source.get_tile(3, 4, 2))[3][0])
+        rings = decode_rings(read_packed(read_message(layer[2][0])[4][0]))
+        self.assertEqual(len(rings), 1)
+        xs, ys = zip(*rings[0])
+        self.assertGreaterEqual(min(xs), 0)
+        self.assertLessEqual(max(ys), 4096)
+
+        # The polygon is clipped to the tile plus the buffer.
+        layer = read_message(read_message(source.get_tile(1, 1, 0))[3][0])
+        xs, ys = zip(*decode_rings(read_packed(read_message(layer[2][0])[4][0]))[0])
+        self.assertGreaterEqual(min(xs), -64)
+
+        self.assertIsNone(source.get_tile(3, 0, 7))
+        np.testing.assert_allclose(source.bounds, (5, 45, 40, 60))
+
+    def test_points_are_thinned_per_pixel(self):
+        # A 10 x 10 grid of points about 11 m apart, inside one tile at zoom 18.
+        x, y = np.meshgrid(np.arange(1, 11) * 1e-4, np.arange(1, 11) * 1e-4)
+        gdf = gpd.GeoDataFrame({"id": np.arange(100)}, geometry=gpd.points_from_xy(x.ravel(), y.ravel()), crs="EPSG:4326")
+        source = VectorTileSource(gdf)
+        self.assertEqual(len(read_message(read_message(source.get_tile(0, 0, 0))[3][0])[2]), 1)
+        self.assertEqual(len(read_message(read_message(source.get_tile(18, 2 ** 17, 2 ** 17 - 1))[3][0])[2]), 100)
+
+    def test_add_vector_tiles(self):
+        from tight_loops.server import get_tile_server
+
+        gdf = gpd.GeoDataFrame({"a": [1, 2]}, geometry=gpd.points_from_xy([1, 2], [3, 4]), crs="EPSG:4326")
+        m = tight_loops.Map(headless=True)
+        layer = m.add_vector_tiles(gdf, name="points")
+        self.assertIn(layer, m.layers)
+        self.assertIn("features", layer.layer_styles)
+
+        path = layer.url.split("/tiles/")[1].replace("{z}/{x}/{y}", "0/0/0")
+        status, content_type, body = get_tile_server().handle(path, {})
+        self.assertEqual((status, content_type), (200, "application/x-protobuf"))
+        self.assertEqual(len(read_message(read_message(body)[3][0])[2]), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,151 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.points` module."""
+
+
+import unittest
+import warnings
+
+import numpy as np
+import pandas as pd
+
+from tight_loops import tight_loops
+from tight_loops.points import color_indexes, morton_order, pack_points, unpack_points
+
+
+def random_points(n, seed=0):
+    """Returns a DataFrame of random points in the contiguous US."""
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame(
+        {
+            "longitude": rng.uniform(-125, -67, n),
+            "latitude": rng.uniform(25, 49, n),
+            "value": rng.normal(0, 1, n),
+        }
+    )
+
+
+class TestPacking(unittest.TestCase):
+    """Tests for packing points into binary buffers."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.df = random_points(10000)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_quantized(self):
+        """Test that points are quantized to 16 or 32 bits within the grid step."""
+        header, buffer, order = pack_points(self.df["longitude"], self.df["latitude"])
+        self.assertIsNone(order)
+        self.assertEqual(len(buffer), 4 * len(self.df))
+        lon, lat = unpack_points(header, buffer)
+        # 16 bits across 58 degrees of longitude.
+        self.assertLess(np.abs(lon - self.df["longitude"]).max(), 58 / 65535)
+        self.assertLess(np.abs(lat - self.df["latitude"]).max(), 0.001)
+
+        header, buffer, _ = pack_points(self.df["longitude"], self.df["latitude"], bits=32)
+        self.assertEqual(len(buffer), 8 * len(self.df))
+        lon, _ = unpack_points(header, buffer)
+        self.assertLess(np.abs(lon - self.df["longitude"]).max(), 1e-6)
+
+    def test_delta(self):
+        """Test that delta encoding shrinks the buffer and returns the Morton order."""
+        header, buffer, order = pack_points(self.df["longitude"], self.df["latitude"], delta=True)
+        self.assertLess(len(buffer), 4 * len(self.df))
+        self.assertEqual(sorted(order), list(range(len(self.df))))
+        lon, lat = unpack_points(header, buffer)
+        self.assertLess(np.abs(lon - self.df["longitude"].to_numpy()[order]).max(), 58 / 65535)
+        self.assertLess(np.abs(lat - self.df["latitude"].to_numpy()[order]).max(), 0.001)
+
+    def test_edge_cases(self):
+        """Test packing no points, a single point and an invalid number of bits."""
+        header, buffer, _ = pack_points([], [], delta=True)
+        self.assertEqual((header["count"], buffer), (0, b""))
+        header, buffer, _ = pack_points([10.0], [20.0])
+        lon, lat = unpack_points(header, buffer)
+        self.assertAlmostEqual(lon[0], 10.0)
+        self.assertAlmostEqual(lat[0], 20.0)
+        with self.assertRaises(ValueError):
+            pack_points([0], [0], bits=33)
+
+    def test_morton_order(self):
+        """Test that points are ordered along the Morton curve."""
+        self.assertEqual(morton_order([0, 1, 0, 1], [0, 0, 1, 1]).tolist(), [0, 1, 2, 3])
+        self.assertEqual(morton_order([2, 0, 1], [0, 1, 1]).tolist(), [1, 2, 0])
+
+    def test_color_indexes(self):
+        """Test mapping numbers, categories and missing values to color indexes."""
+        self.assertEqual(color_indexes([0, 5, 10], vmin=0, vmax=10).tolist(), [0, 127, 255])
+        self.assertEqual(color_indexes(["a", "b", "a"]).tolist(), [0, 255, 0])
+        self.assertEqual(color_indexes([np.nan, 1.0, 2.0], vmin=1, vmax=2).tolist(), [0, 0, 255])
+
+
+class TestPointLayer(unittest.TestCase):
+    """Tests for adding binary point layers to the map."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+        self.map = tight_loops.Map(headless=True)
+        self.df = random_points(1000)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_add_points(self):
+        """Test adding points colored by a column to the map."""
+        layer = self.map.add_points(self.df, values="value")
+        self.assertIn(layer.control, self.map.controls)
+        self.assertEqual(layer.widget.header["count"], 1000)
+        self.assertEqual(len(layer.widget.values), 1000)
+        self.assertEqual(len(layer.widget.lut), 1024)
+        # 4 bytes of coordinates and 1 byte of color per point, and the color table.
+        self.assertEqual(layer.nbytes, 5 * 1000 + 1024)
+        self.assertEqual(len(layer._links), 4)
+
+    def test_binary_buffers(self):
+        """Test that the coordinates are sent as binary buffers."""
+        layer = self.map.add_points(self.df)
+        state = layer.widget.get_state()
+        self.assertIsInstance(state["xy"], (bytes, memoryview))
+        self.assertEqual(layer.widget.values, b"")
+
+    def test_invalid_points_are_dropped(self):
+        """Test that points with missing coordinates are dropped with their values."""
+        self.df.loc[0, "longitude"] = np.nan
+        layer = self.map.add_points(self.df, values="value")
+        self.assertEqual(layer.widget.header["count"], 999)
+        self.assertEqual(len(layer.widget.values), 999)
+
+    def test_add_geodataframe(self):
+        """Test adding a GeoDataFrame of points, with or without a CRS."""
+        import geopandas as gpd
+
+        gdf = gpd.GeoDataFrame(geometry=gpd.points_from_xy(self.df["longitude"], self.df["latitude"]), crs="EPSG:4326")
+        layer = self.map.add_points(gdf.to_crs(epsg=3857))
+        lon, _ = unpack_points(layer.widget.header, layer.widget.xy)
+        self.assertLess(np.abs(lon - self.df["longitude"]).max(), 58 / 65535)
+        layer = self.map.add_points(gdf.set_crs(None, allow_override=True))
+        self.assertEqual(layer.widget.header["count"], 1000)
+
+    def test_name_and_visible(self):
+        """Test that the name and the visibility are synced to the control."""
+        layer = self.map.add_points(self.df, name="Stations")
+        self.assertEqual(layer.widget.name, "Stations")
+        layer.visible = False
+        self.assertFalse(layer.widget.visible)
+        layer.name = "Gauges"
+        self.assertEqual(layer.widget.get_state()["name"], "Gauges")
+
+    def test_remove(self):
+        """Test removing the layer and its control from the map."""
+        layer = self.map.add_points(self.df)
+        layer.remove()
+        self.assertNotIn(layer.control, self.map.controls)
+        self.assertIsNone(layer.map)
+
+
+if __name__ == '__main__':
+    unittest.main()
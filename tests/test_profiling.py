@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.profiling` module."""
+
+
+import json
+import os
+import socket
+import tempfile
+import threading
+import unittest
+import warnings
+
+import geopandas as gpd
+from shapely.geometry import Point
+
+from tight_loops import tight_loops
+from tight_loops.profiling import JsonLinesSink, StatsdSink, bind, profile, profiled, stage
+
+
+@profiled
+def allocate(size):
+    with stage("fill") as s:
+        data = bytearray(size)
+        s.add(items=size)
+    return len(data)
+
+
+class TestProfiling(unittest.TestCase):
+    """Tests for recording stages."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_disabled(self):
+        with stage("idle") as s:
+            self.assertFalse(s)
+            s.add(items=1)
+        self.assertEqual(allocate(10), 10)
+        self.assertEqual(allocate.__name__, "allocate")
+
+    def test_nested_stages(self):
+        with profile() as prof:
+            allocate(4_000_000)
+            allocate(1000)
+            with self.assertRaises(KeyError):
+                with stage("broken"):
+                    {}["missing"]
+        self.assertEqual([record["path"] for record in prof.records][:2], ["test_profiling.allocate/fill", "test_profiling.allocate"])
+        summary = prof.summary()
+        self.assertEqual(list(summary), ["test_profiling.allocate", "test_profiling.allocate/fill", "broken"])
+        fill = summary["test_profiling.allocate/fill"]
+        self.assertEqual((fill["calls"], fill["counts"]), (2, {"items": 4_001_000}))
+        self.assertGreaterEqual(fill["memory"], 4_000_000)
+        self.assertGreaterEqual(summary["test_profiling.allocate"]["memory"], fill["memory"])
+        self.assertEqual(prof.records[-1]["error"], "KeyError")
+        self.assertIn("\n  fill ", prof.report())
+
+        # Nothing is recorded once the profile is stopped.
+        allocate(10)
+        self.assertEqual(len(prof.records), 5)
+
+    def test_worker_threads(self):
+        with profile(memory=False) as prof:
+            with stage("batch"):
+                thread = threading.Thread(target=bind(allocate), args=(10,))
+                thread.start()
+                thread.join()
+        self.assertEqual(prof.records[0]["path"], "batch/test_profiling.allocate/fill")
+        self.assertIsNone(prof.records[0]["memory"])
+
+    def test_map_stages(self):
+        warnings.simplefilter("ignore", DeprecationWarning)
+        gdf = gpd.GeoDataFrame({"id": range(3)}, geometry=[Point(i, i) for i in range(3)], crs="EPSG:3857")
+        with profile() as prof:
+            m = tight_loops.Map(headless=True)
+            m.add_gdf(gdf, simplify=False)
+        summary = prof.summary()
+        self.assertIn("tight_loops.Map.__init__", summary)
+        self.assertEqual(summary["tight_loops.Map.add_gdf/serialize"]["counts"], {"features": 3})
+        send = summary["tight_loops.Map.add_gdf/send"]
+        self.assertGreater(send["bytes"], 0)
+        # Adding the layer to the map sends the new list of layers.
+        self.assertGreater(summary["tight_loops.Map.add_gdf"]["bytes"], send["bytes"])
+        self.assertEqual(len(prof.to_dataframe()), len(prof.records))
+
+
+class TestSinks(unittest.TestCase):
+    """Tests for exporting stage records."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def test_json_lines(self):
+        path = os.path.join(self.tmpdir.name, "stages.jsonl")
+        with profile(sinks=[JsonLinesSink(path)]):
+            allocate(10)
+        with open(path) as f:
+            records = [json.loads(line) for line in f]
+        self.assertEqual([record["name"] for record in records], ["fill", "test_profiling.allocate"])
+        self.assertEqual(records[0]["counts"], {"items": 10})
+
+    def test_statsd(self):
+        server = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        server.bind(("127.0.0.1", 0))
+        server.settimeout(5)
+        sink = StatsdSink("127.0.0.1", server.getsockname()[1], prefix="app")
+        try:
+            with profile(memory=False, sinks=[sink]):
+                with stage("load data") as s:
+                    s.add(features=7)
+            lines = server.recv(65536).decode("utf-8").splitlines()
+        finally:
+            sink.close()
+            server.close()
+        self.assertTrue(lines[0].startswith("app.load_data.time:") and lines[0].endswith("|ms"))
+        self.assertIn("app.load_data.features:7|c", lines)
+        self.assertIn("app.load_data.bytes:0|c", lines)
+
+
+if __name__ == '__main__':
+    unittest.main()
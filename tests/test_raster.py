@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.raster` module."""
+
+
+import os
+import tempfile
+import unittest
+import warnings
+
+import numpy as np
+
+from tight_loops import raster, tight_loops
+
+
+def write_raster(path, size=300):
+    """Writes a small gradient raster in UTM zone 17N with a nodata corner."""
+    import rasterio
+    from rasterio.transform import from_origin
+
+    data = np.add.outer(np.arange(size), np.arange(size)).astype("float32")
+    data[:10, :10] = -9999
+    profile = {
+        "driver": "GTiff",
+        "width": size,
+        "height": size,
+        "count": 1,
+        "dtype": "float32",
+        "crs": "EPSG:32617",
+        "transform": from_origin(200000, 4000000, 30, 30),
+        "nodata": -9999,
+    }
+    with rasterio.open(path, "w", **profile) as dst:
+        dst.write(data, 1)
+    return path
+
+
+class TestRaster(unittest.TestCase):
+    """Tests for `tight_loops.raster` module."""
+
+    def test_render_rgba(self):
+        """Test the stretch, colormap and nodata alpha."""
+        data = np.array([[[0.0, 50.0], [100.0, np.nan]]])
+        rgba = raster.render_rgba(data, 0, 100, "gray")
+        self.assertEqual(rgba.shape, (4, 2, 2))
+        self.assertEqual(rgba[0].tolist(), [[0, 127], [255, 0]])
+        self.assertEqual(rgba[3].tolist(), [[255, 255], [255, 0]])
+
+    def test_tile_bounds(self):
+        """Test the Web Mercator bounds of XYZ tiles."""
+        left, bottom, right, top = raster.tile_bounds(1, 1, 0)
+        self.assertAlmostEqual(left, 0)
+        self.assertAlmostEqual(bottom, 0)
+        self.assertAlmostEqual(right, raster.WEB_MERCATOR_HALF)
+        self.assertAlmostEqual(top, raster.WEB_MERCATOR_HALF)
+
+
+class TestRasterPreview(unittest.TestCase):
+    """Tests for rendering decimated previews of local rasters."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        from rasterio.errors import NotGeoreferencedWarning
+
+        warnings.simplefilter("ignore", DeprecationWarning)
+        warnings.simplefilter("ignore", NotGeoreferencedWarning)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = write_raster(os.path.join(self.tmpdir.name, "dem.tif"))
+        raster.clear_preview_cache()
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        raster.clear_preview_cache()
+        self.tmpdir.cleanup()
+
+    def test_render_preview(self):
+        """Test the size, bounds and stretch of a preview."""
+        import rasterio
+        from rasterio.io import MemoryFile
+        from rasterio.warp import transform_bounds
+
+        preview = raster.render_preview(self.path, colormap="terrain", max_size=100)
+        with MemoryFile(preview["png"]) as memfile, memfile.open() as image:
+            self.assertEqual((image.count, max(image.width, image.height)), (4, 100))
+            alpha = image.read(4)
+        self.assertEqual(alpha[0, 0], 0)
+        self.assertEqual(alpha[50, 50], 255)
+
+        with rasterio.open(self.path) as src:
+            west, south, east, north = transform_bounds(src.crs, "EPSG:4326", *src.bounds, densify_pts=21)
+        (s, w), (n, e) = preview["bounds"]
+        self.assertAlmostEqual(s, south, places=3)
+        self.assertAlmostEqual(e, east, places=3)
+        self.assertLess(preview["vmin"][0], preview["vmax"][0])
+        with self.assertRaises(ValueError):
+            raster.render_preview(self.path, colormap="missing")
+
+    def test_preview_cache(self):
+        """Test that previews are cached in memory and on disk per file and parameters."""
+        cache_dir = os.path.join(self.tmpdir.name, "cache")
+        preview = raster.render_preview(self.path, max_size=64, cache=cache_dir)
+        self.assertIs(raster.render_preview(self.path, max_size=64), preview)
+        self.assertIsNot(raster.render_preview(self.path, max_size=32), preview)
+        self.assertEqual(len(os.listdir(os.path.join(cache_dir, "raster"))), 2)
+
+        raster.clear_preview_cache()
+        cached = raster.render_preview(self.path, max_size=64, cache=cache_dir)
+        self.assertEqual(cached["png"], preview["png"])
+        self.assertEqual(cached["bounds"], preview["bounds"])
+
+        # Rewriting the file invalidates its previews.
+        stat = os.stat(self.path)
+        os.utime(self.path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+        self.assertIsNot(raster.render_preview(self.path, max_size=64), cached)
+
+    def test_add_raster_preview(self):
+        """Test adding a preview as an image overlay."""
+        m = tight_loops.Map(headless=True)
+        layer = m.add_raster_preview(self.path, vmin=0, vmax=600)
+        self.assertTrue(layer.url.startswith("data:image/png;base64,"))
+        self.assertIn(layer, m.layers)
+        self.assertEqual(len(layer.bounds), 2)
+        layer = m.add_local_raster(self.path, preview=True, name="DEM")
+        self.assertEqual((type(layer).__name__, layer.name), ("ImageOverlay", "DEM"))
@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.server` module."""
+
+
+import unittest
+
+import httpx
+
+from tight_loops.server import LocalServer, LRUCache, TileServer
+
+
+class CountingSource:
+    """A tile source that records the tiles it renders."""
+
+    content_type = "text/plain"
+    extension = "txt"
+
+    def __init__(self):
+        self.rendered = []
+
+    def get_tile(self, z, x, y):
+        self.rendered.append((z, x, y))
+        return None if z == 0 else f"{z}/{x}/{y}".encode()
+
+
+class TestServer(unittest.TestCase):
+    """Tests for `tight_loops.server` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.server = LocalServer()
+        self.tiles = TileServer(self.server, max_workers=2)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.server.shutdown()
+
+    def test_lru_cache(self):
+        """Test that the least recently used values are evicted first."""
+        cache = LRUCache(max_bytes=6)
+        cache.put("a", b"aa")
+        cache.put("b", b"bb")
+        cache.get("a")
+        cache.put("c", b"cccc")
+        self.assertEqual(cache.get("b"), None)
+        self.assertEqual(cache.get("a"), b"aa")
+        self.assertEqual(cache.get("c"), b"cccc")
+        self.assertEqual(cache.size, 6)
+
+    def test_tiles(self):
+        """Test serving and caching tiles over HTTP."""
+        source = CountingSource()
+        url = self.tiles.add_source(source)
+        self.assertTrue(url.startswith(self.server.url))
+
+        response = httpx.get(url.format(z=3, x=2, y=1))
+        self.assertEqual(response.text, "3/2/1")
+        httpx.get(url.format(z=3, x=2, y=1))
+        self.assertEqual(source.rendered, [(3, 2, 1)])
+
+        self.assertEqual(httpx.get(url.format(z=0, x=0, y=0)).status_code, 204)
+        self.assertEqual(httpx.get(self.server.url + "/missing").status_code, 404)
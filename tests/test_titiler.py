@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.titiler` module."""
+
+
+import unittest
+
+import httpx
+
+from tight_loops.titiler import TitilerClient
+
+
+class TestTitiler(unittest.TestCase):
+    """Tests for `tight_loops.titiler` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.requests = []
+
+        def handler(request):
+            self.requests.append(request.url.path)
+            url = request.url.params["url"]
+            if request.url.path == "/cog/info":
+                return httpx.Response(200, json={"bounds": [-10, -5, 10, 5]})
+            return httpx.Response(200, json={"tiles": [f"http://stub/tiles/{{z}}/{{x}}/{{y}}?url={url}"]})
+
+        self.client = TitilerClient("http://stub", transport=httpx.MockTransport(handler))
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.client.close()
+
+    def test_metadata_cache(self):
+        """Test that metadata is requested once per URL."""
+        first = self.client.metadata_many(["a.tif", "b.tif", "a.tif"])
+        self.assertEqual(len(self.requests), 4)
+        self.assertEqual(first[0]["bounds"], [-10, -5, 10, 5])
+        self.assertTrue(first[1]["tiles"][0].endswith("url=b.tif"))
+
+        self.client.metadata("b.tif")
+        self.assertEqual(len(self.requests), 4)
+        self.client.clear_cache()
+        self.client.metadata("b.tif")
+        self.assertEqual(len(self.requests), 6)
+
+    def test_ttl(self):
+        """Test that expired metadata is requested again."""
+        self.client.ttl = 0
+        self.client.metadata("a.tif")
+        self.client.metadata("a.tif")
+        self.assertEqual(len(self.requests), 4)
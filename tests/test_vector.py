@@ -0,0 +1,236 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.vector` module."""
+
+
+import glob
+import importlib.util
+import os
+import tempfile
+import unittest
+
+import geopandas as gpd
+
+from tight_loops import vector
+
+
+class TestVector(unittest.TestCase):
+    """Tests for `tight_loops.vector` module."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.csv = os.path.join(self.tmpdir.name, "points.csv")
+        with open(self.csv, "w") as f:
+            f.write("name,latitude,longitude\n")
+            for i in range(10):
+                f.write(f"p{i},{35 + i * 0.1},{-84 - i * 0.1}\n")
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+        self.tmpdir.cleanup()
+
+    def test_get_driver(self):
+        """Test driver inference from file extensions."""
+        self.assertEqual(vector.get_driver("a.gpkg"), "GPKG")
+        self.assertEqual(vector.get_driver("a.parquet"), "Parquet")
+        self.assertEqual(vector.get_driver("a.shp"), "ESRI Shapefile")
+        self.assertEqual(vector.get_driver("a.out", "GeoPackage"), "GPKG")
+
+    def test_csv_to_gdf(self):
+        """Test building point geometries from coordinate columns."""
+        gdf = vector.csv_to_gdf(self.csv)
+        self.assertEqual(len(gdf), 10)
+        self.assertEqual(gdf.crs.to_epsg(), 4326)
+        self.assertAlmostEqual(gdf.geometry.x.iloc[1], -84.1)
+        self.assertAlmostEqual(gdf.geometry.y.iloc[1], 35.1)
+
+    def test_write_vector(self):
+        """Test writing a GeoPackage."""
+        gdf = vector.csv_to_gdf(self.csv)
+        output = vector.write_vector(gdf, os.path.join(self.tmpdir.name, "out", "points.gpkg"))
+        self.assertEqual(len(gpd.read_file(output)), 10)
+
+    def test_csv_to_vector_resume(self):
+        """Test streaming a CSV in chunks and resuming an interrupted run."""
+        output = os.path.join(self.tmpdir.name, "stream.gpkg")
+        head = vector.df_to_gdf(vector.pd.read_csv(self.csv, nrows=4))
+        head.to_file(output, driver="GPKG")
+        with open(output + ".progress.json", "w") as f:
+            f.write('{"source": "%s", "rows": 4, "parts": 1}' % os.path.abspath(self.csv))
+
+        vector.csv_to_vector(self.csv, output, chunksize=3, progress=False)
+        gdf = gpd.read_file(output)
+        self.assertEqual(list(gdf["name"]), [f"p{i}" for i in range(10)])
+        self.assertFalse(os.path.exists(output + ".progress.json"))
+
+        import warnings
+
+        from tight_loops import tight_loops
+
+        warnings.simplefilter("ignore", DeprecationWarning)
+        m = tight_loops.Map(headless=True)
+        with self.assertRaises(ValueError):
+            m.csv_to_shp(self.csv, output, chunksize=3, style={"color": "red"})
+
+    def test_csv_to_vector_resume_header(self):
+        """Test that resuming skips the rows written after the header rows in use."""
+        source = os.path.join(self.tmpdir.name, "noheader.csv")
+        with open(self.csv) as f:
+            lines = f.readlines()
+        with open(source, "w") as f:
+            f.writelines(lines[1:])
+        names = ["name", "latitude", "longitude"]
+        for path, options in ((source, {"header": None, "names": names}), (self.csv, {"header": 0})):
+            output = os.path.join(self.tmpdir.name, "stream.gpkg")
+            vector.csv_to_vector(path, output, chunksize=20, progress=False, resume=False, **options)
+            head = gpd.read_file(output).iloc[:4]
+            head.to_file(output, driver="GPKG")
+            with open(output + ".progress.json", "w") as f:
+                f.write('{"source": "%s", "rows": 4, "parts": 1}' % os.path.abspath(path))
+            vector.csv_to_vector(path, output, chunksize=3, progress=False, **options)
+            self.assertEqual(list(gpd.read_file(output)["name"]), [f"p{i}" for i in range(10)])
+
+    @unittest.skipUnless(importlib.util.find_spec("pyarrow"), "requires pyarrow")
+    def test_csv_to_vector_parquet(self):
+        """Test streaming a CSV to a GeoParquet dataset."""
+        output = os.path.join(self.tmpdir.name, "stream.parquet")
+        vector.csv_to_vector(self.csv, output, chunksize=4, progress=False)
+        self.assertEqual(len(os.listdir(output)), 3)
+        self.assertEqual(len(gpd.read_parquet(output)), 10)
+
+    def test_simplification_pyramid(self):
+        """Test that coarse zoom bands carry fewer vertices."""
+        import numpy as np
+        from shapely.geometry import Polygon
+
+        xs = np.linspace(0, 1, 500)
+        edge = [(x, 0.5 + 0.001 * np.sin(x * 300)) for x in xs]
+        lower = Polygon([(0, 0), (1, 0)] + edge[::-1])
+        upper = Polygon(edge + [(1, 1), (0, 1)])
+        gdf = gpd.GeoDataFrame({"id": [1, 2]}, geometry=[lower, upper], crs="EPSG:4326")
+
+        pyramid = vector.SimplificationPyramid(gdf)
+        counts = pyramid.num_vertices()
+        self.assertEqual(counts, sorted(counts))
+        self.assertLess(counts[0], counts[-1])
+        self.assertEqual(pyramid.level(3), 0)
+        self.assertEqual(pyramid.level(20), len(pyramid.zooms) - 1)
+        self.assertEqual(len(pyramid.data(6)["features"]), 2)
+
+    def test_gdf_to_geojson(self):
+        """Test rounding, quantization and column selection."""
+        gdf = vector.csv_to_gdf(self.csv)
+        gdf["extra"] = None
+        data = vector.gdf_to_geojson(gdf, columns=["name", "extra"], precision=2)
+        feature = data["features"][3]
+        self.assertEqual(feature["properties"], {"name": "p3", "extra": None})
+        self.assertEqual(feature["geometry"]["coordinates"], (-84.3, 35.3))
+
+        data = vector.gdf_to_geojson(gdf, columns=[], quantize=9)
+        xs = [f["geometry"]["coordinates"][0] for f in data["features"]]
+        self.assertEqual(len(set(xs)), 10)
+        self.assertEqual(data["features"][0]["properties"], {})
+
+    def test_add_gdf_quantize(self):
+        """Test that quantizing through add_gdf also drops the unneeded decimals."""
+        import json
+        import warnings
+
+        import numpy as np
+
+        from tight_loops import tight_loops
+
+        warnings.simplefilter("ignore", DeprecationWarning)
+        from shapely.geometry import LineString
+
+        rng = np.random.default_rng(0)
+        lines = [LineString(np.column_stack([rng.uniform(-90, -80, 1000), rng.uniform(30, 40, 1000)])) for _ in range(5)]
+        gdf = gpd.GeoDataFrame(geometry=lines, crs="EPSG:4326")
+        m = tight_loops.Map(headless=True)
+        full = len(json.dumps(m.add_gdf(gdf, simplify=False).data))
+        layer = m.add_gdf(gdf, simplify=False, quantize=1000)
+        self.assertLess(len(json.dumps(layer.data)), full * 0.9)
+        # A grid step of about 0.01 degrees needs at most 4 decimals.
+        x, y = layer.data["features"][0]["geometry"]["coordinates"][0]
+        self.assertEqual((x, y), (round(x, 4), round(y, 4)))
+        # An explicit precision is still honored.
+        layer = m.add_gdf(gdf, simplify=False, quantize=1000, precision=1)
+        x, _ = layer.data["features"][0]["geometry"]["coordinates"][0]
+        self.assertEqual(x, round(x, 1))
+
+    def test_pyramid_released_on_remove(self):
+        """Test that only large layers get a pyramid, released when they are removed."""
+        import warnings
+        from unittest import mock
+
+        import ipyleaflet
+
+        from tight_loops import tight_loops
+
+        warnings.simplefilter("ignore", DeprecationWarning)
+        gdf = vector.csv_to_gdf(self.csv)
+        m = tight_loops.Map(headless=True)
+
+        def zoom_observers():
+            return len(m._trait_notifiers.get("zoom", {}).get("change", []))
+
+        observers = zoom_observers()
+        # Small layers are sent at full resolution without a pyramid.
+        m.add_gdf(gdf, simplify=True)
+        self.assertEqual(zoom_observers(), observers)
+        patcher = mock.patch.object(vector, "SIMPLIFY_MIN_VERTICES", 0)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        layer = m.add_gdf(gdf, simplify=True)
+        group = ipyleaflet.LayerGroup(layers=[m._gdf_layer(gdf, simplify=True)])
+        m.add_layer(group)
+        self.assertEqual(zoom_observers(), observers + 2)
+        m.remove_layer(layer)
+        self.assertEqual(zoom_observers(), observers + 1)
+        m.remove_layer(group)
+        self.assertEqual(zoom_observers(), observers)
+
+    def write_counties(self):
+        """Writes three small files in different CRSs and a broken one."""
+        gdf = vector.csv_to_gdf(self.csv)
+        for i, crs in enumerate([4326, 3857, 26917]):
+            gdf.iloc[i * 3:i * 3 + 3].to_crs(epsg=crs).to_file(os.path.join(self.tmpdir.name, f"county{i}.shp"))
+        with open(os.path.join(self.tmpdir.name, "county9.shp"), "w") as f:
+            f.write("not a shapefile")
+        return os.path.join(self.tmpdir.name, "county*.shp")
+
+    def test_read_vectors(self):
+        """Test reading many files in parallel and collecting errors."""
+        pattern = self.write_counties()
+        calls = []
+        frames, errors = vector.read_vectors(pattern, max_workers=2, progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual([os.path.basename(path) for path in frames], ["county0.shp", "county1.shp", "county2.shp"])
+        self.assertEqual([os.path.basename(path) for path in errors], ["county9.shp"])
+        self.assertEqual(calls[-1], (4, 4))
+        for gdf in frames.values():
+            self.assertEqual(gdf.crs.to_epsg(), 4326)
+        self.assertAlmostEqual(frames[os.path.join(self.tmpdir.name, "county2.shp")].geometry.x.iloc[0], -84.6)
+        with self.assertRaises(FileNotFoundError):
+            vector.read_vectors(os.path.join(self.tmpdir.name, "missing*.shp"))
+
+    def test_add_many_files(self):
+        """Test adding many files as one layer or as a layer group."""
+        import warnings
+
+        from tight_loops import tight_loops
+
+        warnings.simplefilter("ignore", DeprecationWarning)
+        pattern = self.write_counties()
+        m = tight_loops.Map(headless=True)
+        layer = m.add_shp(pattern, simplify=False)
+        self.assertEqual(len(layer.data["features"]), 9)
+        self.assertEqual(len(layer.errors), 1)
+
+        paths = sorted(glob.glob(pattern))[:2]
+        group = m.add_vector(paths, name="Counties", merge=False)
+        self.assertEqual([child.name for child in group.layers], ["county0", "county1"])
+        self.assertEqual(group.errors, {})
+        self.assertIn(group, m.layers)
+        with self.assertRaises(ValueError):
+            m.add_vector(sorted(glob.glob(pattern))[-1:])
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""Tests for `tight_loops.viewport`."""
+
+import asyncio
+import unittest
+import warnings
+
+import geopandas as gpd
+import numpy as np
+
+from tight_loops import tight_loops
+from tight_loops.viewport import ViewportLayer, cell_keys, default_cell_zoom
+
+
+def grid_points():
+    """Returns one point per degree between 0 and 9 degrees."""
+    x, y = np.meshgrid(np.arange(10) + 0.5, np.arange(10) + 0.5)
+    return gpd.GeoDataFrame(
+        {"id": np.arange(100)}, geometry=gpd.points_from_xy(x.ravel(), y.ravel()), crs="EPSG:4326"
+    )
+
+
+class TestViewportLayer(unittest.TestCase):
+    """Tests for the viewport layer."""
+
+    def setUp(self):
+        """Set up test fixtures, if any."""
+        warnings.simplefilter("ignore", DeprecationWarning)
+        self.map = tight_loops.Map(headless=True)
+
+    def tearDown(self):
+        """Tear down test fixtures, if any."""
+
+    def test_cells(self):
+        self.assertEqual(cell_keys(np.array([-179.9, 179.9]), np.array([80, -80]), 1).tolist(), [0, 3])
+        self.assertEqual(default_cell_zoom((0, 0, 10, 10)), 8)
+
+    def test_only_features_in_view_are_sent(self):
+        layer = ViewportLayer(grid_points(), cell_zoom=10, padding=0).add_to(self.map)
+        self.assertEqual(layer.layer.layers, ())
+
+        self.map.set_trait("bounds", ((0, 0), (2, 2)))
+        sent = sum(len(geojson.data["features"]) for geojson in layer.layer.layers)
+        self.assertEqual(sent, 4)
+        self.assertEqual(layer.features_sent, 4)
+
+    def test_updates_are_diffed(self):
+        layer = self.map.add_viewport_layer(grid_points(), cell_zoom=10, padding=0)
+        self.map.set_trait("bounds", ((0, 0), (2, 2)))
+        shown = set(layer.layer.layers)
+
+        self.map.set_trait("bounds", ((0, 1), (2, 3)))
+        self.assertEqual(layer.features_sent, 6)
+        self.assertTrue(shown & set(layer.layer.layers))
+
+        # Cells that were loaded before are not sent again.
+        self.map.set_trait("bounds", ((0, 0), (2, 2)))
+        self.assertEqual(layer.features_sent, 6)
+        self.assertEqual(set(layer.layer.layers), shown)
+
+    def test_max_features(self):
+        layer = ViewportLayer(grid_points(), cell_zoom=10, padding=0, max_features=10).add_to(self.map)
+        self.map.set_trait("bounds", ((0, 0), (10, 10)))
+        self.assertEqual(layer.layer.layers, ())
+        self.map.set_trait("bounds", ((0, 0), (2, 2)))
+        self.assertEqual(len(layer.layer.layers), 4)
+
+    def test_hidden_cells_are_closed(self):
+        layer = ViewportLayer(grid_points(), cell_zoom=10, padding=0, keep=1).add_to(self.map)
+        self.map.set_trait("bounds", ((0, 0), (1, 1)))
+        first = layer.layer.layers[0]
+        self.map.set_trait("bounds", ((5, 5), (6, 6)))
+        self.map.set_trait("bounds", ((8, 8), (9, 9)))
+        self.assertIsNone(first.comm)
+        self.assertEqual(len(layer._layers), 2)
+
+    def test_debounce(self):
+        layer = ViewportLayer(grid_points(), cell_zoom=10, padding=0, delay=0.05).add_to(self.map)
+        updates = []
+        update = layer.update
+        layer.update = lambda change=None: updates.append(1) or update()
+
+        async def pan():
+            for i in range(5):
+                self.map.set_trait("bounds", ((0, i), (1, i + 1)))
+                await asyncio.sleep(0.01)
+            await asyncio.sleep(0.1)
+
+        asyncio.run(pan())
+        self.assertEqual(len(updates), 1)
+        self.assertEqual(layer.features_sent, 1)
+
+    def test_antimeridian(self):
+        points = gpd.GeoDataFrame(
+            {"id": [0, 1, 2]}, geometry=gpd.points_from_xy([179.5, -179.5, 0], [0, 0, 0]), crs="EPSG:4326"
+        )
+        layer = ViewportLayer(points, cell_zoom=10, padding=0).add_to(self.map)
+        self.map.set_trait("bounds", ((-1, 179), (1, -179)))
+        ids = sorted(f["properties"]["id"] for geojson in layer.layer.layers for f in geojson.data["features"])
+        self.assertEqual(ids, [0, 1])
+
+    def test_remove(self):
+        layer = ViewportLayer(grid_points(), cell_zoom=10, padding=0).add_to(self.map)
+        self.map.set_trait("bounds", ((0, 0), (2, 2)))
+        layer.remove()
+        self.assertNotIn(layer.layer, self.map.layers)
+        self.map.set_trait("bounds", ((5, 5), (6, 6)))
+        self.assertEqual(layer.features_sent, 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -4,4 +4,29 @@ __author__ = """Will Nelson"""
 __email__ = 'wnelso18@vols.utk.edu'
 __version__ = '0.3.1'
 
-from .tight_loops import *
\ No newline at end of file
+import importlib
+
+# The public names and the submodule defining each of them. The submodules are
+# only imported when a name is first used, so `import tight_loops` does not pay
+# for ipyleaflet, ipywidgets or geopandas until a map is created.
+_LAZY = {
+    "Map": "tight_loops",
+    "contour_tif_box": "common",
+    "generate_random_string": "common",
+    "generate_random_strings": "common",
+    "profile": "profiling",
+}
+
+__all__ = sorted(_LAZY)
+
+
+def __getattr__(name):
+    if name in _LAZY:
+        value = getattr(importlib.import_module(f".{_LAZY[name]}", __name__), name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY))
@@ -0,0 +1,80 @@
+"""Registry of the basemaps available to both map classes."""
+
+import difflib
+import re
+from functools import lru_cache
+
+GOOGLE_BASEMAPS = {
+    "Roadmap": "http://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}",
+    "Satellite": "http://mt0.google.com/vt/lyrs=s&hl=en&x={x}&y={y}&z={z}",
+}
+
+
+def normalize_name(name):
+    """Returns the lookup key of a basemap name, e.g. "openstreetmapmapnik"."""
+    return re.sub(r"[^0-9a-z]", "", name.lower())
+
+
+@lru_cache(maxsize=None)
+def basemap_index():
+    """Returns the index of every basemap provider, keyed by normalized name.
+
+    The index holds the Google basemaps and every xyzservices provider, under its
+    full name (e.g. "OpenStreetMap.Mapnik") and, for the first provider of a
+    group, under the group name (e.g. "OpenStreetMap"). It is built once.
+
+    Returns:
+        dict: The xyzservices TileProvider of each key.
+    """
+    import xyzservices
+    import xyzservices.providers as xyz
+
+    index = {}
+    for name, url in GOOGLE_BASEMAPS.items():
+        index[normalize_name(name)] = xyzservices.TileProvider(
+            name=name, url=url, attribution="Google", max_zoom=22
+        )
+
+    for name, provider in xyz.flatten().items():
+        index.setdefault(normalize_name(name), provider)
+        index.setdefault(normalize_name(name.split(".")[0]), provider)
+    return index
+
+
+def basemap_names():
+    """Returns the names of every basemap."""
+    return sorted({provider.name for provider in basemap_index().values()})
+
+
+@lru_cache(maxsize=256)
+def _resolve(key, options):
+    provider = basemap_index()[key]
+    return {
+        "name": provider.name,
+        "url": provider.build_url(**dict(options)),
+        "attribution": provider.get("attribution", ""),
+        "html_attribution": provider.get("html_attribution", provider.get("attribution", "")),
+        "min_zoom": provider.get("min_zoom", 0),
+        "max_zoom": provider.get("max_zoom", 18),
+    }
+
+
+def get_basemap(name, **kwargs):
+    """Returns a basemap by name, ignoring case and separators.
+
+    Args:
+        name (str): The name of the basemap, e.g. "Roadmap", "Esri.WorldImagery"
+            or "esri worldimagery".
+        **kwargs: Keyword arguments passed to TileProvider.build_url, e.g. the
+            `accessToken` of providers that require one.
+
+    Returns:
+        dict: The name, URL, attribution and zoom range of the basemap.
+    """
+    index = basemap_index()
+    key = normalize_name(name)
+    if key not in index:
+        matches = difflib.get_close_matches(key, index, n=3)
+        hint = f" Did you mean {', '.join(index[match].name for match in matches)}?" if matches else ""
+        raise ValueError(f"Invalid basemap name.{hint}")
+    return dict(_resolve(key, tuple(sorted(kwargs.items()))))
@@ -0,0 +1,153 @@
+"""Persistent on-disk cache for prepared layers."""
+
+import hashlib
+import json
+import os
+import threading
+
+
+def get_cache_dir():
+    """Returns the root cache directory.
+
+    The location can be set with the TIGHT_LOOPS_CACHE_DIR environment variable
+    and defaults to ~/.cache/tight_loops.
+    """
+    default = os.path.join(os.path.expanduser("~"), ".cache", "tight_loops")
+    return os.environ.get("TIGHT_LOOPS_CACHE_DIR", default)
+
+
+def file_fingerprint(path):
+    """Returns the path, modification time and size of a file and its sidecars.
+
+    For a Shapefile, the .dbf, .shx, .prj and .cpg files are included so that
+    editing the attributes or projection also changes the fingerprint.
+    """
+    path = os.path.abspath(path)
+    files = [path]
+    stem, ext = os.path.splitext(path)
+    if ext.lower() == ".shp":
+        files += [stem + sidecar for sidecar in (".dbf", ".shx", ".prj", ".cpg")]
+
+    fingerprint = []
+    for name in files:
+        if os.path.exists(name):
+            stat = os.stat(name)
+            fingerprint.append([name, stat.st_mtime_ns, stat.st_size])
+    return fingerprint
+
+
+def cache_available():
+    """Returns whether pyarrow, which the cache needs to write GeoParquet, is installed."""
+    import importlib.util
+
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def cache_key(path, **options):
+    """Returns a cache key for a file and the options used to load it."""
+    payload = {"file": file_fingerprint(path), "options": options}
+    text = json.dumps(payload, sort_keys=True, default=str)
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class VectorCache:
+    """A size-bounded LRU cache of GeoDataFrames stored as GeoParquet.
+
+    Args:
+        cache_dir (str, optional): The root cache directory. Defaults to None,
+            which uses get_cache_dir().
+        max_size (int): The maximum total size of the cache in bytes. The least
+            recently used entries are removed when it is exceeded.
+    """
+
+    def __init__(self, cache_dir=None, max_size=2 * 1024 ** 3):
+        self.cache_dir = os.path.join(cache_dir or get_cache_dir(), "vector")
+        self.max_size = max_size
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key + ".parquet")
+
+    def get(self, key):
+        """Returns the cached GeoDataFrame for a key, or None."""
+        import geopandas as gpd
+
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return gpd.read_parquet(path)
+
+    def put(self, key, gdf):
+        """Stores a GeoDataFrame under a key and evicts old entries."""
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError("Please install pyarrow: pip install pyarrow")
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(key)
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        gdf.to_parquet(tmp)
+        os.replace(tmp, path)
+        self.evict()
+
+    def evict(self):
+        """Removes the least recently used entries until the cache fits max_size."""
+        entries = self.info()["entries"]
+        total = sum(entry["size"] for entry in entries)
+        for entry in sorted(entries, key=lambda entry: entry["last_used"]):
+            if total <= self.max_size:
+                break
+            # Another reader of the same cache may have evicted it already.
+            try:
+                os.remove(self._path(entry["key"]))
+            except FileNotFoundError:
+                pass
+            total -= entry["size"]
+
+    def info(self):
+        """Returns the entries and total size of the cache.
+
+        Returns:
+            dict: The cache directory, the number of entries, their total size in
+                bytes and a list of entries with their key, size and last use
+                timestamp.
+        """
+        entries = []
+        if os.path.exists(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                if not name.endswith(".parquet"):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.cache_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append(
+                    {
+                        "key": name[: -len(".parquet")],
+                        "size": stat.st_size,
+                        "last_used": stat.st_mtime,
+                    }
+                )
+        return {
+            "cache_dir": self.cache_dir,
+            "count": len(entries),
+            "size": sum(entry["size"] for entry in entries),
+            "entries": entries,
+        }
+
+    def clear(self):
+        """Removes every entry from the cache."""
+        if os.path.exists(self.cache_dir):
+            for name in os.listdir(self.cache_dir):
+                os.remove(os.path.join(self.cache_dir, name))
+
+
+def cache_info(cache_dir=None):
+    """Returns the entries and total size of the vector cache."""
+    return VectorCache(cache_dir).info()
+
+
+def clear_cache(cache_dir=None):
+    """Removes every entry from the vector cache."""
+    VectorCache(cache_dir).clear()
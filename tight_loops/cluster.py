@@ -0,0 +1,217 @@
+"""Zoom-aware point clustering computed in Python."""
+
+import html
+from functools import partial
+
+import numpy as np
+
+from .view import MapViewLayer, split_bounds
+
+
+def lonlat_to_unit(lon, lat):
+    """Projects longitude/latitude to Web Mercator scaled to the unit square."""
+    lat = np.clip(np.asarray(lat, dtype="float64"), -85.05112878, 85.05112878)
+    x = (np.asarray(lon, dtype="float64") + 180.0) / 360.0
+    sin = np.sin(np.radians(lat))
+    y = 0.5 - np.log((1 + sin) / (1 - sin)) / (4 * np.pi)
+    return x, y
+
+
+def unit_to_lonlat(x, y):
+    """Inverse of `lonlat_to_unit`."""
+    lon = np.asarray(x) * 360.0 - 180.0
+    lat = np.degrees(np.arctan(np.sinh(np.pi * (1 - 2 * np.asarray(y)))))
+    return lon, lat
+
+
+class PointClusterIndex:
+    """A hierarchical grid index of point clusters.
+
+    The points are binned into a grid of `radius` pixel cells at `max_zoom`, and
+    every coarser zoom level is built by merging the 2x2 cells of the level
+    below it, so the whole pyramid costs one sort of the input points.
+
+    Args:
+        lon (array-like): The point longitudes.
+        lat (array-like): The point latitudes.
+        radius (int): The cluster radius in pixels.
+        max_zoom (int): The highest zoom level at which points are clustered.
+            Above it, every point is returned on its own.
+        tile_size (int): The tile size in pixels.
+    """
+
+    def __init__(self, lon, lat, radius=60, max_zoom=16, tile_size=256):
+        self.radius = radius
+        self.max_zoom = max_zoom
+        self.lon = np.asarray(lon, dtype="float64")
+        self.lat = np.asarray(lat, dtype="float64")
+        self.x, self.y = lonlat_to_unit(self.lon, self.lat)
+        self.levels = {}
+
+        valid = np.flatnonzero(np.isfinite(self.x) & np.isfinite(self.y))
+        cells = tile_size * 2 ** max_zoom / radius
+        col = np.floor(self.x[valid] * cells).astype("int64")
+        row = np.floor(self.y[valid] * cells).astype("int64")
+        level = self._group(col, row, self.x[valid], self.y[valid], np.ones(len(valid)), valid)
+        self.levels[max_zoom] = level
+
+        for zoom in range(max_zoom - 1, -1, -1):
+            level = self._group(level["col"] // 2, level["row"] // 2, level["x"], level["y"], level["count"], level["point"])
+            self.levels[zoom] = level
+
+    @staticmethod
+    def _group(col, row, x, y, count, point):
+        """Merges the items that share a grid cell into weighted clusters."""
+        key = (col << 32) | (row & 0xFFFFFFFF)
+        order = np.argsort(key, kind="stable")
+        key = key[order]
+        starts = np.flatnonzero(np.r_[True, key[1:] != key[:-1]])
+
+        count = count[order]
+        total = np.add.reduceat(count, starts) if len(starts) else count[:0]
+        return {
+            "col": col[order][starts],
+            "row": row[order][starts],
+            "x": np.add.reduceat(x[order] * count, starts) / total if len(starts) else x[:0],
+            "y": np.add.reduceat(y[order] * count, starts) / total if len(starts) else y[:0],
+            "count": total,
+            "point": point[order][starts],
+        }
+
+    def query(self, zoom, bounds=None):
+        """Returns the clusters visible at a zoom level.
+
+        Args:
+            zoom (float): The map zoom level.
+            bounds (tuple, optional): The ((south, west), (north, east)) bounds,
+                which may cross the antimeridian. Defaults to None, which returns
+                the clusters of the whole world.
+
+        Returns:
+            dict: Arrays of "lon", "lat", "count" and "point", where "point" is the
+                index of the input point for clusters holding a single point.
+        """
+        zoom = int(max(zoom, 0))
+
+        if zoom > self.max_zoom:
+            x, y = self.x, self.y
+            point = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+            x, y, count = x[point], y[point], np.ones(len(point))
+        else:
+            level = self.levels[zoom]
+            x, y, count, point = level["x"], level["y"], level["count"], level["point"]
+
+        if bounds:
+            mask = np.zeros(len(x), dtype=bool)
+            for west, south, east, north in split_bounds(bounds):
+                x0, y1 = lonlat_to_unit(west, south)
+                x1, y0 = lonlat_to_unit(east, north)
+                mask |= (x >= x0) & (x <= x1) & (y >= y0) & (y <= y1)
+            x, y, count, point = x[mask], y[mask], count[mask], point[mask]
+
+        lon, lat = unit_to_lonlat(x, y)
+        return {"lon": lon, "lat": lat, "count": count.astype("int64"), "point": point}
+
+
+def popup_html(row):
+    """Formats a record as the HTML of a popup."""
+    return "<br>".join(
+        f"<b>{html.escape(str(key).title())}:</b> {html.escape(str(value))}" for key, value in row.items()
+    )
+
+
+class ClusterLayer(MapViewLayer):
+    """A layer of clustered points that follows the view of a map.
+
+    Only the clusters inside the current bounds are sent to the frontend. The
+    markers are recomputed when the zoom or bounds of the map change, markers
+    that stay visible are kept, and a single popup is filled in when a point is
+    clicked.
+
+    Args:
+        df (DataFrame): The points.
+        x (str): The name of the longitude column.
+        y (str): The name of the latitude column.
+        popup (list, optional): The columns shown in the popup. Defaults to None,
+            which shows all columns.
+        name (str): The name of the layer.
+        radius (int): The cluster radius in pixels.
+        max_zoom (int): The highest zoom level at which points are clustered.
+        padding (float): The fraction of the view added on each side when
+            selecting the visible clusters.
+    """
+
+    def __init__(self, df, x="longitude", y="latitude", popup=None, name="Points", radius=60, max_zoom=16, padding=0.25):
+        import ipyleaflet
+
+        self.df = df
+        self.popup_columns = list(popup) if popup is not None else list(df.columns)
+        self.padding = padding
+        self.index = PointClusterIndex(df[x].to_numpy(), df[y].to_numpy(), radius=radius, max_zoom=max_zoom)
+        self.layer = ipyleaflet.LayerGroup(name=name)
+        self.map = None
+        self._markers = {}
+        self._popup = None
+
+    def _detach(self):
+        self._close_markers(list(self._markers))
+
+    def update(self, change=None):
+        """Synchronizes the markers with the current view of the map."""
+        import ipyleaflet
+
+        zoom = int(self.map.zoom)
+        clusters = self.index.query(zoom, self._view_bounds())
+
+        markers = {}
+        for lon, lat, count, point in zip(clusters["lon"], clusters["lat"], clusters["count"], clusters["point"]):
+            key = ("point", point) if count == 1 else (zoom, point, count)
+            marker = self._markers.get(key)
+            if marker is None:
+                if count == 1:
+                    lat, lon = self.index_location(point)
+                    marker = ipyleaflet.Marker(location=(lat, lon), draggable=False)
+                    marker.on_click(partial(self._open_popup, point))
+                else:
+                    size = int(30 + 10 * np.log10(count))
+                    icon = ipyleaflet.DivIcon(
+                        html=f"<div style='line-height:{size}px;text-align:center'>{count}</div>",
+                        class_name="marker-cluster marker-cluster-medium",
+                        icon_size=[size, size],
+                    )
+                    marker = ipyleaflet.Marker(location=(lat, lon), icon=icon, draggable=False)
+                    marker.on_click(partial(self._zoom_to, lat, lon))
+            markers[key] = marker
+
+        self._close_markers([key for key in self._markers if key not in markers])
+        self._markers = markers
+        self.layer.layers = tuple(markers.values())
+
+    def index_location(self, point):
+        """Returns the (lat, lon) of an input point."""
+        return float(self.index.lat[point]), float(self.index.lon[point])
+
+    def _close_markers(self, keys):
+        for key in keys:
+            marker = self._markers.pop(key)
+            if marker.icon is not None:
+                marker.icon.close()
+            marker.close()
+
+    def _zoom_to(self, lat, lon, **kwargs):
+        self.map.center = (lat, lon)
+        self.map.zoom = min(self.map.zoom + 2, self.index.max_zoom + 1)
+
+    def _open_popup(self, point, **kwargs):
+        import ipyleaflet
+        import ipywidgets as widgets
+
+        location = self.index_location(point)
+        value = popup_html(self.df.iloc[point][self.popup_columns])
+
+        if self._popup is None:
+            self._popup = ipyleaflet.Popup(location=location, child=widgets.HTML(value), close_button=True)
+            self.map.add_layer(self._popup)
+        else:
+            self._popup.child.value = value
+            self._popup.open_popup(location)
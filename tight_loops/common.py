@@ -0,0 +1,245 @@
+"""Functions that do not need the map widgets."""
+
+import os
+import random
+import string
+
+
+def contour_tif_box(
+    i,
+    output=None,
+    interval=200,
+    base=0,
+    smooth=9,
+    tolerance=10,
+    engine="native",
+    levels=None,
+    max_workers=None,
+    tile_size=1024,
+    progress=None,
+    ):
+    """Generates contour lines from a DEM.
+
+    The native engine contours the DEM with vectorized marching squares over
+    tiles processed in parallel, and stitches the lines across the tile seams.
+    The "whitebox" engine runs WhiteboxTools' ContoursFromRaster instead.
+
+    Args:
+        i (str): The path to the input DEM.
+        output (str, optional): The output vector file. Defaults to None, which
+            only returns the contours (native engine only; required by whitebox).
+        interval (float): The contour interval.
+        base (float): The base contour height.
+        smooth (int): The size of the smoothing filter, in cells.
+        tolerance (float): The generalization angle in degrees.
+        engine (str): "native" or "whitebox".
+        levels (list, optional): Fixed contour levels used instead of `interval`
+            and `base` (native engine only). Defaults to None.
+        max_workers (int, optional): The number of worker processes. Defaults to None.
+        tile_size (int): The number of cells per tile side.
+        progress (callable, optional): Called with the tiles done and the total.
+
+    Returns:
+        GeoDataFrame: The contour lines with a HEIGHT column, or None with the
+            whitebox engine.
+    """
+    if engine == "native":
+        from .contour import contour_raster
+
+        return contour_raster(
+            i,
+            output,
+            interval=interval,
+            base=base,
+            levels=levels,
+            smooth=smooth,
+            tolerance=tolerance,
+            max_workers=max_workers,
+            tile_size=tile_size,
+            progress=progress,
+        )
+
+    if output is None:
+        raise ValueError("The whitebox engine writes its contours to a file, so output is required.")
+
+    import whitebox
+
+    wbt = whitebox.WhiteboxTools()
+
+    i = os.path.abspath(i)
+    output = os.path.abspath(output)
+
+    wbt.contours_from_raster(i=i, output=output, interval=interval, base=base, smooth=smooth, tolerance=tolerance)
+
+# ----------------------------------------------------------------GDAL Contour Function----------------------------------------------------------------
+# from osgeo import gdal, ogr, osr
+# import os
+
+# def contour_tif(input_file, output_file="new_contours/output_contours.shp", contourInterval=200.0, contourBase=0.0, fixedLevelCount=[], useNoData=False, noDataValue=0, idField=0, elevField=1):
+
+#     """
+#     This function creates contour lines from a DEM file. The function uses the GDAL library to open the DEM file and
+#     extract the elevation values. The function then uses the GDAL library to create a vector file containing the
+#     contour lines. The function uses the OGR library to create the vector file and add the contour lines to it.
+
+#     :param input_file: The input DEM file.
+#     :param output_file: The output vector file containing the contour lines.
+#     :param interval: The contour interval.
+#     :param base: The base contour.
+#     :param fixedLevels: A list of fixed contour levels.
+#     :param useNoData: A boolean value indicating whether to use the NoData value.
+#     :param useZ: A boolean value indicating whether to use the Z value.
+#     :param idField: The field number for the ID field.
+#     :param elevField: The field number for the elevation field.
+#     """
+
+#     # Open the DEM file using the GDAL library
+#     input_file = 'Smokies_DEM.tif'
+#     ds = gdal.Open(input_file)
+
+#     # Get the geotransform information from the DEM
+#     transform = ds.GetGeoTransform()
+
+#     # Define the output file format and options
+#     driver = ogr.GetDriverByName('ESRI Shapefile')
+#     output_file = output_file
+#     output_dir = os.path.dirname(output_file)
+#     if not os.path.exists(output_dir):
+#         os.makedirs(output_dir)
+#     output_ds = driver.CreateDataSource(output_file)
+
+#     # Create the output layer and add a field for elevation values
+#     contour_layer = output_ds.CreateLayer('contours', srs=osr.SpatialReference().CloneGeogCS())
+#     contour_field = ogr.FieldDefn('elev', ogr.OFTReal)
+#     contour_layer.CreateField(contour_field)
+
+
+#     band = ds.GetRasterBand(1)
+#     gdal.ContourGenerate(
+#         band, 
+#         contourInterval=contourInterval, 
+#         contourBase=contourBase, 
+#         fixedLevelCount=fixedLevelCount, 
+#         useNoData=useNoData, 
+#         noDataValue=noDataValue,
+#         dstLayer=contour_layer, 
+#         idField=idField, 
+#         elevField=elevField
+#         )
+    
+#     # Clean up the resources
+#     ds = None
+#     output_ds = None
+
+    
+
+def generate_random_string(length=15):
+    """Generates a random string."""
+    return ''.join([random.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(length)])
+
+
+def _secure_indexes(size, k):
+    """Returns uniform random integers in [0, k) from the operating system's secure source.
+
+    Raw bytes are drawn with secrets.token_bytes, and values at or above the
+    largest multiple of k are rejected, so the modulo introduces no bias.
+    """
+    import secrets
+
+    import numpy as np
+
+    dtype = np.dtype("uint8") if k <= 2 ** 8 else np.dtype("uint16") if k <= 2 ** 16 else np.dtype("uint32")
+    limit = (2 ** (8 * dtype.itemsize)) // k * k
+    accepted = np.empty(0, dtype=dtype)
+    while accepted.size < size:
+        # Draw enough to finish in one round most of the time.
+        count = int((size - accepted.size) * 2 ** (8 * dtype.itemsize) / limit * 1.1) + 16
+        values = np.frombuffer(secrets.token_bytes(count * dtype.itemsize), dtype=dtype)
+        accepted = np.concatenate([accepted, values[values < limit]])
+    return (accepted[:size] % k).astype("int64")
+
+
+def _row_keys(indexes, k):
+    """Returns one sortable key per row of alphabet indexes.
+
+    Rows are packed into one integer when the number of possible strings fits in
+    64 bits, and otherwise viewed as raw bytes.
+    """
+    import numpy as np
+
+    length = indexes.shape[1]
+    if k ** length < 2 ** 63:
+        return indexes @ (k ** np.arange(length - 1, -1, -1, dtype="int64"))
+    dtype = "uint8" if k <= 2 ** 8 else "uint16" if k <= 2 ** 16 else "uint32"
+    rows = np.ascontiguousarray(indexes.astype(dtype))
+    return rows.view(f"V{rows.shape[1] * rows.itemsize}").ravel()
+
+
+def generate_random_strings(n, length=15, alphabet=string.ascii_lowercase, seed=None, secure=False, unique=True):
+    """Generates many random strings at once.
+
+    The characters of all the strings are sampled as one array of indexes into
+    the alphabet, and the strings are read back from it as fixed-width unicode.
+
+    Args:
+        n (int): The number of strings.
+        length (int): The number of characters per string.
+        alphabet (str): The characters to sample from.
+        seed (int | numpy.random.Generator, optional): The seed of the random
+            generator, for reproducible strings. Defaults to None.
+        secure (bool): Whether to use the operating system's cryptographically
+            secure source (secrets) instead of a seedable generator.
+        unique (bool): Whether the strings must all be different. Duplicates are
+            drawn again until none are left.
+
+    Returns:
+        list: The strings.
+    """
+    import numpy as np
+
+    alphabet = "".join(dict.fromkeys(alphabet))
+    k = len(alphabet)
+    if k == 0:
+        raise ValueError("alphabet must not be empty.")
+    if length < 1:
+        raise ValueError("length must be at least 1.")
+    if secure and seed is not None:
+        raise ValueError("seed cannot be used with secure=True.")
+    if unique and n > k ** length:
+        raise ValueError(f"There are only {k ** length} unique strings of length {length}.")
+
+    if secure:
+        def sample(size):
+            return _secure_indexes(size * length, k).reshape(size, length)
+    else:
+        rng = np.random.default_rng(seed)
+
+        def sample(size):
+            return rng.integers(0, k, size=(size, length))
+
+    codes = np.frombuffer(alphabet.encode("utf-32-le"), dtype="<u4")
+    indexes = sample(n)
+
+    if unique:
+        while True:
+            _, first = np.unique(_row_keys(indexes, k), return_index=True)
+            if first.size == n:
+                break
+            repeated = np.setdiff1d(np.arange(n), first)
+            indexes[repeated] = sample(repeated.size)
+
+    return np.ascontiguousarray(codes[indexes]).view(f"<U{length}").ravel().tolist()
+
+
+def expand_inputs(inputs):
+    """Expands a path, a glob pattern or a list of them into a sorted list of files."""
+    import glob
+
+    if isinstance(inputs, str):
+        inputs = [inputs]
+
+    paths = []
+    for item in inputs:
+        matches = sorted(glob.glob(item)) if glob.has_magic(item) else [item]
+        paths.extend(os.path.abspath(match) for match in matches)
+    return list(dict.fromkeys(paths))
@@ -0,0 +1,485 @@
+"""Native contour generation with vectorized marching squares."""
+
+import glob
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from .common import expand_inputs
+
+# Edges of a cell: 0 top, 1 right, 2 bottom, 3 left. Cases are indexed by
+# tl * 8 + tr * 4 + br * 2 + bl, where a corner is 1 if it is at or above the level.
+_SEGMENTS = {
+    1: [(3, 2)],
+    2: [(2, 1)],
+    3: [(3, 1)],
+    4: [(0, 1)],
+    6: [(0, 2)],
+    7: [(3, 0)],
+    8: [(3, 0)],
+    9: [(0, 2)],
+    11: [(0, 1)],
+    12: [(3, 1)],
+    13: [(2, 1)],
+    14: [(3, 2)],
+}
+
+# Saddles: (segments if the cell center is above the level, segments if below).
+_SADDLES = {
+    5: ([(3, 0), (2, 1)], [(0, 1), (3, 2)]),
+    10: ([(0, 1), (3, 2)], [(3, 0), (2, 1)]),
+}
+
+
+def smooth_array(data, size):
+    """Smooths an array with a `size` x `size` mean filter that ignores NaN.
+
+    Args:
+        data (ndarray): The 2D array with NaN for nodata.
+        size (int): The filter size in cells. Sizes below 2 return the data as is.
+
+    Returns:
+        ndarray: The smoothed array, with NaN kept where the input is NaN.
+    """
+    if size is None or size < 2:
+        return data
+
+    half = int(size) // 2
+    valid = np.isfinite(data)
+    values = np.where(valid, data, 0.0)
+    weights = valid.astype("float64")
+
+    def box_sum(array, axis):
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (half + 1, half)
+        cumsum = np.cumsum(np.pad(array, pad), axis=axis)
+        upper = np.take(cumsum, np.arange(2 * half + 1, cumsum.shape[axis]), axis=axis)
+        lower = np.take(cumsum, np.arange(0, cumsum.shape[axis] - 2 * half - 1), axis=axis)
+        return upper - lower
+
+    total = box_sum(box_sum(values, 0), 1)
+    count = box_sum(box_sum(weights, 0), 1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        smoothed = total / count
+    smoothed[~valid] = np.nan
+    return smoothed
+
+
+def contour_levels(data, interval=200, base=0):
+    """Returns the contour levels of an array for an interval and base."""
+    low, high = np.nanmin(data), np.nanmax(data)
+    first = math.ceil((low - base) / interval)
+    last = math.floor((high - base) / interval)
+    return [base + k * interval for k in range(first, last + 1)]
+
+
+def _edge_points(z, level, edge, i, j, row_offset, col_offset):
+    """Returns the pixel coordinates where a level crosses an edge of cells (i, j).
+
+    Points are computed from the global indexes of the two grid nodes of the edge,
+    so the cells on both sides of an edge, including cells in different tiles,
+    produce exactly the same coordinates.
+    """
+    if edge in (0, 2):
+        row = i + (edge == 2)
+        a, b = z[row, j], z[row, j + 1]
+        x = (j + col_offset) + (level - a) / (b - a)
+        y = (row + row_offset) + np.zeros(len(i))
+    else:
+        col = j + (edge == 1)
+        a, b = z[i, col], z[i + 1, col]
+        x = (col + col_offset) + np.zeros(len(i))
+        y = (i + row_offset) + (level - a) / (b - a)
+    return np.stack([x, y], axis=1)
+
+
+def _segments(z, level, pairs, i, j, row_offset, col_offset):
+    return [
+        np.stack(
+            [
+                _edge_points(z, level, start, i, j, row_offset, col_offset),
+                _edge_points(z, level, end, i, j, row_offset, col_offset),
+            ],
+            axis=1,
+        )
+        for start, end in pairs
+    ]
+
+
+def march(z, levels, row_offset=0, col_offset=0):
+    """Returns the contour segments of a grid with vectorized marching squares.
+
+    The levels crossed by every cell are found at once from the minimum and
+    maximum of its corners, so the work after one pass over the grid is
+    proportional to the number of crossings rather than cells times levels.
+
+    Args:
+        z (ndarray): The 2D grid with NaN for nodata.
+        levels (list): The contour levels.
+        row_offset (int): The row of z[0, 0] in the full grid.
+        col_offset (int): The column of z[0, 0] in the full grid.
+
+    Returns:
+        dict: For each level, an (n, 2, 2) array of segments in pixel coordinates
+            of the full grid, as (column, row) pairs.
+    """
+    levels = np.sort(np.asarray(levels, dtype="float64"))
+    tl, tr, br, bl = z[:-1, :-1], z[:-1, 1:], z[1:, 1:], z[1:, :-1]
+    cell_min = np.minimum(np.minimum(tl, tr), np.minimum(br, bl)).ravel()
+    cell_max = np.maximum(np.maximum(tl, tr), np.maximum(br, bl)).ravel()
+
+    # A cell crosses the levels L with min < L <= max; NaN corners never match.
+    cells = np.flatnonzero(np.isfinite(cell_min) & np.isfinite(cell_max))
+    first = np.searchsorted(levels, cell_min[cells], side="right")
+    count = np.searchsorted(levels, cell_max[cells], side="right") - first
+    crossing = count > 0
+    cells, first, count = cells[crossing], first[crossing], count[crossing]
+
+    offsets = np.arange(count.sum()) - np.repeat(np.cumsum(count) - count, count)
+    index = np.repeat(first, count) + offsets
+    i, j = np.divmod(np.repeat(cells, count), tl.shape[1])
+    level = levels[index]
+
+    case = (
+        (z[i, j] >= level) * 8
+        + (z[i, j + 1] >= level) * 4
+        + (z[i + 1, j + 1] >= level) * 2
+        + (z[i + 1, j] >= level) * 1
+    )
+
+    segments, segment_index = [], []
+    for value, pairs in _SEGMENTS.items():
+        mask = case == value
+        for array in _segments(z, level[mask], pairs, i[mask], j[mask], row_offset, col_offset):
+            segments.append(array)
+            segment_index.append(index[mask])
+
+    for value, (above, below) in _SADDLES.items():
+        mask = case == value
+        si, sj, slevel, sindex = i[mask], j[mask], level[mask], index[mask]
+        center = (z[si, sj] + z[si, sj + 1] + z[si + 1, sj + 1] + z[si + 1, sj]) / 4 >= slevel
+        for side, pairs in ((center, above), (~center, below)):
+            for array in _segments(z, slevel[side], pairs, si[side], sj[side], row_offset, col_offset):
+                segments.append(array)
+                segment_index.append(sindex[side])
+
+    segments = np.concatenate(segments)
+    segment_index = np.concatenate(segment_index)
+    order = np.argsort(segment_index, kind="stable")
+    bounds = np.searchsorted(segment_index[order], np.arange(len(levels) + 1))
+    return {
+        float(levels[k]): segments[order[bounds[k] : bounds[k + 1]]]
+        for k in range(len(levels))
+    }
+
+
+def _march_tile(z, levels, row_offset, col_offset):
+    return march(z, levels, row_offset, col_offset)
+
+
+def contour_array(
+    data,
+    transform,
+    levels,
+    crs=None,
+    tolerance=0,
+    max_workers=None,
+    tile_size=1024,
+    progress=None,
+):
+    """Generates contour lines from a 2D array.
+
+    The array is split into tiles that overlap by one row and column, every tile
+    is contoured in a process pool, and the segments are stitched into lines
+    across the tile seams.
+
+    Args:
+        data (ndarray): The 2D array with NaN for nodata.
+        transform (Affine): The affine transform of the array.
+        levels (list): The contour levels.
+        crs (optional): The CRS of the array. Defaults to None.
+        tolerance (float): The generalization angle in degrees, as in
+            WhiteboxTools. Vertices are removed with Douglas-Peucker using a
+            distance of half a cell times tan(tolerance). Defaults to 0.
+        max_workers (int, optional): The number of worker processes. Defaults to
+            None, which uses the number of CPUs. 1 contours in this process.
+        tile_size (int): The number of cells per tile side.
+        progress (callable, optional): Called with the number of tiles done and
+            the total number of tiles. Defaults to None.
+
+    Returns:
+        GeoDataFrame: The contour lines with a HEIGHT column.
+    """
+    import geopandas as gpd
+    import shapely
+
+    rows, cols = data.shape
+    tiles = [
+        (r, c)
+        for r in range(0, max(rows - 1, 1), tile_size)
+        for c in range(0, max(cols - 1, 1), tile_size)
+    ]
+
+    def block(r, c):
+        return data[r : r + tile_size + 1, c : c + tile_size + 1], levels, r, c
+
+    segments = {float(level): [] for level in levels}
+
+    def collect(result):
+        for level, array in result.items():
+            segments[level].append(array)
+
+    if max_workers == 1 or len(tiles) == 1:
+        for done, (r, c) in enumerate(tiles, 1):
+            collect(_march_tile(*block(r, c)))
+            if progress:
+                progress(done, len(tiles))
+    else:
+        executor = ProcessPoolExecutor(max_workers=max_workers or os.cpu_count())
+        futures = [executor.submit(_march_tile, *block(r, c)) for r, c in tiles]
+        try:
+            for done, future in enumerate(as_completed(futures), 1):
+                collect(future.result())
+                if progress:
+                    progress(done, len(tiles))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+
+    heights, geoms = [], []
+    for level in sorted(segments):
+        array = np.concatenate(segments[level]) if segments[level] else np.empty((0, 2, 2))
+        if not len(array):
+            continue
+        merged = shapely.line_merge(shapely.multilinestrings(shapely.linestrings(array)))
+        parts = shapely.get_parts(merged)
+        heights.extend([level] * len(parts))
+        geoms.append(parts)
+
+    geoms = np.concatenate(geoms) if geoms else np.empty(0, dtype=object)
+
+    # Pixel (column, row) to map coordinates through the cell centers.
+    a, b, c, d, e, f = transform.a, transform.b, transform.c, transform.d, transform.e, transform.f
+
+    def to_map(coords):
+        x, y = coords[:, 0] + 0.5, coords[:, 1] + 0.5
+        return np.stack([a * x + b * y + c, d * x + e * y + f], axis=1)
+
+    geoms = shapely.transform(geoms, to_map)
+
+    if tolerance:
+        cell = math.hypot(a, d)
+        geoms = shapely.simplify(geoms, cell * 0.5 * math.tan(math.radians(tolerance)))
+
+    return gpd.GeoDataFrame({"HEIGHT": heights}, geometry=list(geoms), crs=crs)
+
+
+def read_dem(path, band=1):
+    """Reads a raster band as a float array with NaN for nodata.
+
+    Returns:
+        tuple: The array, its affine transform and its CRS.
+    """
+    try:
+        import rasterio
+    except ImportError:
+        raise ImportError("Please install rasterio: pip install rasterio")
+
+    with rasterio.open(path) as src:
+        data = src.read(band, masked=True)
+        return np.ma.filled(data.astype("float64"), np.nan), src.transform, src.crs
+
+
+def contour_raster(
+    path,
+    output=None,
+    interval=200,
+    base=0,
+    levels=None,
+    smooth=9,
+    tolerance=10,
+    max_workers=None,
+    tile_size=1024,
+    progress=None,
+):
+    """Generates contour lines from a DEM file.
+
+    Args:
+        path (str): The path to the DEM.
+        output (str, optional): The output vector file. Defaults to None, which
+            only returns the contours.
+        interval (float): The contour interval.
+        base (float): The base contour height.
+        levels (list, optional): Fixed contour levels used instead of `interval`
+            and `base`. Defaults to None.
+        smooth (int): The size of the mean filter applied to the DEM, in cells.
+        tolerance (float): The generalization angle in degrees.
+        max_workers (int, optional): The number of worker processes. Defaults to None.
+        tile_size (int): The number of cells per tile side.
+        progress (callable, optional): Called with the tiles done and the total.
+
+    Returns:
+        GeoDataFrame: The contour lines with a HEIGHT column.
+    """
+    from .vector import write_vector
+
+    data, transform, crs = read_dem(path)
+    data = smooth_array(data, smooth)
+    if levels is None:
+        levels = contour_levels(data, interval, base)
+
+    gdf = contour_array(
+        data,
+        transform,
+        levels,
+        crs=crs,
+        tolerance=tolerance,
+        max_workers=max_workers,
+        tile_size=tile_size,
+        progress=progress,
+    )
+
+    if output is not None:
+        write_vector(gdf, output)
+
+    return gdf
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Returns the BLAKE2 digest of the content of a file."""
+    import hashlib
+
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _contour_jobs(path, jobs, base, smooth, tolerance):
+    """Contours one DEM for several intervals, reading and smoothing it once."""
+    from .vector import write_vector
+
+    data, transform, crs = read_dem(path)
+    data = smooth_array(data, smooth)
+
+    for interval, levels, output in jobs:
+        if levels is None:
+            levels = contour_levels(data, interval, base)
+        gdf = contour_array(data, transform, levels, crs=crs, tolerance=tolerance, max_workers=1)
+        stem, ext = os.path.splitext(output)
+        # Write then rename, so an interrupted run never leaves a partial cached file.
+        tmp = f"{stem}.tmp{ext}"
+        write_vector(gdf, tmp)
+        if ext.lower() == ".shp":
+            # The sidecar files go first, as the .shp file marks the output as done.
+            for sidecar in glob.glob(glob.escape(f"{stem}.tmp") + ".*"):
+                if sidecar != tmp:
+                    os.replace(sidecar, stem + sidecar[len(f"{stem}.tmp"):])
+        os.replace(tmp, output)
+    return path
+
+
+def contour_batch(
+    inputs,
+    output_dir,
+    intervals=(200,),
+    base=0,
+    levels=None,
+    smooth=9,
+    tolerance=10,
+    max_workers=None,
+    extension=".gpkg",
+    hash_content=False,
+    progress=True,
+):
+    """Generates contours for many DEMs and intervals, skipping cached results.
+
+    Each DEM is read and smoothed once in a worker process and then contoured at
+    every interval. Every output file is named after a hash of the input and the
+    parameters (`interval` or `levels`, `base`, `smooth`, `tolerance`), so files
+    that already exist are reused on later runs.
+
+    Args:
+        inputs (str | list): A path, a glob pattern such as "dems/*.tif", or a
+            list of them.
+        output_dir (str): The directory of the output files.
+        intervals (list): The contour intervals.
+        base (float): The base contour height.
+        levels (list, optional): Fixed contour levels used instead of `intervals`.
+            Defaults to None.
+        smooth (int): The size of the smoothing filter, in cells.
+        tolerance (float): The generalization angle in degrees.
+        max_workers (int, optional): The number of worker processes. Defaults to
+            None, which uses the number of CPUs.
+        extension (str): The extension, and so the format, of the output files.
+        hash_content (bool): Whether to hash the content of the inputs. By
+            default the path, modification time and size identify an input.
+        progress (bool | callable): Whether to print progress. A callable is
+            called with the number of DEMs done and the total.
+
+    Returns:
+        list: A dict per input and interval with the "input", "interval",
+            "output", whether the output was "cached", and an "error" message
+            if the DEM failed.
+    """
+    import hashlib
+    import json
+
+    from .cache import file_fingerprint
+
+    os.makedirs(output_dir, exist_ok=True)
+    params = [(None, list(levels))] if levels is not None else [(interval, None) for interval in intervals]
+
+    results, pending = [], {}
+    for path in expand_inputs(inputs):
+        source = file_digest(path) if hash_content else file_fingerprint(path)
+        stem = os.path.splitext(os.path.basename(path))[0]
+        for interval, fixed in params:
+            key = {
+                "input": source,
+                "interval": interval,
+                "levels": fixed,
+                "base": base,
+                "smooth": smooth,
+                "tolerance": tolerance,
+            }
+            digest = hashlib.sha256(json.dumps(key, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+            label = "levels" if fixed is not None else f"{interval:g}"
+            output = os.path.join(output_dir, f"{stem}_{label}_{digest}{extension}")
+            cached = os.path.exists(output)
+            record = {"input": path, "interval": interval, "output": output, "cached": cached}
+            results.append(record)
+            if not cached:
+                pending.setdefault(path, []).append((interval, fixed, output))
+
+    if progress is True:
+
+        def progress(done, total):
+            print(f"Contoured {done}/{total} DEMs")
+
+    if pending:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(_contour_jobs, path, jobs, base, smooth, tolerance): path
+                for path, jobs in pending.items()
+            }
+            errors = {}
+            for done, future in enumerate(as_completed(futures), 1):
+                try:
+                    future.result()
+                except Exception as e:
+                    errors[futures[future]] = str(e)
+                if progress:
+                    progress(done, len(futures))
+
+        for record in results:
+            if record["input"] in errors:
+                record["error"] = errors[record["input"]]
+
+    return results
@@ -1,43 +1,209 @@
 import folium
 import os
-import geemap.foliumap as geemap
+import re
 
+from .profiling import profiled, stage
+
+# Lets the jQuery requests of GeoJson layers with embed=False load gzip
+# compressed sidecar files, which browsers do not decompress on their own. It goes
+# first in the script section at the end of the page, after the jQuery include
+# of the header and before the requests of the layers.
+GZIP_LOADER = """
+$.ajaxTransport("+*", function(options) {
+    if (!/\\.gz$/.test(options.url)) {
+        return;
+    }
+    var controller = new AbortController();
+    return {
+        send: function(headers, complete) {
+            fetch(options.url, {signal: controller.signal})
+                .then(function(response) {
+                    var stream = response.body.pipeThrough(new DecompressionStream("gzip"));
+                    return new Response(stream).text();
+                })
+                .then(function(text) { complete(200, "success", {text: text}); })
+                .catch(function(error) { complete(404, String(error)); });
+        },
+        abort: function() { controller.abort(); }
+    };
+});
+"""
+
+
+# The blocks whose whitespace matters: <pre> and <textarea> elements, and the
+# template literals of inline scripts.
+_PRESERVED = re.compile(r"(<pre\b.*?</pre>|<textarea\b.*?</textarea>|`(?:\\.|[^`\\])*`)", re.DOTALL | re.IGNORECASE)
+
+# Containers with at most this many items are summarized by their content in the
+# state of the map, larger ones by their identity and length.
+_STATE_ITEMS = 64
+
+
+def _minify_lines(text):
+    """Removes the indentation and blank lines of text between preserved blocks.
+
+    The first and the last line may continue a preserved block, so only their
+    outer side is stripped.
+    """
+    lines = text.split("\n")
+    if len(lines) == 1:
+        return text
+    head, *body, tail = lines
+    return "\n".join([head.rstrip()] + [line.strip() for line in body if line.strip()] + [tail.lstrip()])
+
+
+def minify_html(html):
+    """Removes the indentation and blank lines of an HTML page.
+
+    Line breaks are kept, so inline scripts keep working, and <pre> and
+    <textarea> elements and template literals are left untouched.
+    """
+    parts = _PRESERVED.split(html)
+    # The odd parts are the preserved blocks.
+    return "".join(part if i % 2 else _minify_lines(part) for i, part in enumerate(parts))
+
+
+def _summary(value):
+    """Returns a hashable summary of an attribute of an element."""
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)) and len(value) <= _STATE_ITEMS:
+        return tuple(_summary(item) for item in value)
+    if isinstance(value, dict) and len(value) <= _STATE_ITEMS:
+        return tuple((str(key), _summary(item)) for key, item in value.items())
+    return (type(value).__name__, id(value), len(value) if hasattr(value, "__len__") else None)
+
+
+def element_state(element):
+    """Returns a summary of an element tree that changes when its HTML may change.
+
+    It covers the elements of the tree, their order and their public attributes,
+    such as the location and the options of a map. Large containers, such as the
+    features of a GeoJson layer, are summarized by their identity and length, so
+    editing them in place without changing their length is not detected.
+    """
+    from branca.element import Element
+
+    state = []
+    seen = set()
+    stack = [element]
+    while stack:
+        element = stack.pop()
+        # Elements may refer to each other, e.g. a marker to its map.
+        if id(element) in seen:
+            continue
+        seen.add(id(element))
+        state.append((id(element), tuple(element._children)))
+        for key, value in vars(element).items():
+            if key.startswith("_"):
+                continue
+            if isinstance(value, Element):
+                stack.append(value)
+                state.append(key)
+            else:
+                state.append((key, _summary(value)))
+        stack.extend(element._children.values())
+    return tuple(state)
 
 
 class Map(folium.Map):
     """A folium map."""
+    @profiled
     def __init__(self, location=[45.5236, -122.6750], zoom_start=13, **kwargs):
-       
+        # The rendered HTML, keyed on the state of the page and the options.
+        self._html_cache = {}
+        # The keys in self._children of the children of each type and layer name,
+        # kept up to date by add_child so lookups never walk or serialize the map.
+        self._children_by_type = {}
+        self._children_by_name = {}
+
         if "scroll_wheel_zoom" not in kwargs:
             kwargs["scroll_wheel_zoom"] = True
         super().__init__(location=location, zoom_start=zoom_start, **kwargs)
 
+    def add_child(self, child, name=None, index=None):
+        """Adds a child to the map and indexes it."""
+        key = name if name is not None else child.get_name()
+        self._children_by_type.setdefault(type(child).__name__, {})[key] = None
+        layer_name = getattr(child, "layer_name", None)
+        if layer_name is not None:
+            self._children_by_name[layer_name] = key
+        return super().add_child(child, name=name, index=index)
+
+    def find_children(self, child_type):
+        """Returns the children of the map of a type.
+
+        Args:
+            child_type (str | type): The class or class name, e.g. "LayerControl".
+
+        Returns:
+            list: The children, in the order they were added.
+        """
+        if not isinstance(child_type, str):
+            child_type = child_type.__name__
+        keys = self._children_by_type.get(child_type, {})
+        return [self._children[key] for key in keys if key in self._children]
+
+    def find_layer(self, name):
+        """Returns the layer of the map with a name, or None."""
+        child = self._children.get(self._children_by_name.get(name))
+        if child is not None and getattr(child, "layer_name", None) == name:
+            return child
+        return None
+
+    @profiled
     def add_tile_layer(self, url, name, attribution, **kwargs):
         """Adds a tile layer to the map."""
         tile_layer = folium.TileLayer(tiles=url, name=name, attr=attribution, **kwargs)
         tile_layer.add_to(self)
+        return tile_layer
     
+    def basemap_layer(self):
+        """Returns the basemap layer of the map, adding one if the map has none."""
+        for child in self.find_children(folium.TileLayer):
+            if not child.overlay:
+                return child
+        layer = folium.TileLayer()
+        layer.add_to(self)
+        return layer
+
+    @profiled
     def add_basemap(self, basemap, **kwargs):
-            
-        import xyzservices.providers as xyz
+        """Sets the basemap of the map.
+
+        The map keeps a single basemap layer whose tiles are swapped in place, so
+        changing the basemap never leaves other basemap layers loading tiles.
 
-        if basemap.lower() == "roadmap":
-            url = "http://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}"
-            self.add_tile_layer(url, name=basemap, attribution="Google")
+        Args:
+            basemap (str): The name of the basemap, e.g. "Roadmap", "Satellite" or
+                an xyzservices provider such as "Esri.WorldImagery". Case and
+                separators are ignored.
+            **kwargs: Keyword arguments passed to folium.TileLayer.
 
-        elif basemap.lower() == "satellite":
-            url = "http://mt0.google.com/vt/lyrs=s&hl=en&x={x}&y={y}&z={z}"
-            self.add_tile_layer(url, name=basemap, attribution="Google")
+        Returns:
+            folium.TileLayer: The basemap layer.
+        """
+        from .basemaps import get_basemap
 
-        else:
-            try:
-                basemap = eval(f"xyz.{basemap}")
-                url = basemap.build_url()
-                attribution = basemap.attribution
-                self.add_tile_layer(url, name=basemap.name, attr=attribution, **kwargs)
-            except:
-                raise ValueError("Invalid basemap name.")
-            
+        basemap = get_basemap(basemap)
+        tiles = folium.TileLayer(
+            tiles=basemap["url"],
+            name=basemap["name"],
+            attr=basemap["html_attribution"],
+            min_zoom=basemap["min_zoom"],
+            max_zoom=basemap["max_zoom"],
+            **kwargs,
+        )
+        layer = self.basemap_layer()
+        key = self._children_by_name.pop(layer.layer_name, None)
+        layer.tiles = tiles.tiles
+        layer.options = tiles.options
+        layer.tile_name = layer.layer_name = tiles.layer_name
+        if key is not None:
+            self._children_by_name[layer.layer_name] = key
+        return layer
+
+    @profiled
     def add_geojson(self, data, **kwargs):
         """Adds a GeoJSON layer to the map."""
         import json
@@ -45,32 +211,136 @@ class Map(folium.Map):
             data = json.load(f)
         geojson = folium.GeoJson(data=data, **kwargs)
         geojson.add_to(self)
+        return geojson
+
+    @profiled
+    def add_shp(self, data, merge=True, max_workers=None, progress=False, **kwargs):
+        """Adds a Shapefile layer to the map.
+
+        Args:
+            data (str | list): The path to the Shapefile, or a glob pattern or a
+                list of paths, which are read and reprojected in parallel.
+            merge (bool): Whether to merge many files into one layer. Otherwise
+                each file is a GeoJson layer of a FeatureGroup.
+            max_workers (int, optional): The number of threads reading many files.
+            progress (bool | callable): Whether to print progress while reading
+                many files.
 
-    def add_shp(self, data, **kwargs):
-        """Adds a Shapefile layer to the map."""
+        Returns:
+            folium.GeoJson | folium.FeatureGroup: The layer. When many files are
+                loaded, its `errors` attribute maps the files that could not be
+                read to their error message.
+        """
         import geopandas as gpd
         import json
+
+        from .vector import is_multi_input, read_vectors
+
+        if is_multi_input(data):
+            import pandas as pd
+
+            frames, errors = read_vectors(data, max_workers=max_workers, progress=progress)
+            if not frames:
+                raise ValueError(f"None of the vector files could be read: {errors}")
+            if merge:
+                gdf = pd.concat(list(frames.values()), ignore_index=True)
+                layer = folium.GeoJson(data=json.loads(gdf.to_json()), **kwargs)
+            else:
+                layer = folium.FeatureGroup(name=kwargs.pop("name", None))
+                for path, gdf in frames.items():
+                    name = os.path.splitext(os.path.basename(path))[0]
+                    folium.GeoJson(data=json.loads(gdf.to_json()), name=name, **kwargs).add_to(layer)
+            layer.add_to(self)
+            layer.errors = errors
+            return layer
+
         gdf = gpd.read_file(data)
         data = json.loads(gdf.to_json())
         geojson = folium.GeoJson(data=data, **kwargs)
         geojson.add_to(self)
+        return geojson
 
     def add_layer_control(self):
         """Adds layer control to the map."""
-        layer_ctrl = False
-        for item in self.to_dict()["children"]:
-            if item.startswith("layer_control"):
-                layer_ctrl = True
-                break
-        if not layer_ctrl:
+        if not self.find_children(folium.LayerControl):
             folium.LayerControl().add_to(self)
 
 
-    def to_html(self, filename=None, **kwargs):
-        """Exports a map as an HTML file.
+    def _geojson_layers(self):
+        """Yields the GeoJson layers of the map, including those inside groups."""
+        stack = list(self._children.values())
+        while stack:
+            child = stack.pop()
+            if isinstance(child, folium.GeoJson):
+                yield child
+            stack.extend(child._children.values())
+
+    def _render(self, sidecar_url=None, sidecar_threshold=100000, compress=True, minify=False, **kwargs):
+        """Renders the map, moving large GeoJson layers to sidecar files.
+
+        Returns:
+            tuple: The HTML and a dict of the sidecar file names and contents.
+        """
+        import gzip
+        import json
+
+        sidecars = {}
+        swapped = []
+        script = self.get_root().script
+        try:
+            if sidecar_url is not None:
+                for layer in self._geojson_layers():
+                    if not layer.embed:
+                        continue
+                    text = json.dumps(layer.data, separators=(",", ":"))
+                    if len(text) < sidecar_threshold:
+                        continue
+                    body = text.encode("utf-8")
+                    name = f"{layer.get_name()}.geojson"
+                    if compress:
+                        body = gzip.compress(body, mtime=0)
+                        name += ".gz"
+                    sidecars[name] = body
+                    swapped.append(layer)
+                    layer.embed = False
+                    layer.embed_link = f"{sidecar_url}/{name}"
+
+                if compress and sidecars:
+                    script.add_child(folium.Element(GZIP_LOADER), name="tight_loops_gzip_loader", index=0)
+
+            html = self.get_root().render(**kwargs)
+        finally:
+            for layer in swapped:
+                layer.embed = True
+                layer.embed_link = None
+            script._children.pop("tight_loops_gzip_loader", None)
+
+        if minify:
+            html = minify_html(html)
+        return html, sidecars
+
+    @profiled
+    def to_html(self, filename=None, sidecars=False, sidecar_threshold=100000, compress=True, minify=False, **kwargs):
+        """Renders the map as HTML, optionally exporting it to a file.
+
+        The rendered HTML is cached until the page changes, so calling this again
+        on an unchanged map does not render it again. Changes are detected from
+        the elements of the page and their attributes, see `element_state`. Data
+        edited in place without changing its length, such as the features of a
+        GeoJson layer, is not detected; call `clear_html_cache()` after such
+        changes.
 
         Args:
             filename (str, optional): File path to the output HTML. Defaults to None.
+            sidecars (bool, optional): Whether to write the data of large GeoJson
+                layers to separate files next to the HTML file, loaded by the page,
+                instead of inlining it. The page must then be served over HTTP.
+                Requires `filename`. Defaults to False.
+            sidecar_threshold (int, optional): The size in bytes above which the
+                data of a layer goes to a sidecar file. Defaults to 100000.
+            compress (bool, optional): Whether to gzip the sidecar files. Defaults to True.
+            minify (bool, optional): Whether to remove indentation and blank lines.
+                Defaults to False.
 
         Raises:
             ValueError: If it is an invalid HTML file.
@@ -78,16 +348,48 @@ class Map(folium.Map):
         Returns:
             str: A string containing the HTML code.
         """
-
-
+        sidecar_dir = sidecar_url = None
         if filename is not None:
             if not filename.endswith(".html"):
                 raise ValueError("The output file extension must be html.")
             filename = os.path.abspath(filename)
+            if sidecars:
+                sidecar_url = os.path.splitext(os.path.basename(filename))[0] + "_files"
+                sidecar_dir = os.path.join(os.path.dirname(filename), sidecar_url)
+        elif sidecars:
+            raise ValueError("A filename is required to write sidecar files.")
+
+        options = (sidecar_url, sidecar_threshold, compress, minify, tuple(sorted(kwargs.items())))
+        key = (element_state(self.get_root()), options)
+        if key in self._html_cache:
+            html, files = self._html_cache[key]
+        else:
+            with stage("render") as s:
+                html, files = self._render(sidecar_url, sidecar_threshold, compress, minify, **kwargs)
+                s.add(html_bytes=len(html))
+            # Rendering adds the includes of the elements to the page, so the
+            # HTML is stored under the state of the page after rendering.
+            state = element_state(self.get_root())
+            self._html_cache = {k: v for k, v in self._html_cache.items() if k[0] == state}
+            self._html_cache[(state, options)] = (html, files)
+
+        if filename is not None:
             out_dir = os.path.dirname(filename)
             if not os.path.exists(out_dir):
                 os.makedirs(out_dir)
-            self.save(filename, **kwargs)
+            if files:
+                os.makedirs(sidecar_dir, exist_ok=True)
+                for name, body in files.items():
+                    with open(os.path.join(sidecar_dir, name), "wb") as f:
+                        f.write(body)
+            with open(filename, "w", encoding="utf-8") as f:
+                f.write(html)
+
+        return html
+
+    def clear_html_cache(self):
+        """Discards the rendered HTML, so the next to_html call renders the map again."""
+        self._html_cache = {}
 
     def to_streamlit(
         self,
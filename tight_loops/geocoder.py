@@ -0,0 +1,373 @@
+"""Offline geocoding from a local gazetteer of place names."""
+
+import functools
+import json
+import math
+import re
+import threading
+import unicodedata
+import uuid
+
+import numpy as np
+
+from .view import split_bounds
+
+_geocode_server = None
+_lock = threading.Lock()
+
+EARTH_RADIUS = 6371.0088
+
+
+_NON_WORD = re.compile(r"[^\w]+")
+
+
+def normalize(text):
+    """Returns a name without accents, case or punctuation, for matching."""
+    text = str(text)
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", text.casefold()).split())
+
+
+def trigrams(texts):
+    """Returns the trigrams of normalized names, padded with spaces, as integers.
+
+    Each trigram is packed into one integer from the code points of its three
+    characters.
+
+    Args:
+        texts (list): The normalized names.
+
+    Returns:
+        tuple: The trigrams and the index of the name of each.
+    """
+    padded = [f"  {text} " for text in texts]
+    codes = np.frombuffer("".join(padded).encode("utf-32-le"), dtype="<u4").astype("int64")
+    lengths = np.fromiter((len(text) for text in padded), dtype="int64", count=len(padded))
+    counts = lengths - 2
+    owners = np.repeat(np.arange(len(padded)), counts)
+    starts = np.repeat(np.cumsum(lengths) - lengths, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    grams = (codes[starts] << 42) | (codes[starts + 1] << 21) | codes[starts + 2]
+    return grams, owners
+
+
+def haversine(lon1, lat1, lon2, lat2):
+    """Returns the great-circle distances between points, in kilometers."""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class Gazetteer:
+    """An in-memory index of place names for autocomplete and reverse geocoding.
+
+    Three indexes are built once:
+
+    - a sorted array of the names from each word onwards, so a query matches the
+      names containing a word starting with it ("york" finds "New York") with
+      two binary searches;
+    - an inverted index of trigrams, used to find near matches of misspelled
+      queries when there are too few prefix matches;
+    - an STRtree of the locations, built on the first reverse lookup.
+
+    Search results are cached per query.
+
+    Args:
+        names (list): The place names.
+        lon (array): The longitudes of the places.
+        lat (array): The latitudes of the places.
+        rank (array, optional): The importance of each place, e.g. the population.
+            Higher ranks are listed first. Defaults to None, which lists shorter
+            names first.
+        attributes (DataFrame, optional): Extra columns returned with each place.
+            Defaults to None.
+        cache_size (int): The number of queries whose results are cached.
+    """
+
+    def __init__(self, names, lon, lat, rank=None, attributes=None, cache_size=4096):
+        self.names = np.asarray(names, dtype=object)
+        self.lon = np.asarray(lon, dtype="float64")
+        self.lat = np.asarray(lat, dtype="float64")
+        self.attributes = attributes.reset_index(drop=True) if attributes is not None else None
+        normalized = [normalize(name) for name in self.names]
+
+        if rank is None:
+            self.rank = -np.fromiter((len(name) for name in normalized), dtype="float64", count=len(normalized))
+        else:
+            self.rank = np.nan_to_num(np.asarray(rank, dtype="float64"), nan=-np.inf)
+
+        # The position of each place when sorted by rank.
+        self._rank_order = np.empty(len(self.rank), dtype="int64")
+        self._rank_order[np.lexsort((np.arange(len(self.rank)), -self.rank))] = np.arange(len(self.rank))
+
+        # The names from each word onwards, sorted, with the word position.
+        keys, ids, positions = [], [], []
+        for i, name in enumerate(normalized):
+            words = name.split(" ")
+            keys.append(name)
+            keys.extend(" ".join(words[j:]) for j in range(1, len(words)))
+            ids.extend([i] * len(words))
+            positions.extend(range(len(words)))
+        # The keys are kept as objects, as a fixed-width array would take the
+        # width of the longest name for every key.
+        keys = np.array(keys, dtype=object)
+        order = np.argsort(keys, kind="stable")
+        self._keys = keys[order]
+        self._key_ids = np.asarray(ids, dtype="int64")[order]
+        self._key_positions = np.asarray(positions, dtype="int64")[order]
+
+        # The inverted index of trigrams, with each trigram once per place.
+        grams, owners = trigrams(normalized)
+        order = np.lexsort((owners, grams))
+        grams, owners = grams[order], owners[order]
+        distinct = np.ones(len(grams), dtype=bool)
+        distinct[1:] = (grams[1:] != grams[:-1]) | (owners[1:] != owners[:-1])
+        grams, owners = grams[distinct], owners[distinct]
+        self._grams, first = np.unique(grams, return_index=True)
+        self._offsets = np.append(first, len(grams))
+        self._postings = owners
+        self._gram_counts = np.bincount(owners, minlength=len(normalized))
+
+        self._tree = None
+        self._search = functools.lru_cache(maxsize=cache_size)(self._search_uncached)
+
+    @classmethod
+    def from_file(cls, path, name="name", x="longitude", y="latitude", rank=None, columns=None, **kwargs):
+        """Loads a gazetteer from a CSV file or a vector file of places.
+
+        Args:
+            path (str): The path to a CSV file with coordinate columns, or to a
+                vector file (e.g. a GeoPackage). The representative points of
+                non-point geometries are used.
+            name (str): The name column.
+            x (str): The longitude column of a CSV file.
+            y (str): The latitude column of a CSV file.
+            rank (str, optional): The column ranking the places, e.g. the
+                population. Defaults to None.
+            columns (list, optional): Extra columns returned with each place.
+                Defaults to None.
+            **kwargs: Keyword arguments passed to Gazetteer.
+
+        Returns:
+            Gazetteer: The gazetteer.
+        """
+        import pandas as pd
+
+        keep = [name] + ([rank] if rank else []) + list(columns or [])
+        if str(path).lower().endswith((".csv", ".txt", ".csv.gz")):
+            df = pd.read_csv(path, usecols=list(dict.fromkeys(keep + [x, y])))
+            lon, lat = df[x].to_numpy(), df[y].to_numpy()
+        else:
+            from .vector import read_vector
+
+            gdf = read_vector(path, columns=list(dict.fromkeys(keep)))
+            points = gdf.geometry.representative_point()
+            df, lon, lat = gdf, points.x.to_numpy(), points.y.to_numpy()
+
+        lon, lat = np.asarray(lon, dtype="float64"), np.asarray(lat, dtype="float64")
+        valid = df[name].notna().to_numpy() & np.isfinite(lon) & np.isfinite(lat)
+        df = df[valid]
+        return cls(
+            df[name].astype(str).to_numpy(),
+            lon[valid],
+            lat[valid],
+            rank=df[rank].to_numpy() if rank else None,
+            attributes=df[list(columns)] if columns else None,
+            **kwargs,
+        )
+
+    def __len__(self):
+        return len(self.names)
+
+    def place(self, i, distance=None):
+        """Returns a place as a Nominatim-style result."""
+        result = {
+            "place_id": int(i),
+            "display_name": str(self.names[i]),
+            "lat": str(self.lat[i]),
+            "lon": str(self.lon[i]),
+        }
+        if self.attributes is not None:
+            for key, value in self.attributes.iloc[i].items():
+                result[key] = value.item() if hasattr(value, "item") else value
+        if distance is not None:
+            result["distance"] = float(distance)
+        return result
+
+    def _prefix_matches(self, query, limit):
+        """Returns the best places with a word starting with the query.
+
+        Exact names come first, then the names starting with the query, then the
+        names with a later word starting with it, each by rank.
+        """
+        start = np.searchsorted(self._keys, query, side="left")
+        stop = np.searchsorted(self._keys, query + "\U0010ffff", side="left")
+        ids = self._key_ids[start:stop]
+        positions = self._key_positions[start:stop]
+        tiers = np.where(positions > 0, 2, np.where(self._keys[start:stop] == query, 0, 1))
+        order = tiers * len(self) + self._rank_order[ids]
+
+        # Short queries match many names, so the best few are picked first.
+        if len(order) > 4 * limit:
+            top = np.argpartition(order, 4 * limit - 1)[:4 * limit]
+            best = self._best(ids[top], order[top], limit)
+            if len(best) == limit:
+                return best
+        return self._best(ids, order, limit)
+
+    @staticmethod
+    def _best(ids, order, limit):
+        """Returns the first `limit` distinct ids, sorted by `order`."""
+        ids = ids[np.argsort(order, kind="stable")]
+        _, first = np.unique(ids, return_index=True)
+        return ids[np.sort(first)][:limit]
+
+    def _fuzzy_matches(self, query, threshold):
+        """Returns the places sharing enough trigrams with the query, with their scores."""
+        grams = np.unique(trigrams([query])[0])
+        found = np.searchsorted(self._grams, grams)
+        inside = found < len(self._grams)
+        found = found[inside][self._grams[found[inside]] == grams[inside]]
+        if not len(found):
+            return np.zeros(0, dtype="int64"), np.zeros(0)
+        postings = np.concatenate([self._postings[self._offsets[g]:self._offsets[g + 1]] for g in found])
+        ids, shared = np.unique(postings, return_counts=True)
+        scores = shared / (len(grams) + self._gram_counts[ids] - shared)
+        keep = scores >= threshold
+        return ids[keep], scores[keep]
+
+    def _search_uncached(self, query, limit, fuzzy):
+        ids = self._prefix_matches(query, limit)
+
+        if fuzzy and len(ids) < limit:
+            candidates, scores = self._fuzzy_matches(query, fuzzy)
+            new = ~np.isin(candidates, ids)
+            candidates, scores = candidates[new], scores[new]
+            order = np.lexsort((-self.rank[candidates], -scores))[: limit - len(ids)]
+            ids = np.concatenate([ids, candidates[order]])
+
+        return tuple(int(i) for i in ids)
+
+    def search(self, query, limit=10, fuzzy=0.3):
+        """Finds places by name.
+
+        Args:
+            query (str): The start of a name, or of any word in it.
+            limit (int): The maximum number of places.
+            fuzzy (float): The trigram similarity a place needs to be returned
+                when there are fewer than `limit` prefix matches, between 0 and
+                1. 0 or None turns near matches off.
+
+        Returns:
+            list: The places as Nominatim-style dicts.
+        """
+        query = normalize(query)
+        if not query or limit < 1:
+            return []
+        return [self.place(i) for i in self._search(query, int(limit), fuzzy or 0)]
+
+    def reverse(self, lat, lon, max_distance=None):
+        """Finds the place nearest to a location.
+
+        Args:
+            lat (float): The latitude.
+            lon (float): The longitude.
+            max_distance (float, optional): The largest distance in kilometers.
+                Defaults to None.
+
+        Returns:
+            dict: The place as a Nominatim-style dict with its "distance" in
+                kilometers, or None if there is none.
+        """
+        import shapely
+
+        if not len(self):
+            return None
+        if self._tree is None:
+            self._tree = shapely.STRtree(shapely.points(self.lon, self.lat))
+
+        # The nearest place in degrees bounds the distance to the nearest place
+        # on the sphere, which is then found among the places in that range.
+        nearest = self._tree.query_nearest(shapely.Point(lon, lat))[0]
+        radius = float(haversine(lon, lat, self.lon[nearest], self.lat[nearest]))
+        dlat = math.degrees(radius / EARTH_RADIUS)
+        cos = math.cos(math.radians(min(abs(lat) + dlat, 89.9)))
+        dlon = min(dlat / cos, 180)
+        # The range is split at the antimeridian, where it wraps around.
+        boxes = split_bounds(((lat - dlat, lon - dlon), (lat + dlat, lon + dlon)))
+        _, candidates = self._tree.query(shapely.box(*np.array(boxes).T))
+        candidates = np.unique(candidates)
+        distances = haversine(lon, lat, self.lon[candidates], self.lat[candidates])
+        best = int(np.argmin(distances))
+        if max_distance is not None and distances[best] > max_distance:
+            return None
+        return self.place(candidates[best], distances[best])
+
+    def clear_cache(self):
+        """Removes all cached search results."""
+        self._search.cache_clear()
+
+
+def _json_response(data, callback=None):
+    """Returns a JSON or JSONP response."""
+    body = json.dumps(data, ensure_ascii=False)
+    if callback:
+        if not re.fullmatch(r"[\w.$]+", callback):
+            return 400, "text/plain", b"Invalid callback"
+        return 200, "application/javascript", f"{callback}({body});".encode("utf-8")
+    return 200, "application/json", body.encode("utf-8")
+
+
+class GeocodeServer:
+    """Serves gazetteers over HTTP with a Nominatim-compatible subset of its API.
+
+    Each gazetteer gets the endpoints /geocode/<id>/search?q=<query>&limit=<n>
+    and /geocode/<id>/reverse?lat=<lat>&lon=<lon>. JSONP is supported through
+    the `json_callback` parameter, as used by ipyleaflet's SearchControl.
+
+    Args:
+        server (LocalServer, optional): The HTTP server. Defaults to None, which
+            uses get_server().
+    """
+
+    def __init__(self, server=None):
+        from .server import get_server
+
+        self.server = server or get_server()
+        self.gazetteers = {}
+        self.server.register("geocode", self.handle)
+
+    def add_gazetteer(self, gazetteer):
+        """Registers a gazetteer and returns the base URL of its endpoints."""
+        gazetteer_id = uuid.uuid4().hex[:12]
+        self.gazetteers[gazetteer_id] = gazetteer
+        return f"{self.server.url}/geocode/{gazetteer_id}"
+
+    def handle(self, path, query):
+        """Handles a request for /geocode/<id>/<search|reverse>."""
+        gazetteer_id, _, endpoint = path.partition("/")
+        gazetteer = self.gazetteers.get(gazetteer_id)
+        if gazetteer is None or endpoint not in ("search", "reverse"):
+            return 404, "text/plain", b"Not found"
+        callback = query.get("json_callback")
+
+        if endpoint == "search":
+            limit = int(query.get("limit", 10))
+            return _json_response(gazetteer.search(query.get("q", ""), limit=limit), callback)
+
+        try:
+            lat, lon = float(query["lat"]), float(query["lon"])
+        except (KeyError, ValueError):
+            return 400, "text/plain", b"lat and lon are required"
+        place = gazetteer.reverse(lat, lon)
+        return _json_response(place if place is not None else {"error": "Unable to geocode"}, callback)
+
+
+def get_geocode_server():
+    """Returns the shared GeocodeServer, starting it on first use."""
+    global _geocode_server
+    with _lock:
+        if _geocode_server is None:
+            _geocode_server = GeocodeServer()
+        return _geocode_server
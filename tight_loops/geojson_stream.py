@@ -0,0 +1,215 @@
+"""Streaming GeoJSON reader that materializes one feature at a time."""
+
+import json
+
+_WHITESPACE = " \t\n\r"
+
+
+class _Reader:
+    """A buffered JSON token reader over a text file."""
+
+    def __init__(self, f, chunk_size):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def _fill(self):
+        chunk = self.f.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            return False
+        if self.pos > self.chunk_size:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        self.buf += chunk
+        return True
+
+    def peek(self):
+        """Returns the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, chars):
+        """Consumes the next character, which must be one of `chars`."""
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"Invalid GeoJSON: expected {chars!r} at offset {self.pos}, found {char!r}.")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """Decodes and consumes the next JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # A number at the end of the buffer may continue in the next chunk.
+            if end == len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def geometry_bounds(geometry):
+    """Returns the (minx, miny, maxx, maxy) bounds of a GeoJSON geometry, or None."""
+    if not geometry:
+        return None
+
+    xs, ys = [], []
+
+    def walk(coords):
+        if coords and isinstance(coords[0], (int, float)):
+            xs.append(coords[0])
+            ys.append(coords[1])
+        else:
+            for item in coords:
+                walk(item)
+
+    if geometry.get("type") == "GeometryCollection":
+        for part in geometry.get("geometries", []):
+            bounds = geometry_bounds(part)
+            if bounds:
+                xs.extend(bounds[0::2])
+                ys.extend(bounds[1::2])
+    else:
+        walk(geometry.get("coordinates", []))
+
+    if not xs:
+        return None
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def _matches(feature, bbox, where):
+    if where is not None:
+        properties = feature.get("properties") or {}
+        if callable(where):
+            if not where(properties):
+                return False
+        else:
+            for key, value in where.items():
+                if isinstance(value, (list, tuple, set)):
+                    if properties.get(key) not in value:
+                        return False
+                elif properties.get(key) != value:
+                    return False
+
+    if bbox is not None:
+        bounds = feature.get("bbox") or geometry_bounds(feature.get("geometry"))
+        if bounds is None:
+            return False
+        minx, miny, maxx, maxy = bounds[0], bounds[1], bounds[-2], bounds[-1]
+        if minx > bbox[2] or maxx < bbox[0] or miny > bbox[3] or maxy < bbox[1]:
+            return False
+
+    return True
+
+
+def iter_features(path, bbox=None, where=None, max_features=None, chunk_size=1 << 20):
+    """Iterates over the features of a GeoJSON file without loading the whole file.
+
+    The file is read in chunks and the "features" array is decoded one feature at
+    a time, so only the features that pass the filters are kept in memory.
+
+    Args:
+        path (str): The path to the GeoJSON file.
+        bbox (tuple, optional): A (minx, miny, maxx, maxy) box. Only features whose
+            bounds intersect it are returned. Defaults to None.
+        where (dict | callable, optional): A property filter. A dict maps property
+            names to a value or a list of accepted values; a callable receives
+            the properties and returns a bool. Defaults to None.
+        max_features (int, optional): The maximum number of features to return.
+            Defaults to None.
+        chunk_size (int): The number of characters read at a time.
+
+    Yields:
+        dict: The matching GeoJSON features.
+    """
+    if max_features is not None and max_features <= 0:
+        return
+
+    count = 0
+    with open(path, "r", encoding="utf-8") as f:
+        reader = _Reader(f, chunk_size)
+        reader.expect("{")
+        header = {}
+
+        if reader.peek() == "}":
+            return
+
+        while True:
+            key = reader.value()
+            reader.expect(":")
+
+            if key == "features":
+                reader.expect("[")
+                if reader.peek() == "]":
+                    reader.pos += 1
+                else:
+                    while True:
+                        feature = reader.value()
+                        if _matches(feature, bbox, where):
+                            yield feature
+                            count += 1
+                            if max_features is not None and count >= max_features:
+                                return
+                        if reader.expect(",]") == "]":
+                            break
+            else:
+                header[key] = reader.value()
+
+            if reader.expect(",}") == "}":
+                break
+
+    if header.get("type") == "Feature" and _matches(header, bbox, where):
+        yield header
+
+
+def read_geojson(path, bbox=None, where=None, max_features=None):
+    """Reads the matching features of a GeoJSON file into a FeatureCollection.
+
+    Args:
+        path (str): The path to the GeoJSON file.
+        bbox (tuple, optional): A (minx, miny, maxx, maxy) box. Defaults to None.
+        where (dict | callable, optional): A property filter. Defaults to None.
+        max_features (int, optional): The maximum number of features. Defaults to None.
+
+    Returns:
+        dict: A GeoJSON FeatureCollection.
+    """
+    features = list(iter_features(path, bbox=bbox, where=where, max_features=max_features))
+    return {"type": "FeatureCollection", "features": features}
+
+
+def filter_features(data, bbox=None, where=None, max_features=None):
+    """Filters the features of an in-memory GeoJSON object like `read_geojson`.
+
+    Args:
+        data (dict): A GeoJSON FeatureCollection or Feature.
+        bbox (tuple, optional): A (minx, miny, maxx, maxy) box. Defaults to None.
+        where (dict | callable, optional): A property filter. Defaults to None.
+        max_features (int, optional): The maximum number of features. Defaults to None.
+
+    Returns:
+        dict: A GeoJSON FeatureCollection.
+    """
+    features = data.get("features", []) if data.get("type") == "FeatureCollection" else [data]
+    matching = []
+    if max_features is None or max_features > 0:
+        for feature in features:
+            if _matches(feature, bbox, where):
+                matching.append(feature)
+                if max_features is not None and len(matching) >= max_features:
+                    break
+    return {"type": "FeatureCollection", "features": matching}
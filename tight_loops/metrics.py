@@ -0,0 +1,140 @@
+"""Counters for the widgets and comm messages created by maps."""
+
+import json
+import threading
+from collections import Counter
+
+_meters = []
+_lock = threading.Lock()
+_originals = {}
+
+
+def _message_size(msg, buffers=None):
+    size = len(json.dumps(msg, default=str))
+    for buffer in buffers or []:
+        size += memoryview(buffer).nbytes
+    return size
+
+
+def _install():
+    from ipywidgets import Widget
+
+    open_widget, send = Widget.open, Widget._send
+    _originals.update(open=open_widget, _send=send)
+
+    def metered_open(self):
+        opened = self.comm is None
+        open_widget(self)
+        if opened and _meters:
+            size = _message_size(self.get_state())
+            for meter in list(_meters):
+                meter._record_open(self, size)
+
+    def metered_send(self, msg, buffers=None):
+        if _meters:
+            size = _message_size(msg, buffers)
+            for meter in list(_meters):
+                meter._record_message(size)
+        return send(self, msg, buffers)
+
+    Widget.open = metered_open
+    Widget._send = metered_send
+
+
+def _uninstall():
+    from ipywidgets import Widget
+
+    for name, method in _originals.items():
+        setattr(Widget, name, method)
+    _originals.clear()
+
+
+class WidgetMeter:
+    """Counts the widgets created and the comm messages sent while it is active.
+
+    Every widget opens a comm to the frontend when it is created, which is
+    counted as one message, and every state update sent afterwards is another
+    message. The size of a message is the length of its JSON payload plus its
+    binary buffers.
+
+        with WidgetMeter() as meter:
+            m = tight_loops.Map()
+        print(meter.stats())
+
+    The meter patches ipywidgets while any meter is active, so it costs nothing
+    when it is not used.
+    """
+
+    def __init__(self):
+        self.widgets = 0
+        self.messages = 0
+        self.bytes = 0
+        self.types = Counter()
+
+    def _record_open(self, widget, size):
+        self.widgets += 1
+        self.types[type(widget).__name__] += 1
+        self._record_message(size)
+
+    def _record_message(self, size):
+        self.messages += 1
+        self.bytes += size
+
+    def start(self):
+        """Starts counting."""
+        with _lock:
+            if not _meters:
+                _install()
+            _meters.append(self)
+        return self
+
+    def stop(self):
+        """Stops counting."""
+        with _lock:
+            if self in _meters:
+                _meters.remove(self)
+            if not _meters and _originals:
+                _uninstall()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def stats(self):
+        """Returns the counts as a dict.
+
+        Returns:
+            dict: The number of widgets created, the number of messages and bytes
+                sent, and the number of widgets created per widget class.
+        """
+        return {
+            "widgets": self.widgets,
+            "messages": self.messages,
+            "bytes": self.bytes,
+            "types": dict(self.types),
+        }
+
+
+def count_widgets(root):
+    """Returns the number of widgets reachable from a widget, including itself.
+
+    The widget tree is followed through every synced trait holding a widget or a
+    list of widgets, such as the layers and controls of a map, the widget of a
+    WidgetControl, the children of a box and the layout and style of a widget.
+    """
+    from ipywidgets import Widget
+
+    seen = set()
+    stack = [root]
+    while stack:
+        widget = stack.pop()
+        if id(widget) in seen:
+            continue
+        seen.add(id(widget))
+        for key in widget.keys:
+            value = getattr(widget, key, None)
+            values = value if isinstance(value, (list, tuple)) else [value]
+            stack.extend(item for item in values if isinstance(item, Widget))
+    return len(seen)
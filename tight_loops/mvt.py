@@ -0,0 +1,403 @@
+"""Mapbox Vector Tile encoding and an on-the-fly vector tile source."""
+
+import struct
+
+import numpy as np
+
+from .raster import tile_bounds
+
+MAX_LATITUDE = 85.0511287798066
+
+# Geometry types and commands of the vector tile specification 2.1.
+POINT, LINESTRING, POLYGON = 1, 2, 3
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+
+_SHIFTS = np.arange(10, dtype="uint64") * np.uint64(7)
+
+
+def varint(value):
+    """Encodes a non-negative integer as a protobuf varint."""
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def varint_sizes(values):
+    """Returns the number of bytes of the varint of each value."""
+    values = np.asarray(values, dtype="uint64")
+    sizes = np.ones(values.shape, dtype="int64")
+    for shift in _SHIFTS[1:]:
+        above = values >= (np.uint64(1) << shift)
+        if not above.any():
+            break
+        sizes += above
+    return sizes
+
+
+def encode_varints(values):
+    """Encodes an array of non-negative integers as concatenated varints."""
+    values = np.asarray(values, dtype="uint64").ravel()
+    if len(values) == 0:
+        return b""
+    sizes = varint_sizes(values)
+    # Only as many 7-bit groups as the largest value needs are split out.
+    width = int(sizes.max())
+    groups = ((values[:, np.newaxis] >> _SHIFTS[:width]) & np.uint64(0x7F)).astype("uint8")
+    position = np.arange(width)
+    groups[position < sizes[:, np.newaxis] - 1] |= 0x80
+    return groups[position < sizes[:, np.newaxis]].tobytes()
+
+
+def zigzag(values):
+    """Maps signed integers to unsigned integers, e.g. 0, -1, 1, -2 to 0, 1, 2, 3."""
+    values = np.asarray(values, dtype="int64")
+    return ((values << 1) ^ (values >> 63)).astype("uint64")
+
+
+def _bytes_field(field, data):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return varint((field << 3) | 2) + varint(len(data)) + data
+
+
+def encode_value(value):
+    """Encodes a property value as a vector tile Value message."""
+    if isinstance(value, (bool, np.bool_)):
+        return b"\x38" + varint(int(value))
+    if isinstance(value, (int, np.integer)):
+        value = int(value)
+        if value < 0:
+            return b"\x30" + varint((-value << 1) - 1)
+        return b"\x28" + varint(value)
+    if isinstance(value, (float, np.floating)):
+        return b"\x19" + struct.pack("<d", float(value))
+    return _bytes_field(1, str(value))
+
+
+def _split(data, sizes, counts):
+    """Splits the varints of consecutive runs of values into one bytes per run.
+
+    Args:
+        data (bytes): The encoded values.
+        sizes (ndarray): The number of bytes of each value.
+        counts (ndarray): The number of values in each run.
+    """
+    offsets = np.r_[0, np.cumsum(sizes)][np.r_[0, np.cumsum(counts)]].tolist()
+    return [data[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def _commands(coords, coord_path, path_feature, closed):
+    """Returns the command integers of paths of integer tile coordinates.
+
+    Args:
+        coords (ndarray): The (m, 2) coordinates, grouped by path.
+        coord_path (ndarray): The path of each coordinate, non-decreasing.
+        path_feature (ndarray): The feature of each path, non-decreasing.
+        closed (bool | None): True for polygon rings, False for lines and None
+            for points, which use one MoveTo per feature.
+
+    Returns:
+        tuple: The command integers, grouped by feature, and their number per
+            path.
+    """
+    counts = np.bincount(coord_path, minlength=len(path_feature))
+    starts = np.cumsum(counts) - counts
+    k = np.arange(len(coords)) - starts[coord_path]
+
+    # The cursor carries over between the paths of a feature and starts at 0, 0.
+    feature = path_feature[coord_path]
+    previous = np.vstack([np.zeros((1, 2), dtype="int64"), coords[:-1]])
+    previous[np.r_[True, feature[1:] != feature[:-1]]] = 0
+    deltas = zigzag(coords - previous)
+
+    if closed is None:
+        lengths = np.where(counts > 0, 1 + 2 * counts, 0)
+        offsets = np.cumsum(lengths) - lengths
+        out = np.zeros(lengths.sum(), dtype="uint64")
+        out[offsets[counts > 0]] = (MOVE_TO | (counts[counts > 0] << 3)).astype("uint64")
+        position = offsets[coord_path] + 1 + 2 * k
+    else:
+        lengths = 2 * counts + 2 + int(closed)
+        offsets = np.cumsum(lengths) - lengths
+        out = np.zeros(lengths.sum(), dtype="uint64")
+        out[offsets] = MOVE_TO | (1 << 3)
+        out[offsets + 3] = (LINE_TO | ((counts - 1) << 3)).astype("uint64")
+        if closed:
+            out[offsets + lengths - 1] = CLOSE_PATH | (1 << 3)
+        position = offsets[coord_path] + 1 + 2 * k + (k >= 1)
+    out[position] = deltas[:, 0]
+    out[position + 1] = deltas[:, 1]
+    return out, lengths
+
+
+def _dedupe(coords, coord_path):
+    """Drops the coordinates repeating the previous one of their path."""
+    keep = np.ones(len(coords), dtype=bool)
+    keep[1:] = (coord_path[1:] != coord_path[:-1]) | np.any(coords[1:] != coords[:-1], axis=1)
+    return coords[keep], coord_path[keep]
+
+
+def _select_paths(coords, coord_path, valid):
+    """Keeps the coordinates of the valid paths and renumbers the paths."""
+    keep = valid[coord_path]
+    renumber = np.cumsum(valid) - 1
+    return coords[keep], renumber[coord_path[keep]]
+
+
+def _collection_part(geometry):
+    """Returns the highest dimension parts of a collection as one geometry."""
+    import shapely
+
+    parts = shapely.get_parts(geometry)
+    if len(parts) == 0:
+        return None
+    dimensions = shapely.get_dimensions(parts)
+    parts = parts[dimensions == dimensions.max()]
+    return [shapely.multipoints, shapely.multilinestrings, shapely.multipolygons][int(dimensions.max())](parts)
+
+
+def encode_geometries(geometries):
+    """Encodes geometries in tile coordinates as vector tile geometries.
+
+    Coordinates are rounded to integers, repeated points and collapsed parts
+    are dropped, and exterior rings are wound clockwise and holes
+    counter-clockwise (in the y-down tile space) as the specification requires.
+    The work is vectorized over all the geometries.
+
+    Args:
+        geometries (ndarray): The shapely geometries.
+
+    Returns:
+        tuple: The geometry type of each geometry (0 when nothing is left of it)
+            and a list with the encoded command integers of each geometry.
+    """
+    import shapely
+
+    geometries = np.array(geometries, dtype=object)
+    type_ids = shapely.get_type_id(geometries)
+    for i in np.flatnonzero(type_ids == 7):
+        geometries[i] = _collection_part(geometries[i])
+    type_ids = shapely.get_type_id(geometries)
+    kinds = np.zeros(len(geometries), dtype="int64")
+    encoded = [b""] * len(geometries)
+
+    def store(features, out, lengths, path_feature):
+        per_feature = np.bincount(path_feature, weights=lengths, minlength=len(features)).astype("int64")
+        data = encode_varints(out)
+        sizes = varint_sizes(out)
+        present = per_feature > 0
+        chunks = _split(data, sizes, per_feature[present])
+        for feature, chunk in zip(features[present], chunks):
+            encoded[feature] = chunk
+        return features[present]
+
+    # Points and multipoints: one MoveTo with every point of the feature.
+    features = np.flatnonzero(np.isin(type_ids, (0, 4)))
+    if len(features):
+        coords, index = shapely.get_coordinates(geometries[features], return_index=True)
+        coords = np.rint(coords).astype("int64")
+        path_feature = np.arange(len(features))
+        out, lengths = _commands(coords, index, path_feature, None)
+        kinds[store(features, out, lengths, path_feature)] = POINT
+
+    # Lines: a MoveTo and a LineTo per part.
+    features = np.flatnonzero(np.isin(type_ids, (1, 2, 5)))
+    if len(features):
+        parts, part_feature = shapely.get_parts(geometries[features], return_index=True)
+        coords, coord_path = shapely.get_coordinates(parts, return_index=True)
+        coords, coord_path = _dedupe(np.rint(coords).astype("int64"), coord_path)
+        valid = np.bincount(coord_path, minlength=len(parts)) >= 2
+        coords, coord_path = _select_paths(coords, coord_path, valid)
+        path_feature = part_feature[valid]
+        out, lengths = _commands(coords, coord_path, path_feature, False)
+        kinds[store(features, out, lengths, path_feature)] = LINESTRING
+
+    # Polygons: a MoveTo, a LineTo and a ClosePath per ring.
+    features = np.flatnonzero(np.isin(type_ids, (3, 6)))
+    if len(features):
+        parts, part_feature = shapely.get_parts(geometries[features], return_index=True)
+        rings, ring_part = shapely.get_rings(parts, return_index=True)
+        exterior = np.r_[True, ring_part[1:] != ring_part[:-1]]
+        coords, coord_path = shapely.get_coordinates(rings, return_index=True)
+        closing = np.r_[coord_path[1:] != coord_path[:-1], True]
+        coords, coord_path = _dedupe(np.rint(coords[~closing]).astype("int64"), coord_path[~closing])
+
+        counts = np.bincount(coord_path, minlength=len(rings))
+        starts = np.cumsum(counts) - counts
+        path_start, path_count = starts[coord_path], counts[coord_path]
+        index = np.arange(len(coords))
+        following = np.where(index == path_start + path_count - 1, path_start, index + 1)
+        x, y = coords[:, 0].astype("float64"), coords[:, 1].astype("float64")
+        area = np.bincount(coord_path, weights=x * y[following] - x[following] * y, minlength=len(rings))
+
+        valid = (counts >= 3) & (area != 0)
+        # A polygon whose exterior collapsed is dropped with its holes.
+        valid &= np.repeat(valid[exterior], np.bincount(np.cumsum(exterior) - 1))
+        reverse = (area > 0) != exterior
+        index = np.where(reverse[coord_path], 2 * path_start + path_count - 1 - index, index)
+        coords = coords[index]
+
+        coords, coord_path = _select_paths(coords, coord_path, valid)
+        path_feature = part_feature[ring_part[valid]]
+        out, lengths = _commands(coords, coord_path, path_feature, True)
+        kinds[store(features, out, lengths, path_feature)] = POLYGON
+
+    return kinds, encoded
+
+
+def encode_layer(name, geometries, properties=None, ids=None, extent=4096):
+    """Encodes a vector tile layer.
+
+    Args:
+        name (str): The name of the layer.
+        geometries (ndarray): The shapely geometries in tile coordinates.
+        properties (dict, optional): Arrays of property values by name, aligned
+            with the geometries. Missing values are left out.
+        ids (ndarray, optional): The feature ids. Defaults to None, which uses
+            the positions of the features.
+        extent (int): The size of the tile in tile coordinates.
+
+    Returns:
+        bytes: The Layer message, or b"" if no geometry is left.
+    """
+    import pandas as pd
+
+    kinds, encoded = encode_geometries(geometries)
+    present = np.flatnonzero(kinds > 0)
+    if len(present) == 0:
+        return b""
+    ids = np.arange(len(kinds)) if ids is None else np.asarray(ids)
+
+    # The tags of a feature are pairs of key and value indexes, where the values
+    # are deduplicated per column.
+    keys, values, tags = [], [], []
+    for key, array in (properties or {}).items():
+        codes, uniques = pd.factorize(np.asarray(array, dtype=object)[present])
+        if len(uniques) == 0:
+            continue
+        tags.append(np.where(codes >= 0, len(keys), -1))
+        tags.append(np.where(codes >= 0, codes + len(values), -1))
+        keys.append(key)
+        values += [encode_value(value) for value in uniques]
+
+    if tags:
+        tags = np.stack(tags, axis=1)
+        tag_counts = np.sum(tags >= 0, axis=1)
+        flat = tags[tags >= 0]
+        tag_bytes = _split(encode_varints(flat), varint_sizes(flat), tag_counts)
+    else:
+        tag_counts = np.zeros(len(present), dtype="int64")
+        tag_bytes = [b""] * len(present)
+
+    features = []
+    for feature, count, tag in zip(present.tolist(), tag_counts.tolist(), tag_bytes):
+        geometry = encoded[feature]
+        message = b"\x08" + varint(int(ids[feature]))
+        if count:
+            message += b"\x12" + varint(len(tag)) + tag
+        message += b"\x18" + varint(int(kinds[feature])) + b"\x22" + varint(len(geometry)) + geometry
+        features.append(b"\x12" + varint(len(message)) + message)
+
+    layer = _bytes_field(1, name) + b"".join(features)
+    layer += b"".join(_bytes_field(3, key) for key in keys)
+    layer += b"".join(_bytes_field(4, value) for value in values)
+    return layer + b"\x28" + varint(extent) + b"\x78" + varint(2)
+
+
+def encode_tile(layers):
+    """Encodes a vector tile from encoded layers."""
+    return b"".join(_bytes_field(3, layer) for layer in layers if layer)
+
+
+class VectorTileSource:
+    """Cuts vector tiles from a GeoDataFrame on request.
+
+    The features are projected to Web Mercator and put in an STRtree once. Each
+    tile only queries the features under it, clips them to the tile plus a
+    buffer, moves them to the integer tile grid and simplifies them to about a
+    pixel. Point layers keep at most one point per pixel, and lines and polygons
+    smaller than a tile coordinate are left out. Tiles are cached by the
+    TileServer, so each one is only cut once.
+
+    Args:
+        gdf (GeoDataFrame): The features.
+        layer_name (str): The name of the layer inside the tiles, which is the key
+            of its style in a VectorTileLayer.
+        columns (list, optional): The columns encoded as properties. Defaults to
+            None, which encodes every column.
+        extent (int): The size of a tile in tile coordinates.
+        buffer (int): The number of tile coordinates kept around each tile, so
+            that strokes are not cut at the tile edges.
+        pixels (float): The simplification tolerance in screen pixels.
+    """
+
+    content_type = "application/x-protobuf"
+    extension = "pbf"
+
+    def __init__(self, gdf, layer_name="features", columns=None, extent=4096, buffer=64, pixels=1.0):
+        import shapely
+
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs("EPSG:4326")
+        self.bounds = tuple(gdf.total_bounds)
+        if self.bounds[1] < -MAX_LATITUDE or self.bounds[3] > MAX_LATITUDE:
+            geometry = shapely.clip_by_rect(gdf.geometry.values, -180, -MAX_LATITUDE, 180, MAX_LATITUDE)
+            gdf = gdf.set_geometry(geometry).set_crs("EPSG:4326", allow_override=True)
+        gdf = gdf.to_crs("EPSG:3857")
+
+        if columns is None:
+            columns = [column for column in gdf.columns if column != gdf.geometry.name]
+        self.properties = {column: gdf[column].to_numpy() for column in columns}
+        self.geometries = gdf.geometry.to_numpy()
+        self.tree = shapely.STRtree(self.geometries)
+        self.layer_name = layer_name
+        self.extent = extent
+        self.buffer = buffer
+        self.pixels = pixels
+        present = self.geometries[~shapely.is_missing(self.geometries)]
+        self.is_points = bool(np.all(shapely.get_type_id(present) == 0))
+        bounds = shapely.bounds(self.geometries)
+        self.sizes = np.fmax(bounds[:, 2] - bounds[:, 0], bounds[:, 3] - bounds[:, 1])
+
+    def get_tile(self, z, x, y):
+        """Returns a tile as MVT bytes, or None if it is empty."""
+        import shapely
+
+        left, bottom, right, top = tile_bounds(z, x, y)
+        size = right - left
+        margin = size * self.buffer / self.extent
+        bounds = (left - margin, bottom - margin, right + margin, top + margin)
+        indexes = np.sort(self.tree.query(shapely.box(*bounds)))
+        if len(indexes) == 0:
+            return None
+
+        scale = self.extent / size
+        tolerance = self.pixels * self.extent / 256
+        if self.is_points:
+            # The tree query is exact for points, so they need no clipping, and
+            # only the first point in each pixel is kept.
+            coords = shapely.get_coordinates(self.geometries[indexes])
+            coords = np.column_stack([(coords[:, 0] - left) * scale, (top - coords[:, 1]) * scale])
+            cells = np.floor(coords / tolerance).astype("int64")
+            _, first = np.unique(cells[:, 0] * (1 << 32) + cells[:, 1], return_index=True)
+            first.sort()
+            geometries, indexes = shapely.points(coords[first]), indexes[first]
+        else:
+            # Features smaller than a tile coordinate would collapse when rounded.
+            indexes = indexes[self.sizes[indexes] * scale >= 1]
+            geometries = shapely.clip_by_rect(self.geometries[indexes], *bounds)
+            geometries = shapely.transform(
+                geometries, lambda c: np.column_stack([(c[:, 0] - left) * scale, (top - c[:, 1]) * scale])
+            )
+            present = ~shapely.is_empty(geometries)
+            geometries, indexes = geometries[present], indexes[present]
+            geometries = shapely.simplify(geometries, tolerance, preserve_topology=True)
+
+        properties = {key: array[indexes] for key, array in self.properties.items()}
+        layer = encode_layer(self.layer_name, geometries, properties, ids=indexes, extent=self.extent)
+        if not layer:
+            return None
+        return encode_tile([layer])
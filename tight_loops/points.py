@@ -0,0 +1,479 @@
+"""Point layers sent to the map as packed binary buffers and drawn on a canvas."""
+
+import functools
+
+import numpy as np
+
+from .cluster import lonlat_to_unit, unit_to_lonlat
+
+# The number of values encoded as varints at once, which bounds the memory used
+# by the vectorized encoder.
+VARINT_CHUNK = 1 << 20
+
+_ESM = """
+function decode(model) {
+  const header = model.get("header");
+  const n = header.count;
+  const view = model.get("xy");
+  const bytes = new Uint8Array(view.buffer, view.byteOffset, view.byteLength);
+  const Float = header.bits > 24 ? Float64Array : Float32Array;
+  const x = new Float(n), y = new Float(n);
+  if (header.delta) {
+    let pos = 0, qx = 0, qy = 0;
+    for (let i = 0; i < n; i++) {
+      for (let k = 0; k < 2; k++) {
+        let value = 0, scale = 1, b;
+        do {
+          b = bytes[pos++];
+          value += (b & 0x7f) * scale;
+          scale *= 128;
+        } while (b & 0x80);
+        const d = value % 2 ? -(value + 1) / 2 : value / 2;
+        if (k === 0) { qx += d; x[i] = qx; } else { qy += d; y[i] = qy; }
+      }
+    }
+  } else {
+    const copy = bytes.slice().buffer;
+    const q = header.bits <= 16 ? new Uint16Array(copy) : new Uint32Array(copy);
+    for (let i = 0; i < n; i++) { x[i] = q[2 * i]; y[i] = q[2 * i + 1]; }
+  }
+  return { x, y };
+}
+
+function palette(model) {
+  const lut = model.get("lut");
+  const colors = new Uint32Array(256);
+  if (lut && lut.byteLength === 1024) {
+    const rgba = new Uint8Array(lut.buffer, lut.byteOffset, 1024);
+    for (let i = 0; i < 256; i++) {
+      colors[i] = (rgba[4 * i + 3] << 24 | rgba[4 * i + 2] << 16 | rgba[4 * i + 1] << 8 | rgba[4 * i]) >>> 0;
+    }
+  } else {
+    const probe = document.createElement("canvas").getContext("2d");
+    probe.fillStyle = model.get("color");
+    probe.fillRect(0, 0, 1, 1);
+    const [r, g, b] = probe.getImageData(0, 0, 1, 1).data;
+    colors.fill((255 << 24 | b << 16 | g << 8 | r) >>> 0);
+  }
+  return colors;
+}
+
+function unit(lon, lat) {
+  const sin = Math.sin(Math.max(-85.05112878, Math.min(85.05112878, lat)) * Math.PI / 180);
+  return [(lon + 180) / 360, 0.5 - Math.log((1 + sin) / (1 - sin)) / (4 * Math.PI)];
+}
+
+export default {
+  render({ model, el }) {
+    const canvas = document.createElement("canvas");
+    canvas.style.cssText = "position:absolute;left:0;top:0;z-index:450;pointer-events:none;";
+    let container = null, pane = null, origin = [0, 0], data = null, colors = null, values = null;
+    const observers = [];
+
+    // The control shows the name of the layer with a checkbox toggling it, as
+    // the layer is not listed in the LayersControl.
+    const box = document.createElement("input");
+    box.type = "checkbox";
+    const text = document.createElement("span");
+    const label = document.createElement("label");
+    label.style.cssText = "display:block;padding:2px 6px;background:white;font:12px sans-serif;cursor:pointer;";
+    label.append(box, " ", text);
+    el.appendChild(label);
+    box.addEventListener("change", () => {
+      model.set("visible", box.checked);
+      model.save_changes();
+    });
+
+    function offset() {
+      // The offset of the map pane, which Leaflet adds to layer points in
+      // latLngToContainerPoint. The widget cannot reach the L.Map itself, so the
+      // pane position is read through L.DomUtil, or measured without Leaflet.
+      const L = window.L;
+      const position = L && L.DomUtil ? L.DomUtil.getPosition(pane) : null;
+      if (position) return [position.x, position.y];
+      const inner = pane.getBoundingClientRect(), outer = container.getBoundingClientRect();
+      return [inner.left - outer.left, inner.top - outer.top];
+    }
+
+    function draw() {
+      box.checked = model.get("visible");
+      text.textContent = model.get("name");
+      canvas.style.display = model.get("visible") ? "" : "none";
+      if (!model.get("visible")) return;
+      const north = model.get("north"), south = model.get("south");
+      const east = model.get("east"), west = model.get("west");
+      if (!container || !data || north === south || east === west) return;
+      const header = model.get("header");
+      const ratio = window.devicePixelRatio || 1;
+      const width = container.clientWidth, height = container.clientHeight;
+      canvas.width = Math.round(width * ratio);
+      canvas.height = Math.round(height * ratio);
+      canvas.style.width = width + "px";
+      canvas.style.height = height + "px";
+      canvas.style.opacity = model.get("opacity");
+      canvas.style.transform = "";
+      canvas.style.visibility = "visible";
+      origin = offset();
+
+      const [vx0, vy0] = unit(west, north), [vx1, vy1] = unit(east, south);
+      const [x0, y0, x1, y1] = header.bounds;
+      const steps = 2 ** header.bits - 1;
+      const ax = (x1 - x0) / steps / (vx1 - vx0) * canvas.width, bx = (x0 - vx0) / (vx1 - vx0) * canvas.width;
+      const ay = (y1 - y0) / steps / (vy1 - vy0) * canvas.height, by = (y0 - vy0) / (vy1 - vy0) * canvas.height;
+
+      const context = canvas.getContext("2d");
+      const image = context.createImageData(canvas.width, canvas.height);
+      const pixels = new Uint32Array(image.data.buffer);
+      const w = canvas.width, h = canvas.height;
+      const size = Math.max(1, Math.round(model.get("radius") * 2 * ratio));
+      const half = size >> 1;
+      const { x, y } = data;
+      for (let i = 0; i < x.length; i++) {
+        const px = Math.round(x[i] * ax + bx) - half, py = Math.round(y[i] * ay + by) - half;
+        if (px >= w || py >= h || px + size <= 0 || py + size <= 0) continue;
+        const color = colors[values ? values[i] : 0];
+        for (let dy = Math.max(0, -py); dy < size && py + dy < h; dy++) {
+          const row = (py + dy) * w;
+          for (let dx = Math.max(0, -px); dx < size && px + dx < w; dx++) pixels[row + px + dx] = color;
+        }
+      }
+      context.putImageData(image, 0, 0);
+    }
+
+    function load() {
+      data = decode(model);
+      colors = palette(model);
+      const view = model.get("values");
+      values = view && view.byteLength ? new Uint8Array(view.buffer, view.byteOffset, view.byteLength).slice() : null;
+      draw();
+    }
+
+    function attach() {
+      container = el.closest(".leaflet-container");
+      if (!container) {
+        requestAnimationFrame(attach);
+        return;
+      }
+      pane = container.querySelector(".leaflet-map-pane");
+      container.appendChild(canvas);
+      // Follow the map while it is dragged, and hide the points while it zooms,
+      // until the new bounds arrive.
+      const follow = new MutationObserver(() => {
+        const [dx, dy] = offset();
+        canvas.style.transform = `translate(${dx - origin[0]}px, ${dy - origin[1]}px)`;
+      });
+      follow.observe(pane, { attributes: true, attributeFilter: ["style"] });
+      const zoom = new MutationObserver(() => {
+        if (container.classList.contains("leaflet-zoom-anim")) canvas.style.visibility = "hidden";
+      });
+      zoom.observe(container, { attributes: true, attributeFilter: ["class"] });
+      observers.push(follow, zoom);
+      load();
+    }
+
+    model.on("change:xy", load);
+    model.on("change:values", load);
+    model.on("change:lut", load);
+    model.on("change:color", load);
+    for (const edge of ["north", "south", "east", "west"]) model.on(`change:${edge}`, draw);
+    model.on("change:radius", draw);
+    model.on("change:opacity", draw);
+    model.on("change:visible", draw);
+    model.on("change:name", draw);
+    draw();
+    attach();
+
+    return () => {
+      observers.forEach((observer) => observer.disconnect());
+      canvas.remove();
+    };
+  },
+};
+"""
+
+
+def _spread_bits(values):
+    """Inserts a zero bit after each of the 32 low bits of integers."""
+    values = np.asarray(values, dtype="uint64") & np.uint64(0xFFFFFFFF)
+    for shift, mask in (
+        (16, 0x0000FFFF0000FFFF),
+        (8, 0x00FF00FF00FF00FF),
+        (4, 0x0F0F0F0F0F0F0F0F),
+        (2, 0x3333333333333333),
+        (1, 0x5555555555555555),
+    ):
+        values = (values | (values << np.uint64(shift))) & np.uint64(mask)
+    return values
+
+
+def morton_order(qx, qy):
+    """Returns the order of points along a Z-order curve of their grid cells."""
+    return np.argsort(_spread_bits(qx) | (_spread_bits(qy) << np.uint64(1)))
+
+
+def _varints(values):
+    """Encodes non-negative integers as varints in chunks."""
+    from .mvt import encode_varints
+
+    return b"".join(encode_varints(values[i:i + VARINT_CHUNK]) for i in range(0, len(values), VARINT_CHUNK))
+
+
+def pack_points(lon, lat, bits=16, delta=False):
+    """Packs point coordinates into one binary buffer.
+
+    The points are projected to Web Mercator and quantized to a grid of
+    2**bits steps across their extent, e.g. 16 bits keep about 1/65535 of the
+    extent, which is below a pixel for most views. The x and y of each point are
+    interleaved as uint16 (bits <= 16) or uint32 integers. With `delta`, the
+    points are sorted along a Z-order curve and the differences between
+    consecutive points are written as zigzag varints, which takes less than 4
+    bytes per point once there are about 10,000 points or more in the extent,
+    and 2 to 3 bytes per point for millions of points.
+
+    Args:
+        lon (array): The longitudes.
+        lat (array): The latitudes.
+        bits (int): The number of bits per coordinate, up to 32.
+        delta (bool): Whether to delta-encode the sorted points.
+
+    Returns:
+        tuple: The header dict, the buffer and the order of the points in the
+            buffer (None when unchanged).
+    """
+    if not 1 <= bits <= 32:
+        raise ValueError("bits must be between 1 and 32.")
+    x, y = lonlat_to_unit(lon, lat)
+    if len(x):
+        x0, y0, x1, y1 = float(x.min()), float(y.min()), float(x.max()), float(y.max())
+    else:
+        x0 = y0 = 0.0
+        x1 = y1 = 1.0
+    x1, y1 = max(x1, x0 + 1e-12), max(y1, y0 + 1e-12)
+    steps = 2 ** bits - 1
+    qx = np.rint((x - x0) / (x1 - x0) * steps).astype("int64")
+    qy = np.rint((y - y0) / (y1 - y0) * steps).astype("int64")
+
+    header = {"count": len(qx), "bits": bits, "delta": bool(delta), "bounds": [x0, y0, x1, y1]}
+    order = None
+    if delta:
+        from .mvt import zigzag
+
+        order = morton_order(qx, qy)
+        xy = np.empty(2 * len(qx), dtype="int64")
+        xy[0::2] = np.diff(qx[order], prepend=0)
+        xy[1::2] = np.diff(qy[order], prepend=0)
+        buffer = _varints(zigzag(xy))
+    else:
+        xy = np.empty(2 * len(qx), dtype="uint16" if bits <= 16 else "uint32")
+        xy[0::2] = qx
+        xy[1::2] = qy
+        buffer = xy.tobytes()
+    return header, buffer, order
+
+
+def unpack_points(header, buffer):
+    """Decodes a buffer of pack_points back to longitudes and latitudes."""
+    n = header["count"]
+    if header["delta"]:
+        data = np.frombuffer(buffer, dtype="uint8")
+        ends = np.flatnonzero(data < 0x80)
+        starts = np.concatenate([[0], ends[:-1] + 1])
+        values = np.zeros(len(ends), dtype="uint64")
+        for i in range(10):
+            position = starts + i
+            inside = position <= ends
+            values[inside] |= (data[position[inside]] & np.uint64(0x7F)).astype("uint64") << np.uint64(7 * i)
+        signed = (values >> np.uint64(1)).astype("int64") ^ -(values & np.uint64(1)).astype("int64")
+        qx, qy = np.cumsum(signed[0::2]), np.cumsum(signed[1::2])
+    else:
+        xy = np.frombuffer(buffer, dtype="uint16" if header["bits"] <= 16 else "uint32")
+        qx, qy = xy[0::2].astype("int64"), xy[1::2].astype("int64")
+    x0, y0, x1, y1 = header["bounds"]
+    steps = 2 ** header["bits"] - 1
+    return unit_to_lonlat(x0 + qx[:n] / steps * (x1 - x0), y0 + qy[:n] / steps * (y1 - y0))
+
+
+def color_indexes(values, vmin=None, vmax=None):
+    """Maps values to the 256 entries of a color table.
+
+    Numbers are stretched between `vmin` and `vmax`, which default to the 2nd and
+    98th percentiles. Other values are treated as categories and spread evenly.
+
+    Returns:
+        ndarray: The uint8 index of each value.
+    """
+    import pandas as pd
+
+    values = pd.Series(np.asarray(values))
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        data = values.to_numpy(dtype="float64")
+        finite = data[np.isfinite(data)]
+        if vmin is None:
+            vmin = float(np.percentile(finite, 2)) if len(finite) else 0.0
+        if vmax is None:
+            vmax = float(np.percentile(finite, 98)) if len(finite) else 1.0
+        scale = vmax - vmin if vmax > vmin else 1.0
+        with np.errstate(invalid="ignore"):
+            return np.nan_to_num(np.clip((data - vmin) / scale * 255, 0, 255)).astype("uint8")
+    codes, categories = pd.factorize(values)
+    if len(categories) > 1:
+        return (np.maximum(codes, 0) * 255 // (len(categories) - 1)).astype("uint8")
+    return np.zeros(len(codes), dtype="uint8")
+
+
+@functools.lru_cache(maxsize=None)
+def _widget_class():
+    """Returns the anywidget class drawing the points, defined on first use."""
+    try:
+        import anywidget
+    except ImportError:
+        raise ImportError("Please install anywidget: pip install anywidget")
+    import traitlets
+
+    class PointCanvas(anywidget.AnyWidget):
+        _esm = _ESM
+        header = traitlets.Dict().tag(sync=True)
+        xy = traitlets.Bytes().tag(sync=True)
+        values = traitlets.Bytes().tag(sync=True)
+        lut = traitlets.Bytes().tag(sync=True)
+        color = traitlets.Unicode("#3388ff").tag(sync=True)
+        radius = traitlets.Float(1.5).tag(sync=True)
+        opacity = traitlets.Float(0.8).tag(sync=True)
+        name = traitlets.Unicode("Points").tag(sync=True)
+        visible = traitlets.Bool(True).tag(sync=True)
+        north = traitlets.Float(0).tag(sync=True)
+        south = traitlets.Float(0).tag(sync=True)
+        east = traitlets.Float(0).tag(sync=True)
+        west = traitlets.Float(0).tag(sync=True)
+
+    return PointCanvas
+
+
+class PointLayer:
+    """A point layer sent as packed binary buffers and drawn on a canvas.
+
+    The coordinates are quantized and packed with pack_points, and the values
+    used for coloring are sent as one byte per point with a 256 color table, so a
+    point costs 5 bytes (3 to 4 with `delta`) instead of a GeoJSON feature.
+    The buffers go through the binary channel of the widget, and the frontend
+    draws the points in view straight into the pixels of a canvas laid over the
+    map. The edges of the map view are linked in the frontend, so panning and zooming do not
+    involve the kernel.
+
+    The canvas is held by a WidgetControl rather than being a Leaflet layer, so
+    it is not listed in the LayersControl. The control shows the name of the
+    layer with a checkbox that toggles it, and `visible` toggles it from Python.
+
+    Requires anywidget.
+
+    Args:
+        lon (array): The longitudes.
+        lat (array): The latitudes.
+        values (array, optional): The values used to color the points. Defaults
+            to None, which draws every point in `color`.
+        color (str): The CSS color of the points without values.
+        colormap (str): The colormap of the values, one of raster.COLORMAPS.
+        vmin (float, optional): The value at the bottom of the colormap.
+        vmax (float, optional): The value at the top of the colormap.
+        radius (float): The radius of the points in pixels.
+        opacity (float): The opacity of the layer.
+        bits (int): The number of bits per coordinate.
+        delta (bool): Whether to delta-encode the coordinates.
+        name (str): The name of the layer.
+    """
+
+    def __init__(
+        self,
+        lon,
+        lat,
+        values=None,
+        color="#3388ff",
+        colormap="viridis",
+        vmin=None,
+        vmax=None,
+        radius=1.5,
+        opacity=0.8,
+        bits=16,
+        delta=False,
+        name="Points",
+    ):
+        self.bits = bits
+        self.delta = delta
+        self.colormap = colormap
+        self.widget = _widget_class()(color=color, radius=radius, opacity=opacity, name=name)
+        self.map = None
+        self.control = None
+        self._links = []
+        self.set_data(lon, lat, values, vmin=vmin, vmax=vmax)
+
+    def set_data(self, lon, lat, values=None, vmin=None, vmax=None):
+        """Replaces the points of the layer."""
+        from .raster import colormap_lut
+
+        lon, lat = np.asarray(lon, dtype="float64"), np.asarray(lat, dtype="float64")
+        valid = np.isfinite(lon) & np.isfinite(lat)
+        header, xy, order = pack_points(lon[valid], lat[valid], bits=self.bits, delta=self.delta)
+
+        if values is None:
+            indexes, lut = b"", b""
+        else:
+            indexes = color_indexes(np.asarray(values)[valid], vmin=vmin, vmax=vmax)
+            if order is not None:
+                indexes = indexes[order]
+            indexes = indexes.tobytes()
+            rgb = colormap_lut(self.colormap)
+            lut = np.concatenate([rgb, np.full((256, 1), 255, dtype="uint8")], axis=1).tobytes()
+
+        with self.widget.hold_sync():
+            self.widget.header = header
+            self.widget.xy = xy
+            self.widget.values = indexes
+            self.widget.lut = lut
+
+    @property
+    def name(self):
+        """The name of the layer, shown in its control."""
+        return self.widget.name
+
+    @name.setter
+    def name(self, value):
+        self.widget.name = value
+
+    @property
+    def visible(self):
+        """Whether the points are drawn."""
+        return self.widget.visible
+
+    @visible.setter
+    def visible(self, value):
+        self.widget.visible = value
+
+    @property
+    def nbytes(self):
+        """The number of bytes of the point buffers sent to the frontend."""
+        return len(self.widget.xy) + len(self.widget.values) + len(self.widget.lut)
+
+    def add_to(self, m, position="bottomleft"):
+        """Adds the layer to a map."""
+        import ipyleaflet
+        import ipywidgets
+
+        self.map = m
+        self._links = []
+        for edge in ("north", "south", "east", "west"):
+            setattr(self.widget, edge, getattr(m, edge))
+            self._links.append(ipywidgets.jsdlink((m, edge), (self.widget, edge)))
+        self.control = ipyleaflet.WidgetControl(widget=self.widget, position=position)
+        m.add_control(self.control)
+        return self
+
+    def remove(self):
+        """Removes the layer from its map."""
+        if self.map is None:
+            return
+        if self.control in self.map.controls:
+            self.map.remove_control(self.control)
+        for link in self._links:
+            link.close()
+        self.control.close()
+        self.map = None
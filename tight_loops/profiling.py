@@ -0,0 +1,394 @@
+"""Opt-in profiling of the time, memory and payload of map operations.
+
+The map methods and the slow steps inside them, such as reading, reprojecting
+and serializing vector data or calling TiTiler, are marked as stages. While a
+profile is active every stage records its wall time, its peak memory, the widget
+messages and bytes sent to the frontend, and counts such as features and
+vertices:
+
+    with profile() as prof:
+        m = tight_loops.Map()
+        m.add_shp("counties.shp")
+    print(prof.report())
+
+When no profile is active a stage is a shared no-op object and a profiled method
+calls straight through, so the instrumentation costs one list check.
+"""
+
+import functools
+import json
+import re
+import threading
+import time
+import tracemalloc
+
+_profilers = []
+_lock = threading.Lock()
+_local = threading.local()
+# The thread whose stages track memory, and the meter shared by the profilers.
+_state = {"thread": None, "meter": None}
+
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None:
+        stack = _local.stack = []
+    return stack
+
+
+class _NullStage:
+    """The stage returned while no profile is active. It is falsy and does nothing."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def __bool__(self):
+        return False
+
+    def add(self, **counts):
+        pass
+
+
+_NULL_STAGE = _NullStage()
+
+
+class Stage:
+    """A stage being recorded by the active profiles.
+
+    Counts are added with `add`, e.g. `stage.add(features=len(gdf))`. A stage is
+    truthy, so counts that are costly to compute can be guarded with `if stage:`.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.counts = {}
+        self.memory = None
+
+    def add(self, **counts):
+        """Adds counts, such as features or vertices, to the stage."""
+        for key, value in counts.items():
+            self.counts[key] = self.counts.get(key, 0) + value
+
+    def __enter__(self):
+        stack = _stack()
+        self.parent = stack[-1] if stack else None
+        self.path = f"{self.parent.path}/{self.name}" if self.parent else self.name
+        self.depth = len(stack)
+        self.tracked = tracemalloc.is_tracing() and threading.get_ident() == _state["thread"]
+        if self.tracked:
+            # The peak is reset for every stage, so the enclosing stage keeps the
+            # highest peak seen so far in its own bookkeeping.
+            current, peak = tracemalloc.get_traced_memory()
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, peak)
+            tracemalloc.reset_peak()
+            self._start_memory = self._peak = current
+        meter = _state["meter"]
+        self._start_payload = (meter.messages, meter.bytes) if meter is not None else (0, 0)
+        stack.append(self)
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        elapsed = time.perf_counter() - self._start
+        _stack().pop()
+        if self.tracked and tracemalloc.is_tracing():
+            _, peak = tracemalloc.get_traced_memory()
+            self._peak = max(self._peak, peak)
+            self.memory = self._peak - self._start_memory
+            if self.parent is not None:
+                self.parent._peak = max(self.parent._peak, self._peak)
+            tracemalloc.reset_peak()
+        meter = _state["meter"]
+        messages, size = (meter.messages, meter.bytes) if meter is not None else (0, 0)
+
+        record = {
+            "name": self.name,
+            "path": self.path,
+            "depth": self.depth,
+            "time": elapsed,
+            "memory": self.memory,
+            "messages": messages - self._start_payload[0],
+            "bytes": size - self._start_payload[1],
+            "counts": dict(self.counts),
+            "error": exc_type.__name__ if exc_type is not None else None,
+        }
+        for profiler in list(_profilers):
+            profiler._record(record)
+        return False
+
+
+def stage(name):
+    """Returns a context manager recording a stage while a profile is active.
+
+    Args:
+        name (str): The name of the stage. Nested stages are reported under the
+            path of their enclosing stages, e.g. "Map.add_shp/read".
+
+    Returns:
+        Stage: The stage, or a falsy no-op stage when no profile is active.
+    """
+    if not _profilers:
+        return _NULL_STAGE
+    return Stage(name)
+
+
+def bind(func):
+    """Returns `func` running under the current stage, in whichever thread calls it.
+
+    Stages opened in worker threads are otherwise recorded at the top level, as
+    each thread has its own stack of stages.
+
+    Args:
+        func (callable): The function submitted to a worker thread.
+
+    Returns:
+        callable: The bound function, or `func` itself when no stage is open.
+    """
+    stack = _stack() if _profilers else None
+    if not stack:
+        return func
+    parent = stack[-1]
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        stack = _stack()
+        stack.append(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            stack.pop()
+
+    return wrapper
+
+
+def profiled(func=None, name=None):
+    """Decorates a function or method so each call is a stage.
+
+    Args:
+        func (callable): The function to decorate.
+        name (str, optional): The name of the stage. Defaults to the module and
+            qualified name of the function, e.g. "tight_loops.Map.add_shp".
+    """
+    if func is None:
+        return functools.partial(profiled, name=name)
+
+    label = name or f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not _profilers:
+            return func(*args, **kwargs)
+        with Stage(label):
+            return func(*args, **kwargs)
+
+    return wrapper
+
+
+class Profiler:
+    """Collects the stages recorded while it is active.
+
+    Args:
+        memory (bool): Whether to trace the peak memory of the stages with
+            tracemalloc, which slows down allocation-heavy code.
+        sinks (list, optional): Callables called with every finished stage
+            record, such as a JsonLinesSink or a StatsdSink.
+    """
+
+    def __init__(self, memory=True, sinks=None):
+        self.memory = memory
+        self.sinks = list(sinks or [])
+        self.records = []
+        self._tracing = False
+
+    def start(self):
+        """Starts recording."""
+        from .metrics import WidgetMeter
+
+        with _lock:
+            if not _profilers:
+                _state["thread"] = threading.get_ident()
+                _state["meter"] = WidgetMeter().start()
+            if self.memory and not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            _profilers.append(self)
+        return self
+
+    def stop(self):
+        """Stops recording."""
+        with _lock:
+            if self not in _profilers:
+                return
+            _profilers.remove(self)
+            if self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+            if not _profilers:
+                _state["meter"].stop()
+                _state.update(thread=None, meter=None)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def _record(self, record):
+        self.records.append(record)
+        for sink in self.sinks:
+            sink(record)
+
+    def clear(self):
+        """Discards the recorded stages."""
+        self.records = []
+
+    def summary(self):
+        """Aggregates the recorded stages by path.
+
+        Returns:
+            dict: Per path, with every path following the stage it is nested in,
+                the number of "calls", the total "time" in seconds, the highest "memory"
+                peak in bytes, the widget "messages" and "bytes" sent, and the
+                summed counts.
+        """
+        summary = {}
+        for record in self.records:
+            entry = summary.setdefault(
+                record["path"], {"calls": 0, "time": 0.0, "memory": None, "messages": 0, "bytes": 0, "counts": {}}
+            )
+            entry["calls"] += 1
+            entry["time"] += record["time"]
+            if record["memory"] is not None:
+                entry["memory"] = max(entry["memory"] or 0, record["memory"])
+            entry["messages"] += record["messages"]
+            entry["bytes"] += record["bytes"]
+            for key, value in record["counts"].items():
+                entry["counts"][key] = entry["counts"].get(key, 0) + value
+        # Records are added when a stage exits, after the stages nested in it.
+        return {path: summary[path] for path in _tree_order(summary)}
+
+    def report(self):
+        """Returns the summary as a text table, with nested stages indented."""
+        lines = [f"{'stage':<40} {'calls':>5} {'time':>10} {'peak memory':>12} {'sent':>10}  counts"]
+        for path, entry in self.summary().items():
+            label = "  " * path.count("/") + path.rsplit("/", 1)[-1]
+            memory = _format_bytes(entry["memory"]) if entry["memory"] is not None else "-"
+            counts = ", ".join(f"{key}={value:,}" for key, value in sorted(entry["counts"].items()))
+            lines.append(
+                f"{label:<40} {entry['calls']:>5} {entry['time'] * 1000:>8.1f}ms {memory:>12} "
+                f"{_format_bytes(entry['bytes']):>10}  {counts}"
+            )
+        return "\n".join(lines)
+
+    def to_dataframe(self):
+        """Returns the recorded stages as a DataFrame, with a column per count."""
+        import pandas as pd
+
+        rows = [{**{k: v for k, v in record.items() if k != "counts"}, **record["counts"]} for record in self.records]
+        return pd.DataFrame(rows)
+
+
+def profile(memory=True, sinks=None):
+    """Returns a profiler to use as a context manager.
+
+    Args:
+        memory (bool): Whether to trace the peak memory of the stages.
+        sinks (list, optional): Callables called with every finished stage record.
+
+    Returns:
+        Profiler: The profiler.
+    """
+    return Profiler(memory=memory, sinks=sinks)
+
+
+def _tree_order(paths):
+    """Orders paths so every path directly follows its parent, keeping the given order."""
+    children = {}
+    for path in paths:
+        parent = path.rsplit("/", 1)[0] if "/" in path else None
+        children.setdefault(parent if parent in paths else None, []).append(path)
+
+    ordered = []
+    stack = list(reversed(children.get(None, [])))
+    while stack:
+        path = stack.pop()
+        ordered.append(path)
+        stack.extend(reversed(children.get(path, [])))
+    return ordered
+
+
+def _format_bytes(size):
+    for unit in ("B", "KiB", "MiB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GiB"
+
+
+class JsonLinesSink:
+    """Appends every stage record to a file as a line of JSON.
+
+    Args:
+        path (str): The path of the file.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def __call__(self, record):
+        line = json.dumps({"timestamp": time.time(), **record})
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+_METRIC = re.compile(r"[^\w.-]")
+
+
+class StatsdSink:
+    """Sends every stage record to a StatsD server over UDP.
+
+    The time is sent as a timer in milliseconds, the peak memory as a gauge and
+    the bytes, messages and counts as counters, named after the stage path, e.g.
+    "tight_loops.tight_loops.Map.add_shp.read.time". Sending errors are ignored,
+    so an unreachable server never breaks the profiled code.
+
+    Args:
+        host (str): The host of the StatsD server.
+        port (int): The port of the StatsD server.
+        prefix (str): The prefix of the metric names.
+    """
+
+    def __init__(self, host="localhost", port=8125, prefix="tight_loops"):
+        import socket
+
+        self.address = (host, port)
+        self.prefix = prefix
+        self.socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def metrics(self, record):
+        """Returns the StatsD lines of a stage record."""
+        name = _METRIC.sub("_", record["path"].replace("/", "."))
+        base = f"{self.prefix}.{name}" if self.prefix else name
+        lines = [f"{base}.time:{record['time'] * 1000:.3f}|ms"]
+        if record["memory"] is not None:
+            lines.append(f"{base}.memory:{record['memory']}|g")
+        for key in ("messages", "bytes"):
+            lines.append(f"{base}.{key}:{record[key]}|c")
+        for key, value in record["counts"].items():
+            lines.append(f"{base}.{_METRIC.sub('_', key)}:{value}|c")
+        return lines
+
+    def __call__(self, record):
+        try:
+            self.socket.sendto("\n".join(self.metrics(record)).encode("utf-8"), self.address)
+        except OSError:
+            pass
+
+    def close(self):
+        """Closes the socket."""
+        self.socket.close()
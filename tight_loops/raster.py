@@ -0,0 +1,382 @@
+"""Local raster reading and rendering."""
+
+import json
+import math
+import os
+import threading
+
+import numpy as np
+
+WEB_MERCATOR_HALF = 20037508.342789244
+# The number of rendered previews kept in memory.
+PREVIEW_CACHE_SIZE = 32
+
+COLORMAPS = {
+    "gray": [(0, 0, 0), (255, 255, 255)],
+    "viridis": [(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)],
+    "magma": [(0, 0, 4), (81, 18, 124), (183, 55, 121), (252, 137, 97), (252, 253, 191)],
+    "terrain": [(51, 51, 153), (0, 153, 255), (0, 204, 102), (255, 255, 153), (128, 92, 84), (255, 255, 255)],
+    "blues": [(247, 251, 255), (107, 174, 214), (8, 48, 107)],
+}
+
+
+def _import_rasterio():
+    try:
+        import rasterio
+    except ImportError:
+        raise ImportError("Please install rasterio: pip install rasterio")
+    return rasterio
+
+
+def colormap_lut(colormap="gray"):
+    """Returns a (256, 3) uint8 lookup table for a colormap name."""
+    if colormap not in COLORMAPS:
+        raise ValueError(f"Invalid colormap name. Choose from {sorted(COLORMAPS)}.")
+    anchors = np.array(COLORMAPS[colormap], dtype="float64")
+    positions = np.linspace(0, 255, len(anchors))
+    steps = np.arange(256)
+    return np.stack([np.interp(steps, positions, anchors[:, i]) for i in range(3)], axis=1).astype("uint8")
+
+
+def render_rgba(data, vmin, vmax, colormap="gray"):
+    """Stretches and colors a (bands, rows, cols) float array with NaN for nodata.
+
+    Single band data is colored with `colormap`; three or more bands are
+    stretched independently and shown as RGB.
+
+    Args:
+        data (ndarray): The array with NaN where there is no data.
+        vmin (float | list): The value(s) mapped to the bottom of the stretch.
+        vmax (float | list): The value(s) mapped to the top of the stretch.
+        colormap (str): The colormap of single band data.
+
+    Returns:
+        ndarray: A (4, rows, cols) uint8 RGBA array.
+    """
+    vmin = np.asarray(vmin, dtype="float64").reshape(-1, 1, 1)
+    vmax = np.asarray(vmax, dtype="float64").reshape(-1, 1, 1)
+    scale = np.where(vmax > vmin, vmax - vmin, 1.0)
+
+    with np.errstate(invalid="ignore"):
+        scaled = np.clip((data - vmin) / scale * 255, 0, 255)
+    valid = np.all(np.isfinite(data), axis=0)
+    scaled = np.nan_to_num(scaled).astype("uint8")
+
+    if len(data) >= 3:
+        rgb = scaled[:3]
+    else:
+        rgb = colormap_lut(colormap)[scaled[0]].transpose(2, 0, 1)
+
+    alpha = np.where(valid, 255, 0).astype("uint8")[np.newaxis]
+    return np.concatenate([rgb, alpha])
+
+
+def encode_png(rgba):
+    """Encodes a (4, rows, cols) uint8 array as PNG bytes."""
+    rasterio = _import_rasterio()
+    from rasterio.io import MemoryFile
+
+    _, height, width = rgba.shape
+    with rasterio.Env(GDAL_PAM_ENABLED="NO"):
+        with MemoryFile() as memfile:
+            with memfile.open(driver="PNG", width=width, height=height, count=4, dtype="uint8") as dst:
+                dst.write(rgba)
+            return memfile.read()
+
+
+def read_decimated(src, bands, max_size=1024):
+    """Reads a whole raster at no more than `max_size` pixels on its longest side.
+
+    The read uses the internal overviews of the file when it has them.
+
+    Returns:
+        ndarray: A (bands, rows, cols) float64 array with NaN for nodata.
+    """
+    factor = max(1.0, max(src.width, src.height) / float(max_size))
+    shape = (len(bands), max(1, int(src.height / factor)), max(1, int(src.width / factor)))
+    data = src.read(bands, out_shape=shape, masked=True)
+    return np.ma.filled(data.astype("float64"), np.nan)
+
+
+def percentile_range(data, low=2, high=98):
+    """Returns the per-band (vmin, vmax) percentiles of an array with NaN for nodata."""
+    flat = data.reshape(len(data), -1)
+    if not np.isfinite(flat).any():
+        return [0.0] * len(data), [1.0] * len(data)
+    vmin = np.nanpercentile(flat, low, axis=1)
+    vmax = np.nanpercentile(flat, high, axis=1)
+    return vmin.tolist(), vmax.tolist()
+
+
+def tile_bounds(z, x, y):
+    """Returns the Web Mercator (left, bottom, right, top) bounds of an XYZ tile."""
+    size = 2 * WEB_MERCATOR_HALF / 2 ** z
+    left = -WEB_MERCATOR_HALF + x * size
+    top = WEB_MERCATOR_HALF - y * size
+    return left, top - size, left + size, top
+
+
+class RasterTileSource:
+    """Renders XYZ PNG tiles from a local GeoTIFF or COG.
+
+    Each tile reads only the window of the raster under the tile, decimated to
+    about the tile resolution so that overviews are used when zoomed out, and
+    warps that small array to Web Mercator. Every rendering thread keeps its own
+    open dataset.
+
+    Args:
+        path (str): The path to the raster.
+        bands (list, optional): The 1-based band indexes, either one band or three
+            bands for RGB. Defaults to None, which uses the first band, or the
+            first three bands of an RGB raster.
+        colormap (str): The colormap of single band rasters.
+        vmin (float | list, optional): The bottom of the stretch. Defaults to None,
+            which uses the 2nd percentile.
+        vmax (float | list, optional): The top of the stretch. Defaults to None,
+            which uses the 98th percentile.
+        tile_size (int): The tile size in pixels.
+    """
+
+    content_type = "image/png"
+    extension = "png"
+
+    def __init__(self, path, bands=None, colormap="gray", vmin=None, vmax=None, tile_size=256):
+        rasterio = _import_rasterio()
+        from rasterio.warp import transform_bounds
+
+        self.path = path
+        self.colormap = colormap
+        self.tile_size = tile_size
+        self._local = threading.local()
+
+        with rasterio.open(path) as src:
+            if bands is None:
+                bands = [1, 2, 3] if src.count >= 3 and src.colorinterp[0].name == "red" else [1]
+            self.bands = list(bands)
+            self.crs = src.crs
+            self.bounds = transform_bounds(src.crs, "EPSG:4326", *src.bounds, densify_pts=21)
+
+            if vmin is None or vmax is None:
+                low, high = percentile_range(read_decimated(src, self.bands))
+                vmin = low if vmin is None else vmin
+                vmax = high if vmax is None else vmax
+
+        self.vmin = vmin
+        self.vmax = vmax
+
+    def _dataset(self):
+        src = getattr(self._local, "src", None)
+        if src is None:
+            src = self._local.src = _import_rasterio().open(self.path)
+        return src
+
+    def read_tile(self, z, x, y):
+        """Returns the (bands, size, size) float array of a tile, or None if it is empty."""
+        from rasterio import windows
+        from rasterio.enums import Resampling
+        from rasterio.transform import from_bounds
+        from rasterio.warp import reproject, transform_bounds
+
+        src = self._dataset()
+        bounds = tile_bounds(z, x, y)
+        src_bounds = transform_bounds("EPSG:3857", src.crs, *bounds, densify_pts=21)
+
+        tile_window = windows.from_bounds(*src_bounds, transform=src.transform)
+        full = windows.Window(0, 0, src.width, src.height)
+        try:
+            window = tile_window.intersection(full)
+        except windows.WindowError:
+            return None
+        window = window.round_offsets().round_lengths()
+        if window.width < 1 or window.height < 1:
+            return None
+
+        factor = max(1.0, tile_window.width / self.tile_size, tile_window.height / self.tile_size)
+        shape = (len(self.bands), max(1, math.ceil(window.height / factor)), max(1, math.ceil(window.width / factor)))
+        data = src.read(self.bands, window=window, out_shape=shape, masked=True)
+        data = np.ma.filled(data.astype("float64"), np.nan)
+
+        window_transform = src.window_transform(window)
+        read_transform = window_transform * window_transform.scale(window.width / shape[2], window.height / shape[1])
+
+        out = np.full((len(self.bands), self.tile_size, self.tile_size), np.nan)
+        reproject(
+            data,
+            out,
+            src_transform=read_transform,
+            src_crs=src.crs,
+            src_nodata=np.nan,
+            dst_transform=from_bounds(*bounds, self.tile_size, self.tile_size),
+            dst_crs="EPSG:3857",
+            dst_nodata=np.nan,
+            resampling=Resampling.nearest,
+        )
+        if not np.isfinite(out).any():
+            return None
+        return out
+
+    def get_tile(self, z, x, y):
+        """Returns a tile as PNG bytes, or None if it is empty."""
+        data = self.read_tile(z, x, y)
+        if data is None:
+            return None
+        return encode_png(render_rgba(data, self.vmin, self.vmax, self.colormap))
+
+
+_previews = {}
+_previews_lock = threading.Lock()
+
+
+def clear_preview_cache():
+    """Removes the raster previews kept in memory."""
+    with _previews_lock:
+        _previews.clear()
+
+
+def _preview_cache_paths(key, cache):
+    from .cache import get_cache_dir
+
+    folder = os.path.join(cache if isinstance(cache, str) else get_cache_dir(), "raster")
+    return os.path.join(folder, key + ".png"), os.path.join(folder, key + ".json")
+
+
+def _read_cached_preview(key, cache):
+    png_path, meta_path = _preview_cache_paths(key, cache)
+    if not os.path.exists(meta_path):
+        return None
+    try:
+        with open(png_path, "rb") as f:
+            png = f.read()
+        with open(meta_path, encoding="utf-8") as f:
+            meta = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return dict(meta, png=png)
+
+
+def _write_cached_preview(key, cache, preview):
+    png_path, meta_path = _preview_cache_paths(key, cache)
+    os.makedirs(os.path.dirname(png_path), exist_ok=True)
+    suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(png_path + suffix, "wb") as f:
+        f.write(preview["png"])
+    os.replace(png_path + suffix, png_path)
+    # The metadata is written last, so a preview is only found once complete.
+    with open(meta_path + suffix, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in preview.items() if k != "png"}, f)
+    os.replace(meta_path + suffix, meta_path)
+
+
+def render_preview(path, bands=None, colormap="gray", vmin=None, vmax=None, percentiles=(2, 98), max_size=1024, cache=False):
+    """Renders a whole raster as one PNG image in Web Mercator, for an image overlay.
+
+    The raster is read once at no more than `max_size` pixels on its longest side,
+    from its internal overviews when it has them and otherwise with a decimated
+    read decoded on all CPUs, and the small array is then warped to Web Mercator,
+    stretched and colored. Previews are kept in memory per file fingerprint and
+    parameters, and optionally on disk.
+
+    Args:
+        path (str): The path to the raster.
+        bands (list, optional): The 1-based band indexes, either one band or three
+            bands for RGB. Defaults to None, which uses the first band, or the
+            first three bands of an RGB raster.
+        colormap (str): The colormap of single band rasters.
+        vmin (float | list, optional): The bottom of the stretch. Defaults to None,
+            which uses the lower percentile.
+        vmax (float | list, optional): The top of the stretch. Defaults to None,
+            which uses the upper percentile.
+        percentiles (tuple): The percentiles of the stretch used when `vmin` or
+            `vmax` is None.
+        max_size (int): The size in pixels of the longest side of the image.
+        cache (bool | str): Whether to also keep the preview in the on-disk cache,
+            so later sessions skip reading the raster. A directory can be given to
+            use a custom cache location.
+
+    Returns:
+        dict: The "png" bytes, the ((south, west), (north, east)) "bounds" of the
+            image and the "vmin" and "vmax" of the stretch.
+    """
+    rasterio = _import_rasterio()
+    from rasterio.enums import Resampling
+    from rasterio.transform import from_bounds
+    from rasterio.warp import reproject, transform_bounds
+
+    from .cache import cache_key
+    from .profiling import stage
+
+    params = dict(bands=bands, colormap=colormap, vmin=vmin, vmax=vmax, percentiles=list(percentiles), max_size=max_size)
+    key = cache_key(path, preview=params)
+    with _previews_lock:
+        preview = _previews.pop(key, None)
+        if preview is not None:
+            _previews[key] = preview
+            return preview
+    if cache:
+        with stage("cache"):
+            preview = _read_cached_preview(key, cache)
+        if preview is not None:
+            with _previews_lock:
+                _previews[key] = preview
+            return preview
+
+    if colormap not in COLORMAPS:
+        raise ValueError(f"Invalid colormap name. Choose from {sorted(COLORMAPS)}.")
+
+    with rasterio.Env(GDAL_NUM_THREADS="ALL_CPUS"), rasterio.open(path) as src:
+        if bands is None:
+            bands = [1, 2, 3] if src.count >= 3 and src.colorinterp[0].name == "red" else [1]
+        with stage("read") as s:
+            data = read_decimated(src, list(bands), max_size=max_size)
+            s.add(pixels=data[0].size)
+        src_crs = src.crs
+        src_transform = src.transform * src.transform.scale(src.width / data.shape[2], src.height / data.shape[1])
+        src_bounds = src.bounds
+
+    # Leaflet stretches an image overlay linearly in Web Mercator, so the image is
+    # warped to Web Mercator and clipped to the latitudes the map can show.
+    left, bottom, right, top = transform_bounds(src_crs, "EPSG:3857", *src_bounds, densify_pts=21)
+    bottom, top = max(bottom, -WEB_MERCATOR_HALF), min(top, WEB_MERCATOR_HALF)
+    aspect = (right - left) / (top - bottom)
+    width = max(1, int(round(max_size * min(1.0, aspect))))
+    height = max(1, int(round(max_size * min(1.0, 1 / aspect))))
+
+    with stage("warp"):
+        out = np.full((len(data), height, width), np.nan)
+        reproject(
+            data,
+            out,
+            src_transform=src_transform,
+            src_crs=src_crs,
+            src_nodata=np.nan,
+            dst_transform=from_bounds(left, bottom, right, top, width, height),
+            dst_crs="EPSG:3857",
+            dst_nodata=np.nan,
+            resampling=Resampling.nearest,
+        )
+
+    if vmin is None or vmax is None:
+        low, high = percentile_range(out, *percentiles)
+        vmin = low if vmin is None else vmin
+        vmax = high if vmax is None else vmax
+
+    with stage("encode") as s:
+        png = encode_png(render_rgba(out, vmin, vmax, colormap))
+        s.add(png_bytes=len(png))
+
+    west, south, east, north = transform_bounds("EPSG:3857", "EPSG:4326", left, bottom, right, top)
+    preview = {
+        "png": png,
+        "bounds": [[south, west], [north, east]],
+        "vmin": np.asarray(vmin, dtype="float64").tolist(),
+        "vmax": np.asarray(vmax, dtype="float64").tolist(),
+    }
+
+    with _previews_lock:
+        _previews[key] = preview
+        while len(_previews) > PREVIEW_CACHE_SIZE:
+            _previews.pop(next(iter(_previews)))
+    if cache:
+        with stage("cache"):
+            _write_cached_preview(key, cache, preview)
+    return preview
@@ -0,0 +1,203 @@
+"""In-process HTTP server for tiles and other local endpoints."""
+
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+_server = None
+_tile_server = None
+_lock = threading.RLock()
+
+
+class LRUCache:
+    """A thread-safe LRU cache bounded by the total size of its values in bytes.
+
+    Args:
+        max_bytes (int): The maximum total size of the cached values.
+    """
+
+    def __init__(self, max_bytes=256 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Returns the value for a key, or None."""
+        with self._lock:
+            value = self._items.get(key)
+            if value is not None:
+                self._items.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        """Stores a value and evicts the least recently used values."""
+        with self._lock:
+            if key in self._items:
+                self.size -= len(self._items.pop(key))
+            self._items[key] = value
+            self.size += len(value)
+            while self.size > self.max_bytes and len(self._items) > 1:
+                _, old = self._items.popitem(last=False)
+                self.size -= len(old)
+
+    def clear(self):
+        """Removes all values."""
+        with self._lock:
+            self._items.clear()
+            self.size = 0
+
+    def __len__(self):
+        return len(self._items)
+
+
+class LocalServer:
+    """A threaded HTTP server on the loopback interface.
+
+    Handlers are registered for a path prefix and are called with the rest of the
+    path and the query parameters. They return a (status, content_type, body)
+    tuple.
+
+    The base URL given to the map is http://127.0.0.1:<port>. When the browser
+    cannot reach the kernel host directly (e.g. a remote JupyterHub), set the
+    TIGHT_LOOPS_SERVER_URL environment variable to a proxy URL, where "{port}"
+    is replaced by the port, e.g. "/proxy/{port}".
+
+    Args:
+        host (str): The interface to listen on.
+        port (int): The port to listen on. Defaults to 0, which picks a free port.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0):
+        self.routes = {}
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+                status, content_type, body = server.dispatch(parts.path, query)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.host, self.port = self.httpd.server_address[:2]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    @property
+    def url(self):
+        """The base URL of the server as seen by the browser."""
+        proxy = os.environ.get("TIGHT_LOOPS_SERVER_URL")
+        if proxy:
+            return proxy.replace("{port}", str(self.port)).rstrip("/")
+        return f"http://{self.host}:{self.port}"
+
+    def register(self, prefix, handler):
+        """Registers a handler for the paths starting with /<prefix>/."""
+        self.routes[prefix.strip("/")] = handler
+
+    def dispatch(self, path, query):
+        """Calls the handler registered for a path."""
+        prefix, _, rest = path.lstrip("/").partition("/")
+        handler = self.routes.get(prefix)
+        if handler is None:
+            return 404, "text/plain", b"Not found"
+        try:
+            return handler(rest, query)
+        except Exception as e:
+            return 500, "text/plain", str(e).encode("utf-8")
+
+    def shutdown(self):
+        """Stops the server."""
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def get_server():
+    """Returns the shared LocalServer, starting it on first use."""
+    global _server
+    with _lock:
+        if _server is None:
+            _server = LocalServer()
+        return _server
+
+
+class TileServer:
+    """Serves XYZ tiles from registered tile sources.
+
+    A tile source is any object with a `get_tile(z, x, y)` method returning the
+    encoded tile bytes (or None for an empty tile) and `content_type` and
+    `extension` attributes. Tiles are rendered on a thread pool, so several tiles
+    can be rendered while the map is panned, and rendered tiles are kept in an
+    LRU cache.
+
+    Args:
+        server (LocalServer, optional): The HTTP server. Defaults to None, which
+            uses get_server().
+        max_workers (int): The number of tiles rendered concurrently.
+        cache_size (int): The maximum size of the tile cache in bytes.
+    """
+
+    def __init__(self, server=None, max_workers=4, cache_size=256 * 1024 ** 2):
+        self.server = server or get_server()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self.cache = LRUCache(cache_size)
+        self.sources = {}
+        self.server.register("tiles", self.handle)
+
+    def add_source(self, source):
+        """Registers a tile source and returns its XYZ URL template."""
+        source_id = uuid.uuid4().hex[:12]
+        self.sources[source_id] = source
+        return f"{self.server.url}/tiles/{source_id}/{{z}}/{{x}}/{{y}}.{source.extension}"
+
+    def remove_source(self, url):
+        """Unregisters the tile source of a URL template."""
+        source_id = url.split("/tiles/")[1].split("/")[0]
+        self.sources.pop(source_id, None)
+
+    def get_tile(self, source_id, z, x, y):
+        """Returns a tile from the cache, rendering it on the thread pool if needed."""
+        key = (source_id, z, x, y)
+        tile = self.cache.get(key)
+        if tile is None:
+            source = self.sources[source_id]
+            tile = self.executor.submit(source.get_tile, z, x, y).result()
+            if tile is None:
+                tile = b""
+            self.cache.put(key, tile)
+        return tile
+
+    def handle(self, path, query):
+        """Handles a request for /tiles/<source>/<z>/<x>/<y>.<ext>."""
+        parts = path.split("/")
+        if len(parts) != 4 or parts[0] not in self.sources:
+            return 404, "text/plain", b"Not found"
+        source = self.sources[parts[0]]
+        z, x, y = int(parts[1]), int(parts[2]), int(parts[3].split(".")[0])
+        tile = self.get_tile(parts[0], z, x, y)
+        if not tile:
+            return 204, source.content_type, b""
+        return 200, source.content_type, tile
+
+
+def get_tile_server():
+    """Returns the shared TileServer, starting it on first use."""
+    global _tile_server
+    with _lock:
+        if _tile_server is None:
+            _tile_server = TileServer(get_server())
+        return _tile_server
@@ -1,38 +1,75 @@
 """Main module."""
 
-import random
 import ipyleaflet
 import ipywidgets as widgets
 from ipyleaflet import WidgetControl
 
+from .common import contour_tif_box, generate_random_string  # noqa: F401
+from .profiling import profiled, stage
+
 class Map(ipyleaflet.Map):
-    def __init__(self, center=(0,0), zoom=2, **kwargs) -> None:
+    @profiled
+    def __init__(self, center=(0,0), zoom=2, headless=False, **kwargs) -> None:
+        """Creates a map.
+
+        Args:
+            center (tuple): The initial (lat, lon) center of the map.
+            zoom (int): The initial zoom level.
+            headless (bool): Whether to create the map with as few widgets as
+                possible, for building maps programmatically or in batches. The
+                layers, fullscreen, zoom and toolbar controls are then only added
+                when they are asked for explicitly.
+            **kwargs: Keyword arguments passed to ipyleaflet.Map, and the
+                `layers_control`, `fullscreen_control` and `add_toolbar` flags.
+        """
+        layers_control = kwargs.pop("layers_control", not headless)
+        fullscreen_control = kwargs.pop("fullscreen_control", not headless)
+        add_toolbar = kwargs.pop("add_toolbar", not headless)
 
         if "scroll_wheel_zoom" not in kwargs:
             kwargs["scroll_wheel_zoom"] = True
+        if headless and "zoom_control" not in kwargs:
+            kwargs["zoom_control"] = False
         super().__init__(center=center, zoom=zoom, **kwargs)
 
-        if "layers_control" not in kwargs:
-            kwargs["layers_control"] = True
-
-        if kwargs["layers_control"]:
+        if layers_control:
             self.add_layers_control()
 
-        if "fullscreen_control" not in kwargs:
-            kwargs["fullscreen_control"] = True
-        
-        if kwargs["fullscreen_control"]:
+        if fullscreen_control:
             self.add_fullscreen_control()
-        
-        if "add_toolbar" not in kwargs:
-            kwargs["add_toolbar"] = True
 
-        if kwargs["add_toolbar"]:
+        if add_toolbar:
             self.add_toolbar()
 
-    
-    def add_search_control(self, url = 'https://nominatim.openstreetmap.org/search?format=json&q={s}', position="topleft", **kwargs):
-        """Adds a search control to the map."""
+    def widget_count(self):
+        """Returns the number of widgets in the map, including its layers and controls."""
+        from .metrics import count_widgets
+
+        return count_widgets(self)
+
+    @profiled
+    def add_search_control(self, url = 'https://nominatim.openstreetmap.org/search?format=json&q={s}', position="topleft", gazetteer=None, **kwargs):
+        """Adds a search control to the map.
+
+        Args:
+            url (str): The URL of a Nominatim-compatible search endpoint, where
+                "{s}" is replaced by the query.
+            position (str): The position of the control.
+            gazetteer (str | Gazetteer, optional): A local gazetteer, or the path
+                to a CSV file or vector file of places loaded as one, searched
+                through the in-process server instead of `url`. Defaults to None.
+            **kwargs: Keyword arguments passed to ipyleaflet.SearchControl.
+
+        Returns:
+            ipyleaflet.SearchControl: The search control.
+        """
+        if gazetteer is not None:
+            from .geocoder import Gazetteer, get_geocode_server
+
+            if not isinstance(gazetteer, Gazetteer):
+                gazetteer = Gazetteer.from_file(gazetteer)
+            url = get_geocode_server().add_gazetteer(gazetteer) + "/search?format=json&q={s}"
+
         search_control = ipyleaflet.SearchControl(url=url, position=position, **kwargs)
         self.add_control(search_control)
         return search_control
@@ -88,38 +125,130 @@ class Map(ipyleaflet.Map):
         self.add_control(fullscreen_control)
         return fullscreen_control
     
+    @profiled
     def add_tile_layer(self, url, name, attribution, **kwargs):
         """Adds a tile layer to the map."""
         tile_layer = ipyleaflet.TileLayer(url=url, name=name, attribution=attribution, **kwargs)
         self.add_layer(tile_layer)
         return tile_layer
     
+    def basemap_layer(self):
+        """Returns the basemap layer of the map, adding one if the map has none."""
+        for layer in self.layers:
+            if isinstance(layer, ipyleaflet.TileLayer) and layer.base:
+                return layer
+        layer = ipyleaflet.TileLayer(base=True)
+        self.add(layer, index=0)
+        return layer
+
+    @profiled
     def add_basemap(self, basemap, **kwargs):
-        
-        import xyzservices.providers as xyz
+        """Sets the basemap of the map.
 
-        if basemap.lower() == "roadmap":
-            url = "http://mt0.google.com/vt/lyrs=m&hl=en&x={x}&y={y}&z={z}"
-            self.add_tile_layer(url, name=basemap, attribution="Google")
+        The map keeps a single basemap layer whose URL is swapped in place, so
+        changing the basemap never leaves other basemap layers loading tiles.
 
-        elif basemap.lower() == "satellite":
-            url = "http://mt0.google.com/vt/lyrs=s&hl=en&x={x}&y={y}&z={z}"
-            self.add_tile_layer(url, name=basemap, attribution="Google")
+        Args:
+            basemap (str): The name of the basemap, e.g. "Roadmap", "Satellite" or
+                an xyzservices provider such as "Esri.WorldImagery". Case and
+                separators are ignored.
+            **kwargs: Traits set on the basemap layer, e.g. `opacity`.
 
-        else:
-            try:
-                basemap = eval(f"xyz.{basemap}")
-                url = basemap.build_url()
-                attribution = basemap.attribution
-                self.add_tile_layer(url, name=basemap.name, attribution=attribution, **kwargs)
-            except:
-                raise ValueError("Invalid basemap name.")
-            
-    def add_geojson(self, data, **kwargs):
-        """Adds a GeoJSON layer to the map."""
+        Returns:
+            TileLayer: The basemap layer.
+
+        Raises:
+            TypeError: If a keyword argument is not a trait of the layer.
+        """
+        from .basemaps import get_basemap
+
+        basemap = get_basemap(basemap)
+        layer = self.basemap_layer()
+        unknown = [key for key in kwargs if not layer.has_trait(key)]
+        if unknown:
+            raise TypeError(f"TileLayer has no trait {', '.join(map(repr, unknown))}.")
+        with layer.hold_trait_notifications():
+            layer.name = basemap["name"]
+            layer.attribution = basemap["html_attribution"]
+            layer.min_zoom = basemap["min_zoom"]
+            layer.max_zoom = basemap["max_zoom"]
+            layer.url = basemap["url"]
+            for key, value in kwargs.items():
+                setattr(layer, key, value)
+        return layer
+
+    @profiled
+    def add_geojson(self, data, bbox=None, where=None, max_features=None, lazy=False, simplify=False, **kwargs):
+        """Adds a GeoJSON layer to the map.
+
+        When reading from a file with any of `bbox`, `where`, `max_features` or
+        `lazy`, the file is streamed one feature at a time and only the matching
+        features are kept. A GeoJSON dictionary is filtered the same way.
+
+        Args:
+            data (str | dict): A GeoJSON dictionary or a GeoJSON file path.
+            bbox (tuple, optional): A (minx, miny, maxx, maxy) box used to filter
+                the features. Defaults to None.
+            where (dict | callable, optional): A property filter, either a dict of
+                property values or a function of the properties. Defaults to None.
+            max_features (int, optional): The maximum number of features. Defaults to None.
+            lazy (bool): Whether to defer reading the data until it is needed.
+                The layer is added empty and loads its features the first time
+                the map is zoomed or panned to a view overlapping `bbox` (any
+                view without a box) while the layer is visible, or the first
+                time its `visible` trait is set to True, e.g. for a layer added
+                with `visible=False`. Defaults to False.
+            simplify (bool): Whether to swap in simplified geometries at coarse
+                zoom levels, as in add_gdf. Defaults to False, which keeps the
+                data unchanged.
+
+        Returns:
+            ipyleaflet.GeoJSON: The GeoJSON layer.
+        """
         import json
 
-        if isinstance(data, str):
+        streaming = bbox is not None or where is not None or max_features is not None or lazy
+
+        if isinstance(data, (str, dict)) and streaming:
+            from .geojson_stream import filter_features, read_geojson
+
+            source = data
+
+            def load():
+                if isinstance(source, dict):
+                    return filter_features(source, bbox=bbox, where=where, max_features=max_features)
+                return read_geojson(source, bbox=bbox, where=where, max_features=max_features)
+
+            if lazy:
+                from .view import split_bounds
+
+                geojson = ipyleaflet.GeoJSON(data={"type": "FeatureCollection", "features": []}, **kwargs)
+
+                def in_view():
+                    if not geojson.visible or not self.bounds:
+                        return False
+                    if bbox is None:
+                        return True
+                    minx, miny, maxx, maxy = bbox
+                    return any(
+                        west <= maxx and minx <= east and south <= maxy and miny <= north
+                        for west, south, east, north in split_bounds(self.bounds)
+                    )
+
+                def on_change(change):
+                    if change["new"] if change["name"] == "visible" else in_view():
+                        self.unobserve(on_change, names=["zoom", "bounds"])
+                        geojson.unobserve(on_change, "visible")
+                        geojson.data = load()
+
+                self.observe(on_change, names=["zoom", "bounds"])
+                geojson.observe(on_change, "visible")
+                self.add_layer(geojson)
+                return geojson
+
+            data = load()
+
+        elif isinstance(data, str):
         
             with open(data, "r") as f:
                 data = json.load(f)
@@ -127,8 +256,16 @@ class Map(ipyleaflet.Map):
         elif not isinstance(data, dict):
             raise ValueError("data must be a GeoJSON dictionary or a GeoJSON file path.")
 
+        if simplify:
+            import geopandas as gpd
+
+            features = data["features"] if data.get("type") == "FeatureCollection" else [data]
+            gdf = gpd.GeoDataFrame.from_features(features, crs="EPSG:4326")
+            return self.add_gdf(gdf, simplify=True, **kwargs)
+
         geojson = ipyleaflet.GeoJSON(data=data, **kwargs)
         self.add_layer(geojson)
+        return geojson
     
     # def add_shp(self, data, **kwargs):
     #     """Adds a Shapefile layer to the map."""
@@ -139,77 +276,392 @@ class Map(ipyleaflet.Map):
     #     geojson = ipyleaflet.GeoJSON(data=data, **kwargs)
     #     self.add_layer(geojson)
 
-    def add_shp(self, data, name='Shapefile', **kwargs):
+    @profiled
+    def add_shp(self, data, name='Shapefile', columns=None, cache=False, merge=True, max_workers=None, progress=False, **kwargs):
         """Adds a Shapefile layer to the map.
 
         Args:
-            data (str): The path to the Shapefile.
+            data (str | list): The path to the Shapefile, or a glob pattern such as
+                "counties/*.shp" or a list of paths to load many files at once.
+            name (str): The name of the layer.
+            columns (list, optional): The attribute columns to read and send to the
+                map. Defaults to None, which keeps all columns.
+            cache (bool): Whether to keep the reprojected data in the on-disk
+                cache, so reruns skip reading and reprojecting the file.
+            merge (bool): Whether to merge many files into one layer. Otherwise
+                each file is a layer of a LayerGroup, named after the file.
+            max_workers (int, optional): The number of threads reading many files.
+            progress (bool | callable): Whether to print progress while reading
+                many files. A callable is called with the files done and the total.
+
+        Returns:
+            ipyleaflet.GeoJSON | ipyleaflet.LayerGroup: The layer. When many files
+                are loaded, its `errors` attribute maps the files that could not
+                be read to their error message.
         """
-        import geopandas as gpd
+        from .vector import is_multi_input, read_vector
 
-        gdf = gpd.read_file(data)
-        
-        if gdf.crs.to_epsg() != 4326:
-            
-            gdf = gdf.to_crs(epsg=4326)
-            geojson = gdf.__geo_interface__
-        
+        if is_multi_input(data):
+            return self._add_vectors(data, name, columns, cache, merge, max_workers, progress, **kwargs)
+
+        gdf = read_vector(data, columns=columns, cache=cache)
+
+        return self.add_gdf(gdf, name=name, columns=columns, **kwargs)
+
+    def _add_vectors(self, data, name, columns, cache, merge, max_workers, progress, **kwargs):
+        """Reads many vector files in parallel and adds them as one layer or a group."""
+        import os
+
+        import pandas as pd
+
+        from .vector import read_vectors
+
+        frames, errors = read_vectors(data, columns=columns, cache=cache, max_workers=max_workers, progress=progress)
+        if not frames:
+            raise ValueError(f"None of the vector files could be read: {errors}")
+
+        if merge:
+            gdf = pd.concat(list(frames.values()), ignore_index=True)
+            layer = self.add_gdf(gdf, name=name, columns=columns, **kwargs)
         else:
-            geojson = gdf.__geo_interface__
+            layers = [
+                self._gdf_layer(gdf, name=os.path.splitext(os.path.basename(path))[0], columns=columns, **kwargs)
+                for path, gdf in frames.items()
+            ]
+            layer = ipyleaflet.LayerGroup(layers=layers, name=name)
+            self.add_layer(layer)
 
-        self.add_geojson(geojson, name=name, **kwargs)
-    
-    def add_vector(self, data, **kwargs):
-        """Adds a vector layer to the map."""
-        import geopandas as gpd
-        import json
-        gdf = gpd.read_file(data)
-        data = json.loads(gdf.to_json())
-        geojson = ipyleaflet.GeoJSON(data=data, **kwargs)
+        layer.errors = errors
+        return layer
+
+    @profiled
+    def add_gdf(self, gdf, name='GeoDataFrame', simplify=False, columns=None, precision=None, quantize=None, **kwargs):
+        """Adds a GeoDataFrame to the map.
+
+        The layer data is built directly from the geometries and attributes, with
+        coordinates rounded to `precision` decimals and only the selected columns
+        kept, which keeps both kernel memory and the widget message small.
+
+        Args:
+            gdf (GeoDataFrame): The GeoDataFrame to add.
+            name (str): The name of the layer.
+            simplify (bool): Whether to precompute simplified versions of the
+                geometries for bands of zoom levels and swap them in as the map
+                zooms, so coarse zooms don't receive full-resolution vertices.
+                Layers with fewer than vector.SIMPLIFY_MIN_VERTICES vertices are
+                sent as they are. Defaults to False.
+            columns (list, optional): The attribute columns sent to the map.
+                Defaults to None, which keeps all columns.
+            precision (int, optional): The number of decimals kept in coordinates.
+                Defaults to None, which keeps 6 decimals, or with `quantize` only
+                the decimals needed by the grid step.
+            quantize (int, optional): The number of grid steps across the layer
+                extent that coordinates are snapped to. Defaults to None.
+
+        Returns:
+            ipyleaflet.GeoJSON: The GeoJSON layer.
+        """
+        geojson = self._gdf_layer(gdf, name, simplify, columns, precision, quantize, **kwargs)
         self.add_layer(geojson)
+        return geojson
+
+    def _gdf_layer(self, gdf, name='GeoDataFrame', simplify=False, columns=None, precision=None, quantize=None, **kwargs):
+        """Builds the GeoJSON layer of a GeoDataFrame without adding it to the map."""
+        from . import vector
+        from .vector import SimplificationPyramid, count_vertices, gdf_to_geojson
+
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(epsg=4326)
+
+        if precision is None and not quantize:
+            precision = 6
+        options = dict(columns=columns, precision=precision, quantize=quantize)
+
+        if not simplify or count_vertices(gdf) < vector.SIMPLIFY_MIN_VERTICES:
+            with stage("serialize") as s:
+                data = gdf_to_geojson(gdf, **options)
+                s.add(features=len(gdf))
+            with stage("send"):
+                return ipyleaflet.GeoJSON(data=data, name=name, **kwargs)
+
+        with stage("simplify"):
+            pyramid = SimplificationPyramid(gdf, **options)
+        with stage("serialize") as s:
+            data = pyramid.data(self.zoom)
+            s.add(features=len(gdf))
+        with stage("send"):
+            geojson = ipyleaflet.GeoJSON(data=data, name=name, **kwargs)
+        level = [pyramid.level(self.zoom)]
+        attached = [False]
+
+        def on_zoom(change):
+            new_level = pyramid.level(change["new"])
+            if new_level != level[0]:
+                level[0] = new_level
+                geojson.data = pyramid.data(change["new"])
+
+        def on_layers(change):
+            # The observers hold the pyramid, so they are dropped once the layer
+            # has been on the map and left it, directly or within a layer group.
+            if _contains_layer(change["new"], geojson):
+                attached[0] = True
+            elif attached[0]:
+                self.unobserve(on_zoom, "zoom")
+                self.unobserve(on_layers, "layers")
+
+        self.observe(on_zoom, "zoom")
+        self.observe(on_layers, "layers")
+        return geojson
+    
+    @profiled
+    def add_vector(self, data, name='Vector', columns=None, cache=False, merge=True, max_workers=None, progress=False, **kwargs):
+        """Adds a vector layer to the map.
+
+        Args:
+            data (str | list): The path to a vector file supported by GeoPandas, or
+                a glob pattern such as "tiles/*.gpkg" or a list of paths to load
+                many files at once.
+            name (str): The name of the layer.
+            columns (list, optional): The attribute columns to read and send to the
+                map. Defaults to None, which keeps all columns.
+            cache (bool): Whether to keep the reprojected data in the on-disk
+                cache, so reruns skip reading and reprojecting the file.
+            merge (bool): Whether to merge many files into one layer. Otherwise
+                each file is a layer of a LayerGroup, named after the file.
+            max_workers (int, optional): The number of threads reading many files.
+            progress (bool | callable): Whether to print progress while reading
+                many files. A callable is called with the files done and the total.
+
+        Returns:
+            ipyleaflet.GeoJSON | ipyleaflet.LayerGroup: The layer. When many files
+                are loaded, its `errors` attribute maps the files that could not
+                be read to their error message.
+        """
+        from .vector import is_multi_input, read_vector
+
+        if is_multi_input(data):
+            return self._add_vectors(data, name, columns, cache, merge, max_workers, progress, **kwargs)
+
+        gdf = read_vector(data, columns=columns, cache=cache)
+
+        return self.add_gdf(gdf, name=name, columns=columns, **kwargs)
     
-    def add_raster(self, url, name='Raster', fit_bounds=True, **kwargs):
+    @profiled
+    def add_viewport_layer(self, data, name='Viewport', columns=None, cache=False, **kwargs):
+        """Adds a vector layer that only sends the features in view to the map.
+
+        The features intersecting the current view are found with a spatial index
+        and sent in cells of a tile grid as the map is panned and zoomed, without
+        sending again the cells already loaded.
+
+        Args:
+            data (str | GeoDataFrame): The path to a vector file, or a GeoDataFrame.
+            name (str): The name of the layer.
+            columns (list, optional): The attribute columns sent to the map.
+                Defaults to None, which keeps all columns.
+            cache (bool): Whether to keep the data read from a file in the on-disk
+                cache.
+            **kwargs: Keyword arguments passed to ViewportLayer, e.g. `delay`,
+                `max_features` or `style`.
+
+        Returns:
+            ViewportLayer: The layer.
+        """
+        from .vector import read_vector
+        from .viewport import ViewportLayer
+
+        gdf = read_vector(data, columns=columns, cache=cache) if isinstance(data, str) else data
+        return ViewportLayer(gdf, name=name, columns=columns, **kwargs).add_to(self)
+
+    @profiled
+    def add_raster(self, url, name='Raster', fit_bounds=True, endpoint=None, client=None, **kwargs):
         """Adds a raster layer to the map.
 
             Args:
                 url (str): The URL of the raster.
                 name (str): The name of the raster.
                 fit_bounds (bool): Whether to fit the map bounds to the raster.
+                endpoint (str, optional): The TiTiler endpoint. Defaults to None,
+                    which uses the TITILER_ENDPOINT environment variable or
+                    https://titiler.xyz.
+                client (TitilerClient, optional): The client used for the requests.
+                    Defaults to None, which uses the shared client of the endpoint.
         """
-        import httpx
+        return self.add_rasters([url], names=[name], fit_bounds=fit_bounds, endpoint=endpoint, client=client, **kwargs)[0]
 
-        titiler_endpoint = "https://titiler.xyz" 
+    @profiled
+    def add_rasters(self, urls, names=None, fit_bounds=True, endpoint=None, client=None, **kwargs):
+        """Adds many raster layers to the map, resolving them in parallel.
 
-        r = httpx.get(
-            f"{titiler_endpoint}/cog/info",
-            params = {
-                "url": url,
-            }
-        ).json()
+            Args:
+                urls (list): The URLs of the rasters.
+                names (list, optional): The names of the rasters. Defaults to None,
+                    which names them Raster 1, Raster 2, ...
+                fit_bounds (bool): Whether to fit the map bounds to the rasters.
+                endpoint (str, optional): The TiTiler endpoint. Defaults to None.
+                client (TitilerClient, optional): The client used for the requests.
+                    Defaults to None.
+
+            Returns:
+                list: The tile layers.
+        """
+        from .titiler import get_client
 
-        bounds = r["bounds"]
+        if client is None:
+            client = get_client(endpoint)
+        if names is None:
+            names = [f"Raster {i + 1}" for i in range(len(urls))]
 
-        r = httpx.get(
-            f"{titiler_endpoint}/cog/tilejson.json",
-            params = {
-                "url": url,
-            }
-        ).json()
+        metadata = client.metadata_many(urls)
+
+        layers = []
+        for item, name in zip(metadata, names):
+            layers.append(self.add_tile_layer(url=item["tiles"][0], name=name, attribution="raster", **kwargs))
+
+        if fit_bounds and urls:
+            bounds = [item["bounds"] for item in metadata]
+            west = min(b[0] for b in bounds)
+            south = min(b[1] for b in bounds)
+            east = max(b[2] for b in bounds)
+            north = max(b[3] for b in bounds)
+            self.fit_bounds([[south, west], [north, east]])
+
+        return layers
+
+    @profiled
+    def add_local_raster(self, filename, name='Local Raster', fit_bounds=True, bands=None, colormap='gray', vmin=None, vmax=None, preview=False, **kwargs):
+        """Adds a local GeoTIFF or COG to the map through the in-process tile server.
+
+        Args:
+            filename (str): The path to the raster.
+            name (str): The name of the layer.
+            fit_bounds (bool): Whether to fit the map bounds to the raster.
+            bands (list, optional): The 1-based band indexes, one band or three
+                for RGB. Defaults to None.
+            colormap (str): The colormap of single band rasters.
+            vmin (float, optional): The bottom of the stretch. Defaults to None,
+                which uses the 2nd percentile.
+            vmax (float, optional): The top of the stretch. Defaults to None,
+                which uses the 98th percentile.
+            preview (bool): Whether to add a single decimated image of the raster
+                with add_raster_preview instead of serving tiles.
+
+        Returns:
+            ipyleaflet.TileLayer | ipyleaflet.ImageOverlay: The layer.
+        """
+        if preview:
+            return self.add_raster_preview(
+                filename, name=name, fit_bounds=fit_bounds, bands=bands, colormap=colormap, vmin=vmin, vmax=vmax, **kwargs
+            )
 
-        tile = r["tiles"][0]
+        from .raster import RasterTileSource
+        from .server import get_tile_server
 
-        self.add_tile_layer(url=tile, name=name, attribution="raster", **kwargs)
+        source = RasterTileSource(filename, bands=bands, colormap=colormap, vmin=vmin, vmax=vmax)
+        url = get_tile_server().add_source(source)
+        layer = self.add_tile_layer(url=url, name=name, attribution="local raster", **kwargs)
 
         if fit_bounds:
-            bbox = [[bounds[1], bounds[0]], [bounds[3], bounds[2]]]
-            self.fit_bounds(bbox)
-
-    # def add_local_raster(self, filename, name='Local Raster', **kwargs):
-    #     try:
-    #         import localtilesserver
-    #     except ImportError:
-    #         raise ImportError("Please install localtilesserver: pip install localtilesserver")
-        
+            west, south, east, north = source.bounds
+            self.fit_bounds([[south, west], [north, east]])
+
+        return layer
+
+    @profiled
+    def add_raster_preview(self, filename, name='Raster Preview', fit_bounds=True, bands=None, colormap='gray', vmin=None, vmax=None, max_size=1024, cache=False, **kwargs):
+        """Adds a decimated preview of a local raster as a single image overlay.
+
+        The raster is read once at a reduced resolution, from its overviews when
+        it has them, warped to Web Mercator and colored into one PNG embedded in
+        the layer, which is much faster than tiles for a quick look at a large
+        raster. The rendered image is cached per file and parameters.
+
+        Args:
+            filename (str): The path to the raster.
+            name (str): The name of the layer.
+            fit_bounds (bool): Whether to fit the map bounds to the raster.
+            bands (list, optional): The 1-based band indexes, one band or three
+                for RGB. Defaults to None.
+            colormap (str): The colormap of single band rasters.
+            vmin (float, optional): The bottom of the stretch. Defaults to None,
+                which uses the 2nd percentile.
+            vmax (float, optional): The top of the stretch. Defaults to None,
+                which uses the 98th percentile.
+            max_size (int): The size in pixels of the longest side of the image.
+            cache (bool): Whether to also keep the image in the on-disk cache, so
+                later sessions skip reading the raster.
+
+        Returns:
+            ipyleaflet.ImageOverlay: The image overlay.
+        """
+        import base64
+
+        from .raster import render_preview
+
+        preview = render_preview(
+            filename, bands=bands, colormap=colormap, vmin=vmin, vmax=vmax, max_size=max_size, cache=cache
+        )
+        url = "data:image/png;base64," + base64.b64encode(preview["png"]).decode("ascii")
+        (south, west), (north, east) = preview["bounds"]
+        layer = ipyleaflet.ImageOverlay(url=url, bounds=((south, west), (north, east)), name=name, **kwargs)
+        self.add_layer(layer)
+
+        if fit_bounds:
+            self.fit_bounds([[south, west], [north, east]])
+
+        return layer
+
+    @profiled
+    def add_vector_tiles(self, data, name='Vector Tiles', columns=None, style=None, fit_bounds=True, max_native_zoom=16, cache=False, **kwargs):
+        """Adds a large vector dataset to the map as vector tiles cut on request.
+
+        Instead of sending every feature to the browser, the data are served by
+        the in-process tile server as Mapbox Vector Tiles. Each tile is clipped,
+        simplified and quantized when the map first asks for it and is cached
+        afterwards, so only the tiles in view are ever produced or transferred.
+
+        Args:
+            data (str | GeoDataFrame): The path to a vector file, or a GeoDataFrame.
+            name (str): The name of the layer.
+            columns (list, optional): The attribute columns kept in the tiles.
+                Defaults to None, which keeps all columns.
+            style (dict, optional): The Leaflet path options of the features, e.g.
+                {"color": "red", "weight": 1, "radius": 3}. Defaults to None.
+            fit_bounds (bool): Whether to fit the map bounds to the data.
+            max_native_zoom (int): The highest zoom level tiles are cut at. The
+                tiles of this level are scaled up beyond it.
+            cache (bool): Whether to keep the data read from a file in the on-disk
+                cache.
+            **kwargs: Keyword arguments passed to ipyleaflet.VectorTileLayer.
+
+        Returns:
+            ipyleaflet.VectorTileLayer: The vector tile layer.
+        """
+        from .mvt import VectorTileSource
+        from .server import get_tile_server
+        from .vector import read_vector
+
+        gdf = read_vector(data, columns=columns, cache=cache) if isinstance(data, str) else data
+        source = VectorTileSource(gdf, columns=columns)
+        url = get_tile_server().add_source(source)
+
+        if style is None:
+            style = {"color": "#3388ff", "weight": 1, "fill": True, "fillOpacity": 0.3, "radius": 3}
+        layer = ipyleaflet.VectorTileLayer(
+            url=url,
+            name=name,
+            layer_styles={source.layer_name: style},
+            max_native_zoom=max_native_zoom,
+            **kwargs,
+        )
+        self.add(layer)
+
+        if fit_bounds:
+            west, south, east, north = source.bounds
+            self.fit_bounds([[south, west], [north, east]])
+
+        return layer
+
     def opacity_slider(self, value=0.1, min=0, max=1, position="bottomright"):
         """Adds an opacity slider to the map.
         
@@ -240,9 +692,18 @@ class Map(ipyleaflet.Map):
         self.add_control(control)
 
     def add_toolbar(self, position="topright"):
-        
+        """Adds a toolbar to the map.
 
-        widget_width = "250px"
+        Only the toolbar button is created when the toolbar is added. The tool
+        buttons, the output and the basemap dropdown are built the first time
+        the toolbar is opened.
+
+        Args:
+            position (str): The position of the toolbar.
+
+        Returns:
+            WidgetControl: The toolbar control.
+        """
         padding = "0px 0px 0px 5px"  # upper, right, bottom, left
 
         toolbar_button = widgets.ToggleButton(
@@ -251,221 +712,217 @@ class Map(ipyleaflet.Map):
             icon="wrench",
             layout=widgets.Layout(width="28px", height="28px", padding=padding),
         )
+        toolbar = widgets.VBox([toolbar_button])
+        toolbar_ctrl = WidgetControl(widget=toolbar, position=position)
+        panel = []
+
+        def build_panel():
+            close_button = widgets.ToggleButton(
+                value=False,
+                tooltip="Close the tool",
+                icon="times",
+                button_style="primary",
+                layout=widgets.Layout(height="28px", width="28px", padding=padding),
+            )
+
+            rows = 2
+            cols = 2
+            grid = widgets.GridspecLayout(rows, cols, grid_gap="0px", layout=widgets.Layout(width="65px"))
+
+            icons = ["folder-open", "map", "bluetooth", "area-chart"]
+
+            for i in range(rows):
+                for j in range(cols):
+                    grid[i, j] = widgets.Button(description="", button_style="primary", icon=icons[i*rows+j],
+                                                layout=widgets.Layout(width="28px", padding="0px"))
+
+            output = widgets.Output()
+            output_ctrl = WidgetControl(widget=output, position="bottomright")
+            self.add_control(output_ctrl)
+
+            basemap = widgets.Dropdown(
+                options = ["Satellite", "Roadmap"],
+                value = None,
+                description = "Basemap",
+                style = {"description_width": "initial"},
+                layout=widgets.Layout(width="250px")
+            )
+            basemap_ctrl = WidgetControl(widget=basemap, position="topright")
+
+            def close_click(change):
+                if change["new"]:
+                    for control in (toolbar_ctrl, output_ctrl, basemap_ctrl):
+                        if control in self.controls:
+                            self.remove(control)
+                    toolbar_button.close()
+                    close_button.close()
+                    toolbar.close()
+
+            close_button.observe(close_click, "value")
+
+            def change_basemap(change):
+                if change['new']:
+                    with output:
+                        print(basemap.value)
+                    self.add_basemap(basemap.value)
+
+            basemap.observe(change_basemap, names="value")
+
+            def tool_click(b):
+                with output:
+                    print(f"{b.icon} clicked")
 
-        close_button = widgets.ToggleButton(
-            value=False,
-            tooltip="Close the tool",
-            icon="times",
-            button_style="primary",
-            layout=widgets.Layout(height="28px", width="28px", padding=padding),
-        )
-
-        toolbar = widgets.HBox([toolbar_button])
+                    if b.icon == "map":
+                        if basemap_ctrl not in self.controls:
+                            self.add(basemap_ctrl)
 
-        def toolbar_click(change):
-            if change["new"]:
-                toolbar.children = [toolbar_button, close_button]
-            else:
-                toolbar.children = [toolbar_button]
-                
-        toolbar_button.observe(toolbar_click, "value")
+            for i in range(rows):
+                for j in range(cols):
+                    grid[i, j].on_click(tool_click)
 
-        def close_click(change):
-            if change["new"]:
-                toolbar_button.close()
-                close_button.close()
-                toolbar.close()
-                
-        close_button.observe(close_click, "value")
-
-        rows = 2
-        cols = 2
-        grid = widgets.GridspecLayout(rows, cols, grid_gap="0px", layout=widgets.Layout(width="65px"))
-
-        icons = ["folder-open", "map", "bluetooth", "area-chart"]
-
-        for i in range(rows):
-            for j in range(cols):
-                grid[i, j] = widgets.Button(description="", button_style="primary", icon=icons[i*rows+j], 
-                                            layout=widgets.Layout(width="28px", padding="0px"))
-                
-        toolbar = widgets.VBox([toolbar_button])
+            panel.extend([widgets.HBox([close_button, toolbar_button]), grid])
 
         def toolbar_click(change):
             if change["new"]:
-                toolbar.children = [widgets.HBox([close_button, toolbar_button]), grid]
+                if not panel:
+                    build_panel()
+                toolbar.children = panel
             else:
                 toolbar.children = [toolbar_button]
-                
-        toolbar_button.observe(toolbar_click, "value")
 
+        toolbar_button.observe(toolbar_click, "value")
 
+        self.add_control(toolbar_ctrl)
+        return toolbar_ctrl
 
-        output = widgets.Output()
-        output_ctrl = WidgetControl(widget=output, position="bottomright")
-        self.add_control(output_ctrl)
+    @profiled
+    def csv_to_shp(self, data, output=None, driver=None, x='longitude', y='latitude', name='Points', chunksize=None, resume=True, **kwargs):
+        """Converts a CSV of points to a vector file and adds it to the map.
 
+        The point geometries are built from the coordinate columns as arrays and
+        the in-memory GeoDataFrame is added to the map directly, so the output
+        file is never read back. If `chunksize` is given, the CSV is instead
+        streamed to `output` in chunks with bounded memory and no layer is added.
 
-        basemap = widgets.Dropdown(
+        Args:
+            data (str): The path to the CSV file.
+            output (str, optional): The output vector file. The format is inferred
+                from the extension (.shp, .gpkg, .parquet). Defaults to None,
+                which skips writing a file.
+            driver (str, optional): The output driver, e.g. "GPKG" or "Parquet".
+                Defaults to None.
+            x (str): The name of the longitude column.
+            y (str): The name of the latitude column.
+            name (str): The name of the layer.
+            chunksize (int, optional): The number of rows per chunk in streaming
+                mode. Defaults to None.
+            resume (bool): Whether streaming mode resumes an interrupted run.
+            **kwargs: Keyword arguments passed to add_gdf. They cannot be used in
+                streaming mode, which adds no layer.
+
+        Returns:
+            GeoDataFrame | str: The point GeoDataFrame, or the output path in
+                streaming mode.
+        """
+        from .vector import csv_to_gdf, csv_to_vector, write_vector
 
-            options = ["Satellite", "Roadmap"],
-            value = None,
-            description = "Basemap",
-            style = {"description_width": "initial"},
-            layout=widgets.Layout(width="250px")
-        )
-        
-        
-        basemap_ctrl = WidgetControl(widget=basemap, position="topright")
+        if chunksize is not None:
+            if output is None:
+                raise ValueError("output is required when chunksize is set.")
+            if kwargs:
+                raise ValueError(f"No layer is added when chunksize is set, so {', '.join(kwargs)} cannot be used.")
+            return csv_to_vector(data, output, chunksize=chunksize, driver=driver, x=x, y=y, resume=resume)
 
-        def change_basemap(change):
-            if change['new']:
-                with output:
-                    print(basemap.value)
-                self.add_basemap(basemap.value)
+        gdf = csv_to_gdf(data, x=x, y=y)
 
-        basemap.observe(change_basemap, names="value")
+        if output is not None:
+            write_vector(gdf, output, driver=driver)
 
-        def tool_click(b):
-            with output:
-                print(f"{b.icon} clicked")
+        self.add_gdf(gdf, name=name, **kwargs)
+        return gdf
+    
 
-                if b.icon == "map":
-                    if basemap_ctrl not in self.controls:
-                        self.add(basemap_ctrl)
-        for i in range(rows):
-            for j in range(cols):
-                tool = grid[i, j]
-                tool.on_click(tool_click)
+    @profiled
+    def add_points(self, data, x='longitude', y='latitude', values=None, name='Points', position='bottomleft', **kwargs):
+        """Adds many points to the map as a binary layer drawn on a canvas.
 
-        toolbar_ctrl = ipyleaflet.WidgetControl(widget=toolbar, position=position)
+        The coordinates and the values used for coloring are sent as packed
+        arrays instead of GeoJSON features, which keeps millions of points
+        interactive. Requires anywidget.
 
-        self.add_control(toolbar_ctrl)
+        Args:
+            data (str | DataFrame | GeoDataFrame): The path to a CSV file, a
+                DataFrame with coordinate columns, or a GeoDataFrame of points.
+            x (str): The name of the longitude column.
+            y (str): The name of the latitude column.
+            values (str | array, optional): The column or the values used to
+                color the points. Defaults to None.
+            name (str): The name of the layer.
+            position (str): The position of the control holding the layer widget.
+            **kwargs: Keyword arguments passed to PointLayer, e.g. `color`,
+                `colormap`, `radius`, `bits` or `delta`.
+
+        Returns:
+            PointLayer: The point layer.
+        """
+        import sys
 
-    def csv_to_shp(self, data, output):
         import pandas as pd
-        import geopandas as gpd
-        from shapely.geometry import Point
+        from .points import PointLayer
+
+        df = pd.read_csv(data) if isinstance(data, str) else data
+        # A GeoDataFrame implies geopandas is imported, so plain DataFrames do not import it.
+        gpd = sys.modules.get("geopandas")
+        if gpd is not None and isinstance(df, gpd.GeoDataFrame):
+            if df.crs is not None and df.crs.to_epsg() != 4326:
+                df = df.to_crs(epsg=4326)
+            lon, lat = df.geometry.x.to_numpy(), df.geometry.y.to_numpy()
+        else:
+            lon, lat = df[x].to_numpy(), df[y].to_numpy()
+        if isinstance(values, str):
+            values = df[values].to_numpy()
 
-        df = pd.read_csv(data)
+        layer = PointLayer(lon, lat, values=values, name=name, **kwargs)
+        return layer.add_to(self, position=position)
 
-        geometry = [Point(xy) for xy in zip(df.longitude, df.latitude)]
-        gdf = gpd.GeoDataFrame(df, geometry=geometry)
-        gdf = gdf.set_crs(epsg=4326)
-        gdf.to_file(output, driver='ESRI Shapefile')
+    @profiled
+    def grouping_points(self, data, name='Points', x='longitude', y='latitude', popup=None, radius=60, max_zoom=16):
+        """Adds clustered points to the map.
 
-        self.add_shp(output)
-    
+        The clusters are computed in Python once per dataset and only the
+        clusters inside the current view are sent to the map. They are updated
+        when the map is zoomed or panned, and popups are created on click.
 
-    def grouping_points(self, data):
+        Args:
+            data (str | DataFrame): The path to a CSV file or a DataFrame.
+            name (str): The name of the layer.
+            x (str): The name of the longitude column.
+            y (str): The name of the latitude column.
+            popup (list, optional): The columns shown in the popup. Defaults to
+                None, which shows the "name" column if there is one and the
+                coordinate columns.
+            radius (int): The cluster radius in pixels.
+            max_zoom (int): The highest zoom level at which points are clustered.
+
+        Returns:
+            ClusterLayer: The cluster layer.
+        """
         import pandas as pd
-        from ipyleaflet import Marker, MarkerCluster
-        import ipywidgets as widgets
-
-        df = pd.read_csv(data)
-
-        markers = []
-
-        for index, row in df.iterrows():
-            name = row['name']
-            latitude = row['latitude']
-            longitude = row['longitude']
-            marker = Marker(location=(latitude, longitude))
-
-            popup_content = widgets.HTML()
-            popup_content.value = f"<b>Name:</b> {name}<br><b>Latitude:</b> {latitude}<br><b>Longitude:</b> {longitude}"
-            marker.popup = popup_content
-
-            markers.append(marker)
-
-
-        marker_cluster = MarkerCluster()
-
-        marker_cluster = MarkerCluster(markers=markers)
-
-        self.add_layer(marker_cluster)
-
-def contour_tif_box(
-    i,
-    output,
-    interval=200,
-    base=0,
-    smooth=9,
-    tolerance=10,
-    ):
-
-    import os
-    import whitebox
-
-    wbt = whitebox.WhiteboxTools()
-
-    i = os.path.abspath(i)
-    output = os.path.abspath(output)
-
-    wbt.contours_from_raster(i=i, output=output, interval=interval, base=base, smooth=smooth, tolerance=tolerance)
-
-# ----------------------------------------------------------------GDAL Contour Function----------------------------------------------------------------
-# from osgeo import gdal, ogr, osr
-# import os
-
-# def contour_tif(input_file, output_file="new_contours/output_contours.shp", contourInterval=200.0, contourBase=0.0, fixedLevelCount=[], useNoData=False, noDataValue=0, idField=0, elevField=1):
-
-#     """
-#     This function creates contour lines from a DEM file. The function uses the GDAL library to open the DEM file and
-#     extract the elevation values. The function then uses the GDAL library to create a vector file containing the
-#     contour lines. The function uses the OGR library to create the vector file and add the contour lines to it.
-
-#     :param input_file: The input DEM file.
-#     :param output_file: The output vector file containing the contour lines.
-#     :param interval: The contour interval.
-#     :param base: The base contour.
-#     :param fixedLevels: A list of fixed contour levels.
-#     :param useNoData: A boolean value indicating whether to use the NoData value.
-#     :param useZ: A boolean value indicating whether to use the Z value.
-#     :param idField: The field number for the ID field.
-#     :param elevField: The field number for the elevation field.
-#     """
-
-#     # Open the DEM file using the GDAL library
-#     input_file = 'Smokies_DEM.tif'
-#     ds = gdal.Open(input_file)
-
-#     # Get the geotransform information from the DEM
-#     transform = ds.GetGeoTransform()
-
-#     # Define the output file format and options
-#     driver = ogr.GetDriverByName('ESRI Shapefile')
-#     output_file = output_file
-#     output_dir = os.path.dirname(output_file)
-#     if not os.path.exists(output_dir):
-#         os.makedirs(output_dir)
-#     output_ds = driver.CreateDataSource(output_file)
-
-#     # Create the output layer and add a field for elevation values
-#     contour_layer = output_ds.CreateLayer('contours', srs=osr.SpatialReference().CloneGeogCS())
-#     contour_field = ogr.FieldDefn('elev', ogr.OFTReal)
-#     contour_layer.CreateField(contour_field)
-
-
-#     band = ds.GetRasterBand(1)
-#     gdal.ContourGenerate(
-#         band, 
-#         contourInterval=contourInterval, 
-#         contourBase=contourBase, 
-#         fixedLevelCount=fixedLevelCount, 
-#         useNoData=useNoData, 
-#         noDataValue=noDataValue,
-#         dstLayer=contour_layer, 
-#         idField=idField, 
-#         elevField=elevField
-#         )
-    
-#     # Clean up the resources
-#     ds = None
-#     output_ds = None
+        from .cluster import ClusterLayer
+
+        df = pd.read_csv(data) if isinstance(data, str) else data
+        if popup is None:
+            popup = [column for column in ("name", y, x) if column in df.columns]
+
+        layer = ClusterLayer(df, x=x, y=y, popup=popup, name=name, radius=radius, max_zoom=max_zoom)
+        return layer.add_to(self)
 
-    
 
-def generate_random_string(length=15):
-    """Generates a random string."""
-    return ''.join([random.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(length)])
+def _contains_layer(layers, layer):
+    """Returns whether a layer is among layers, or within one of their layer groups."""
+    for item in layers:
+        if item is layer:
+            return True
+        if isinstance(item, ipyleaflet.LayerGroup) and _contains_layer(item.layers, layer):
+            return True
+    return False
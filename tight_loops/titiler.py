@@ -0,0 +1,138 @@
+"""Pooled, cached client for a TiTiler endpoint."""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_ENDPOINT = "https://titiler.xyz"
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_endpoint():
+    """Returns the TiTiler endpoint, set with the TITILER_ENDPOINT environment variable."""
+    return os.environ.get("TITILER_ENDPOINT", DEFAULT_ENDPOINT)
+
+
+class TitilerClient:
+    """A TiTiler client with connection pooling and a metadata cache.
+
+    The /cog/info and /cog/tilejson.json requests for a COG are sent concurrently
+    over a shared pool of connections, and the results are kept for `ttl` seconds
+    per URL and tile parameters.
+
+    Args:
+        endpoint (str, optional): The TiTiler endpoint. Defaults to None, which
+            uses get_endpoint().
+        ttl (float): The number of seconds metadata is cached for.
+        timeout (float): The request timeout in seconds.
+        max_workers (int): The number of concurrent requests.
+        **kwargs: Keyword arguments passed to httpx.Client, e.g. `transport`.
+    """
+
+    def __init__(self, endpoint=None, ttl=3600, timeout=30, max_workers=8, **kwargs):
+        import httpx
+
+        self.endpoint = (endpoint or get_endpoint()).rstrip("/")
+        self.ttl = ttl
+        self.client = httpx.Client(
+            base_url=self.endpoint,
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=max_workers, max_keepalive_connections=max_workers),
+            **kwargs,
+        )
+        self.executor = ThreadPoolExecutor(max_workers=max_workers)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def _get(self, path, params):
+        from .profiling import stage
+
+        with stage("http") as s:
+            response = self.client.get(path, params=params)
+            response.raise_for_status()
+            s.add(requests=1, response_bytes=len(response.content))
+            return response.json()
+
+    def _cached(self, key):
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry[1]
+            self._cache.pop(key, None)
+        return None
+
+    def metadata_many(self, urls, **params):
+        """Returns the metadata of many COGs, resolving them concurrently.
+
+        Args:
+            urls (list): The URLs of the COGs.
+            **params: Query parameters passed to the tilejson request, e.g.
+                `rescale` or `colormap_name`.
+
+        Returns:
+            list: A dict per URL with the "bounds" and "tiles" of the COG and the
+                full "info" and "tilejson" responses.
+        """
+        keys = [(url, tuple(sorted(params.items()))) for url in urls]
+        results = [self._cached(key) for key in keys]
+
+        from .profiling import bind
+
+        get = bind(self._get)
+        pending = {}
+        for key, result in zip(keys, results):
+            if result is None and key not in pending:
+                url = key[0]
+                pending[key] = (
+                    self.executor.submit(get, "/cog/info", {"url": url}),
+                    self.executor.submit(get, "/cog/tilejson.json", dict(params, url=url)),
+                )
+
+        for key, (info, tilejson) in pending.items():
+            info, tilejson = info.result(), tilejson.result()
+            metadata = {
+                "bounds": tilejson.get("bounds") or info["bounds"],
+                "tiles": tilejson["tiles"],
+                "info": info,
+                "tilejson": tilejson,
+            }
+            with self._lock:
+                self._cache[key] = (time.monotonic() + self.ttl, metadata)
+            pending[key] = metadata
+
+        return [result if result is not None else pending[key] for key, result in zip(keys, results)]
+
+    def metadata(self, url, **params):
+        """Returns the metadata of a COG.
+
+        Args:
+            url (str): The URL of the COG.
+            **params: Query parameters passed to the tilejson request.
+
+        Returns:
+            dict: The "bounds" and "tiles" of the COG and the full "info" and
+                "tilejson" responses.
+        """
+        return self.metadata_many([url], **params)[0]
+
+    def clear_cache(self):
+        """Removes all cached metadata."""
+        with self._lock:
+            self._cache.clear()
+
+    def close(self):
+        """Closes the connection pool and the worker threads."""
+        self.executor.shutdown(wait=False)
+        self.client.close()
+
+
+def get_client(endpoint=None):
+    """Returns the shared TitilerClient for an endpoint."""
+    endpoint = (endpoint or get_endpoint()).rstrip("/")
+    with _clients_lock:
+        if endpoint not in _clients:
+            _clients[endpoint] = TitilerClient(endpoint)
+        return _clients[endpoint]
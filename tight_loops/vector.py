@@ -0,0 +1,507 @@
+"""Vector data helpers used by the Map classes."""
+
+import json
+import os
+import time
+
+import geopandas as gpd
+import pandas as pd
+
+DRIVERS = {
+    ".shp": "ESRI Shapefile",
+    ".gpkg": "GPKG",
+    ".geojson": "GeoJSON",
+    ".json": "GeoJSON",
+    ".parquet": "Parquet",
+    ".geoparquet": "Parquet",
+}
+
+# Layers with fewer vertices are sent at full resolution at every zoom, as their
+# simplified bands would save less than they cost to build and keep.
+SIMPLIFY_MIN_VERTICES = 50000
+
+
+def get_driver(output, driver=None):
+    """Returns the vector driver for an output path.
+
+    Args:
+        output (str): The output file path.
+        driver (str, optional): An explicit driver name. "GeoPackage" and
+            "GeoParquet" are accepted as aliases. Defaults to None, which infers
+            the driver from the file extension.
+
+    Returns:
+        str: The driver name.
+    """
+    if driver is not None:
+        aliases = {"geopackage": "GPKG", "geoparquet": "Parquet", "shapefile": "ESRI Shapefile"}
+        return aliases.get(driver.lower(), driver)
+
+    ext = os.path.splitext(output)[1].lower()
+    return DRIVERS.get(ext, "ESRI Shapefile")
+
+
+def df_to_gdf(df, x="longitude", y="latitude", crs="EPSG:4326"):
+    """Builds a point GeoDataFrame from the coordinate columns of a DataFrame.
+
+    Args:
+        df (DataFrame): The input DataFrame.
+        x (str): The name of the longitude column.
+        y (str): The name of the latitude column.
+        crs (str): The CRS of the coordinates.
+
+    Returns:
+        GeoDataFrame: The point GeoDataFrame.
+    """
+    geometry = gpd.points_from_xy(df[x].to_numpy(), df[y].to_numpy(), crs=crs)
+    return gpd.GeoDataFrame(df, geometry=geometry, crs=crs)
+
+
+def csv_to_gdf(data, x="longitude", y="latitude", crs="EPSG:4326", **kwargs):
+    """Reads a CSV of point coordinates into a GeoDataFrame.
+
+    Args:
+        data (str): The path to the CSV file.
+        x (str): The name of the longitude column.
+        y (str): The name of the latitude column.
+        crs (str): The CRS of the coordinates.
+        **kwargs: Keyword arguments passed to pandas.read_csv.
+
+    Returns:
+        GeoDataFrame: The point GeoDataFrame.
+    """
+    df = pd.read_csv(data, **kwargs)
+    return df_to_gdf(df, x=x, y=y, crs=crs)
+
+
+def write_vector(gdf, output, driver=None, **kwargs):
+    """Writes a GeoDataFrame to a vector file.
+
+    Args:
+        gdf (GeoDataFrame): The GeoDataFrame to write.
+        output (str): The output file path.
+        driver (str, optional): The output driver. Defaults to None, which
+            infers the driver from the file extension.
+        **kwargs: Keyword arguments passed to the GeoDataFrame writer.
+
+    Returns:
+        str: The absolute path of the output file.
+    """
+    driver = get_driver(output, driver)
+    output = os.path.abspath(output)
+    out_dir = os.path.dirname(output)
+    if not os.path.exists(out_dir):
+        os.makedirs(out_dir)
+
+    if driver == "Parquet":
+        gdf.to_parquet(output, **kwargs)
+    else:
+        gdf.to_file(output, driver=driver, **kwargs)
+
+    return output
+
+
+def read_vector(data, columns=None, crs="EPSG:4326", cache=False):
+    """Reads a vector file and reprojects it, optionally through the disk cache.
+
+    Args:
+        data (str): The path to a vector file supported by GeoPandas.
+        columns (list, optional): The attribute columns to read. Defaults to None,
+            which reads all columns.
+        crs (str): The target CRS.
+        cache (bool | VectorCache): Whether to use the on-disk cache, keyed on the
+            file path, modification time and size, the target CRS and the columns.
+            A VectorCache instance can be given to use a custom location or size.
+            The cache needs pyarrow; without it the file is read uncached with a
+            warning.
+
+    Returns:
+        GeoDataFrame: The GeoDataFrame in the target CRS.
+    """
+    from . import cache as vector_cache
+    from .cache import VectorCache, cache_key
+    from .profiling import stage
+
+    if cache and not vector_cache.cache_available():
+        import warnings
+
+        warnings.warn("The vector cache needs pyarrow, so files are read without it: pip install pyarrow")
+        cache = False
+
+    if cache:
+        store = cache if isinstance(cache, VectorCache) else VectorCache()
+        key = cache_key(data, crs=crs, columns=columns)
+        with stage("cache") as s:
+            gdf = store.get(key)
+            s.add(hits=int(gdf is not None))
+        if gdf is not None:
+            return gdf
+
+    with stage("read") as s:
+        gdf = gpd.read_file(data, columns=columns)
+        if s:
+            s.add(features=len(gdf), vertices=count_vertices(gdf))
+    if gdf.crs is not None and not gdf.crs.equals(crs):
+        with stage("reproject"):
+            gdf = gdf.to_crs(crs)
+
+    if cache:
+        with stage("cache"):
+            store.put(key, gdf)
+
+    return gdf
+
+
+def count_vertices(gdf):
+    """Returns the total number of vertices of the geometries of a GeoDataFrame."""
+    import shapely
+
+    return int(shapely.get_num_coordinates(gdf.geometry.values).sum())
+
+
+def is_multi_input(data):
+    """Returns whether `data` is a list of paths or a glob pattern rather than one path."""
+    import glob
+
+    if isinstance(data, (list, tuple)):
+        return True
+    return isinstance(data, str) and glob.has_magic(data)
+
+
+def read_vectors(inputs, columns=None, crs="EPSG:4326", cache=False, max_workers=None, progress=False):
+    """Reads and reprojects many vector files in a pool of worker threads.
+
+    The reading in pyogrio and the reprojection in pyproj release the GIL, so
+    threads overlap them without copying the GeoDataFrames between processes.
+    A file that fails is recorded in the errors and the others are still read.
+
+    Args:
+        inputs (str | list): A path, a glob pattern such as "counties/*.shp", or
+            a list of them.
+        columns (list, optional): The attribute columns to read. Defaults to None,
+            which reads all columns.
+        crs (str): The target CRS.
+        cache (bool | VectorCache): Whether to use the on-disk cache for every file.
+        max_workers (int, optional): The number of worker threads. Defaults to
+            None, which lets the executor choose from the number of CPUs.
+        progress (bool | callable): Whether to print progress. A callable is
+            called with the number of files done and the total.
+
+    Returns:
+        tuple: A dict of GeoDataFrames and a dict of error messages, both keyed on
+            the file path. The GeoDataFrames are in the order of the inputs.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    from .common import expand_inputs
+    from .profiling import bind
+
+    paths = expand_inputs(inputs)
+    if not paths:
+        raise FileNotFoundError(f"No vector files match {inputs!r}")
+
+    if progress is True:
+
+        def progress(done, total):
+            print(f"Read {done}/{total} vector files")
+
+    frames, errors = {}, {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        read = bind(read_vector)
+        futures = {executor.submit(read, path, columns=columns, crs=crs, cache=cache): path for path in paths}
+        for done, future in enumerate(as_completed(futures), 1):
+            try:
+                frames[futures[future]] = future.result()
+            except Exception as e:
+                errors[futures[future]] = str(e)
+            if progress:
+                progress(done, len(futures))
+
+    return {path: frames[path] for path in paths if path in frames}, errors
+
+
+def _first_data_row(kwargs):
+    """Returns the line of the first data row of a CSV read with pandas.read_csv(**kwargs)."""
+    header = kwargs.get("header", "infer")
+    if header == "infer":
+        header = None if kwargs.get("names") is not None else 0
+    if header is None:
+        return 0
+    if isinstance(header, int):
+        return header + 1
+    return max(header) + 1
+
+
+def _count_features(output, driver):
+    """Returns the number of features in an existing vector file, or None."""
+    if driver == "Parquet" or not os.path.exists(output):
+        return None
+    try:
+        import pyogrio
+    except ImportError:
+        return None
+    return pyogrio.read_info(output)["features"]
+
+
+def csv_to_vector(
+    data,
+    output,
+    chunksize=100000,
+    driver=None,
+    x="longitude",
+    y="latitude",
+    crs="EPSG:4326",
+    resume=True,
+    progress=True,
+    **kwargs,
+):
+    """Streams a CSV of points to a vector file in chunks.
+
+    Only one chunk is held in memory at a time, so peak memory is bounded by
+    `chunksize` rather than by the size of the CSV. Each chunk is appended to
+    the output as soon as it is converted and a checkpoint file is kept next to
+    the output, so an interrupted run picks up where it stopped. GeoParquet
+    output is written as a directory of part files, one per chunk.
+
+    Args:
+        data (str): The path to the CSV file.
+        output (str): The output vector file.
+        chunksize (int): The number of rows read per chunk.
+        driver (str, optional): The output driver. Defaults to None, which
+            infers the driver from the file extension.
+        x (str): The name of the longitude column.
+        y (str): The name of the latitude column.
+        crs (str): The CRS of the coordinates.
+        resume (bool): Whether to resume an interrupted run. If False, any
+            existing output is overwritten.
+        progress (bool | callable): Whether to print progress. A callable is
+            called with the number of rows written and the rows per second.
+        **kwargs: Keyword arguments passed to pandas.read_csv.
+
+    Returns:
+        str: The absolute path of the output file.
+    """
+    import shutil
+
+    driver = get_driver(output, driver)
+    output = os.path.abspath(output)
+    checkpoint = output + ".progress.json"
+    source = os.path.abspath(data) if isinstance(data, str) else None
+
+    state = None
+    if resume and os.path.exists(checkpoint) and os.path.exists(output):
+        with open(checkpoint) as f:
+            saved = json.load(f)
+        if saved.get("source") == source:
+            state = saved
+            count = _count_features(output, driver)
+            if count is not None:
+                state["rows"] = count
+
+    if state is None:
+        state = {"source": source, "rows": 0, "parts": 0}
+        if os.path.exists(output):
+            if os.path.isdir(output):
+                shutil.rmtree(output)
+            else:
+                os.remove(output)
+
+    if driver == "Parquet":
+        os.makedirs(output, exist_ok=True)
+    elif not os.path.exists(os.path.dirname(output)):
+        os.makedirs(os.path.dirname(output))
+
+    if state["rows"]:
+        if "skiprows" in kwargs:
+            raise ValueError("skiprows cannot be used when resuming, as the rows already written are skipped.")
+        # A callable keeps the header without pandas building a set of every
+        # skipped row number, as it does for a range.
+        first, skipped = _first_data_row(kwargs), state["rows"]
+        kwargs["skiprows"] = lambda i: first <= i < first + skipped
+
+    if progress is True:
+
+        def progress(rows, rate):
+            print(f"{rows:,} rows written ({rate:,.0f} rows/s)")
+
+    start = time.perf_counter()
+    written = 0
+
+    for chunk in pd.read_csv(data, chunksize=chunksize, **kwargs):
+        gdf = df_to_gdf(chunk, x=x, y=y, crs=crs)
+
+        if driver == "Parquet":
+            gdf.to_parquet(os.path.join(output, f"part-{state['parts']:05d}.parquet"))
+        else:
+            mode = "a" if os.path.exists(output) else "w"
+            gdf.to_file(output, driver=driver, mode=mode)
+
+        state["rows"] += len(chunk)
+        state["parts"] += 1
+        written += len(chunk)
+
+        tmp = checkpoint + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, checkpoint)
+
+        if progress:
+            elapsed = time.perf_counter() - start
+            progress(state["rows"], written / elapsed if elapsed else 0)
+
+    if os.path.exists(checkpoint):
+        os.remove(checkpoint)
+
+    return output
+
+
+def _json_records(df):
+    """Converts a DataFrame to a list of JSON-safe property dicts."""
+    if df.shape[1] == 0:
+        return [{} for _ in range(len(df))]
+
+    df = df.copy()
+    for column in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[column]):
+            df[column] = df[column].dt.strftime("%Y-%m-%dT%H:%M:%S")
+    df = df.astype(object).where(df.notna(), None)
+    return df.to_dict("records")
+
+
+def gdf_to_geojson(gdf, columns=None, precision=6, quantize=None, geometry=None):
+    """Builds a GeoJSON FeatureCollection from a GeoDataFrame in one pass.
+
+    The coordinates are rounded with one vectorized pass over all geometries and
+    the features are built straight from the geometries and property records,
+    without serializing to a JSON string and parsing it back.
+
+    Args:
+        gdf (GeoDataFrame): The GeoDataFrame.
+        columns (list, optional): The property columns to keep. Defaults to None,
+            which keeps all columns.
+        precision (int, optional): The number of decimals kept in coordinates.
+            Defaults to 6. None keeps full precision.
+        quantize (int, optional): The number of grid steps across the extent of the
+            layer that coordinates are snapped to, e.g. 1e5. Defaults to None.
+        geometry (GeoSeries, optional): Geometries used in place of the
+            GeoDataFrame's own, e.g. a simplified version. Defaults to None.
+
+    Returns:
+        dict: A GeoJSON FeatureCollection.
+    """
+    import numpy as np
+    import shapely
+
+    geoms = np.asarray(gdf.geometry.values if geometry is None else geometry.values)
+
+    if quantize:
+        minx, miny, maxx, maxy = shapely.total_bounds(geoms)
+        step = max(maxx - minx, maxy - miny) / float(quantize) or 1.0
+        origin = np.array([minx, miny])
+        if precision is None:
+            precision = max(int(np.ceil(-np.log10(step))) + 1, 0)
+
+        def transform(coords):
+            return np.round(origin + np.round((coords - origin) / step) * step, precision)
+
+        geoms = shapely.transform(geoms, transform)
+    elif precision is not None:
+        geoms = shapely.transform(geoms, lambda coords: np.round(coords, precision))
+
+    if columns is None:
+        columns = [column for column in gdf.columns if column != gdf.geometry.name]
+    records = _json_records(gdf[list(columns)])
+
+    features = [
+        {
+            "type": "Feature",
+            "id": str(index),
+            "properties": properties,
+            "geometry": geom.__geo_interface__ if geom is not None else None,
+        }
+        for index, properties, geom in zip(gdf.index, records, geoms)
+    ]
+    return {"type": "FeatureCollection", "features": features}
+
+
+def zoom_tolerance(zoom, pixels=1.0, tile_size=256):
+    """Returns the size in degrees of `pixels` screen pixels at a zoom level."""
+    return pixels * 360.0 / (tile_size * 2 ** zoom)
+
+
+class SimplificationPyramid:
+    """Simplified versions of a GeoDataFrame for bands of zoom levels.
+
+    The geometries are simplified once per band with a tolerance of `pixels`
+    screen pixels at the highest zoom of the band, and the band starting at the
+    last zoom keeps the full resolution. Polygon layers that form a valid
+    coverage (e.g. counties or watersheds) are simplified with
+    shapely.coverage_simplify so shared boundaries stay matched; other layers use
+    topology-preserving Douglas-Peucker simplification.
+
+    Args:
+        gdf (GeoDataFrame): The GeoDataFrame in EPSG:4326.
+        zooms (tuple): The first zoom level of each band.
+        pixels (float): The simplification tolerance in screen pixels.
+        **kwargs: Keyword arguments passed to gdf_to_geojson, e.g. `columns`
+            or `precision`.
+    """
+
+    def __init__(self, gdf, zooms=(0, 5, 8, 11, 14), pixels=1.0, **kwargs):
+        import numpy as np
+        import shapely
+
+        self.gdf = gdf
+        self.options = kwargs
+        self.zooms = tuple(sorted(zooms))
+        self.geometries = []
+        self._data = {}
+
+        geoms = np.asarray(gdf.geometry.values)
+        present = ~(shapely.is_missing(geoms) | shapely.is_empty(geoms))
+        types = set(gdf.geom_type.dropna().unique())
+        polygonal = bool(types) and types <= {"Polygon", "MultiPolygon"}
+        coverage = (
+            polygonal
+            and hasattr(shapely, "coverage_simplify")
+            and bool(shapely.coverage_is_valid(geoms[present]))
+        )
+        points = bool(types) and types <= {"Point", "MultiPoint"}
+
+        for i, zoom in enumerate(self.zooms):
+            if points or i == len(self.zooms) - 1:
+                self.geometries.append(gdf.geometry)
+                continue
+            tolerance = zoom_tolerance(self.zooms[i + 1] - 1, pixels)
+            if coverage:
+                simplified = geoms.copy()
+                simplified[present] = shapely.coverage_simplify(geoms[present], tolerance)
+                simplified = gpd.GeoSeries(simplified, index=gdf.index, crs=gdf.crs)
+            else:
+                simplified = gdf.geometry.simplify(tolerance, preserve_topology=True)
+            self.geometries.append(simplified)
+
+    def level(self, zoom):
+        """Returns the index of the band containing a zoom level."""
+        level = 0
+        for i, start in enumerate(self.zooms):
+            if zoom >= start:
+                level = i
+        return level
+
+    def data(self, zoom):
+        """Returns the GeoJSON of the band containing a zoom level.
+
+        Only the GeoJSON of the last band returned is kept, so the pyramid holds
+        one copy of the payload.
+        """
+        level = self.level(zoom)
+        if level not in self._data:
+            self._data = {level: gdf_to_geojson(self.gdf, geometry=self.geometries[level], **self.options)}
+        return self._data[level]
+
+    def num_vertices(self):
+        """Returns the number of vertices of each band."""
+        import shapely
+
+        return [int(shapely.get_num_coordinates(geoms.values).sum()) for geoms in self.geometries]
@@ -0,0 +1,84 @@
+"""Helpers for layers that follow the view of a map."""
+
+
+def pad_bounds(bounds, padding=0.0):
+    """Pads ((south, west), (north, east)) bounds by a fraction of their size on each side.
+
+    Bounds crossing the antimeridian, given with west > east, are unwrapped so
+    that east is larger than west, possibly beyond 180 degrees.
+    """
+    (south, west), (north, east) = bounds
+    if east < west:
+        east += 360
+    dy = (north - south) * padding
+    dx = (east - west) * padding
+    return (max(south - dy, -90.0), west - dx), (min(north + dy, 90.0), east + dx)
+
+
+def split_bounds(bounds):
+    """Splits ((south, west), (north, east)) bounds into boxes within -180 and 180 degrees.
+
+    Bounds crossing the antimeridian, either with west > east or with longitudes
+    beyond 180 degrees, are split into two boxes, one on each side of it.
+
+    Returns:
+        list: The (west, south, east, north) boxes.
+    """
+    (south, west), (north, east) = bounds
+    if east < west:
+        east += 360
+    if east - west >= 360:
+        return [(-180.0, south, 180.0, north)]
+
+    shift = (west + 180) % 360 - 180 - west
+    west, east = west + shift, east + shift
+    if east <= 180:
+        return [(west, south, east, north)]
+    return [(west, south, 180.0, north), (-180.0, south, east - 360, north)]
+
+
+class MapViewLayer:
+    """Base class of the layers that are updated as the view of a map changes.
+
+    Subclasses set `self.layer`, `self.map` and `self.padding`, implement
+    `update()` and may override `_on_view()`, called on every change of the zoom
+    or bounds, and `_detach()`, called when the layer is removed.
+    """
+
+    def add_to(self, m):
+        """Adds the layer to a map and starts following its view."""
+        self.map = m
+        m.add_layer(self.layer)
+        m.observe(self._on_view, names=["zoom", "bounds"])
+        self.update()
+        return self
+
+    def remove(self):
+        """Removes the layer from its map."""
+        if self.map is None:
+            return
+        self.map.unobserve(self._on_view, names=["zoom", "bounds"])
+        if self.layer in self.map.layers:
+            self.map.remove_layer(self.layer)
+        self._detach()
+        self.map = None
+
+    def _on_view(self, change=None):
+        self.update()
+
+    def _detach(self):
+        pass
+
+    def _view_bounds(self):
+        """Returns the padded bounds of the map view, or None if unknown.
+
+        The bounds are unwrapped across the antimeridian, see `pad_bounds`.
+        """
+        if not self.map.bounds:
+            return None
+        return pad_bounds(self.map.bounds, self.padding)
+
+    def view_boxes(self):
+        """Returns the padded view as (west, south, east, north) boxes, split at the antimeridian."""
+        bounds = self._view_bounds()
+        return split_bounds(bounds) if bounds is not None else []
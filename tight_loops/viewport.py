@@ -0,0 +1,171 @@
+"""Vector layers that only load the features in view."""
+
+import asyncio
+from collections import OrderedDict
+
+import numpy as np
+
+from .view import MapViewLayer
+
+MAX_LATITUDE = 85.0511287798066
+
+
+def cell_keys(lon, lat, zoom):
+    """Returns the key of the Web Mercator tile at a zoom level containing each point."""
+    n = 2 ** zoom
+    lat = np.radians(np.clip(lat, -MAX_LATITUDE, MAX_LATITUDE))
+    x = np.clip(np.floor((np.asarray(lon) + 180) / 360 * n), 0, n - 1).astype("int64")
+    y = np.clip(np.floor((1 - np.arcsinh(np.tan(lat)) / np.pi) / 2 * n), 0, n - 1).astype("int64")
+    return x * n + y
+
+
+def default_cell_zoom(bounds, cells=8, max_zoom=14):
+    """Returns the zoom level at which a (west, south, east, north) extent spans about `cells` tiles."""
+    width = max(bounds[2] - bounds[0], bounds[3] - bounds[1], 1e-9)
+    return int(np.clip(np.floor(np.log2(360 / width * cells)), 0, max_zoom))
+
+
+class ViewportLayer(MapViewLayer):
+    """A vector layer that only sends the features in the view of a map.
+
+    The features are grouped into the cells of a fixed tile grid by the center of
+    their bounding box, and each cell is sent as its own GeoJSON layer. When the
+    view changes, an STRtree finds the features intersecting it, and only the
+    cells holding them are shown. Cells already shown are kept as they are, and
+    cells that leave the view are kept in the frontend for a while, so panning
+    back does not send them again. Rapid view changes are debounced.
+
+    Args:
+        gdf (GeoDataFrame): The features.
+        name (str): The name of the layer.
+        columns (list, optional): The attribute columns sent to the map. Defaults
+            to None, which keeps all columns.
+        cell_zoom (int, optional): The zoom level of the cell grid. Defaults to
+            None, which picks the level at which the data spans about 8 cells.
+        padding (float): The fraction of the view added on each side.
+        delay (float): The number of seconds the view must stay still before
+            the layer is updated, when an asyncio event loop is running (e.g. in
+            Jupyter). Without one, the layer is updated at once.
+        max_features (int, optional): The largest number of features shown at
+            once. Nothing is shown when the view holds more, e.g. when zoomed
+            out too far. Defaults to 100000.
+        keep (int): The number of hidden cells kept in the frontend.
+        precision (int): The number of decimals kept in coordinates.
+        **kwargs: Keyword arguments passed to each ipyleaflet.GeoJSON, e.g.
+            `style` or `hover_style`.
+    """
+
+    def __init__(
+        self,
+        gdf,
+        name="Viewport",
+        columns=None,
+        cell_zoom=None,
+        padding=0.25,
+        delay=0.2,
+        max_features=100000,
+        keep=64,
+        precision=6,
+        **kwargs,
+    ):
+        import ipyleaflet
+        import shapely
+
+        if gdf.crs is not None and gdf.crs.to_epsg() != 4326:
+            gdf = gdf.to_crs(epsg=4326)
+        gdf = gdf[~(gdf.geometry.isna() | gdf.geometry.is_empty)]
+
+        self.gdf = gdf
+        self.columns = columns
+        self.padding = padding
+        self.delay = delay
+        self.max_features = max_features
+        self.keep = keep
+        self.precision = precision
+        self.style = kwargs
+
+        geometries = gdf.geometry.to_numpy()
+        self.tree = shapely.STRtree(geometries)
+        bounds = shapely.bounds(geometries)
+        if cell_zoom is None:
+            cell_zoom = default_cell_zoom(gdf.total_bounds) if len(gdf) else 0
+        self.cell_zoom = cell_zoom
+
+        keys = cell_keys((bounds[:, 0] + bounds[:, 2]) / 2, (bounds[:, 1] + bounds[:, 3]) / 2, cell_zoom)
+        self.cells, self.feature_cell = np.unique(keys, return_inverse=True)
+        order = np.argsort(self.feature_cell, kind="stable")
+        self.members = np.split(order, np.cumsum(np.bincount(self.feature_cell, minlength=len(self.cells)))[:-1])
+
+        self.layer = ipyleaflet.LayerGroup(name=name)
+        self.map = None
+        self.features_sent = 0
+        self._layers = OrderedDict()
+        self._handle = None
+
+    def _detach(self):
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        self.layer.layers = ()
+        for layer in self._layers.values():
+            layer.close()
+        self._layers.clear()
+
+    def _on_view(self, change=None):
+        """Updates the layer once the view has not changed for `delay` seconds."""
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+        if loop is None or not self.delay:
+            self.update()
+            return
+        if self._handle is not None:
+            self._handle.cancel()
+        self._handle = loop.call_later(self.delay, self.update)
+
+    def visible_cells(self):
+        """Returns the cells holding features that intersect the view."""
+        import shapely
+
+        boxes = self.view_boxes()
+        if not boxes:
+            return []
+        _, hits = self.tree.query(shapely.box(*np.array(boxes).T), predicate="intersects")
+        cells = np.unique(self.feature_cell[hits])
+        if self.max_features is not None and sum(len(self.members[cell]) for cell in cells) > self.max_features:
+            return []
+        return cells.tolist()
+
+    def _make_layer(self, cell):
+        import ipyleaflet
+        from .vector import gdf_to_geojson
+
+        members = self.members[cell]
+        data = gdf_to_geojson(self.gdf.iloc[members], columns=self.columns, precision=self.precision)
+        self.features_sent += len(members)
+        return ipyleaflet.GeoJSON(data=data, **self.style)
+
+    def update(self, change=None):
+        """Synchronizes the cell layers with the current view of the map."""
+        self._handle = None
+        if self.map is None:
+            return
+
+        cells = self.visible_cells()
+        shown = []
+        for cell in cells:
+            layer = self._layers.pop(cell, None)
+            if layer is None:
+                layer = self._make_layer(cell)
+            self._layers[cell] = layer
+            shown.append(layer)
+
+        shown = tuple(shown)
+        if shown != self.layer.layers:
+            self.layer.layers = shown
+
+        # The shown cells were moved to the end, so the oldest hidden cells go first.
+        while len(self._layers) > len(cells) + self.keep:
+            _, layer = self._layers.popitem(last=False)
+            layer.close()